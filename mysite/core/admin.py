@@ -1,6 +1,9 @@
 # core/admin.py
-from django.contrib import admin
-from .models import District, ForecastEntry, RealizedEntry, WarningEntry, VerificationScore , MapForecast
+from django.contrib import admin, messages
+from django.db.models import F
+from .models import (District, ForecastEntry, RealizedEntry, WarningEntry, VerificationScore , MapForecast, VerificationWatermark, MapForecastArea,
+                     VerificationRollup, RollupWatermark, Station, StationReading)
+from .map_areas import MAX_AREA_ID, sync_map_forecast_areas
 @admin.register(District)
 class DistrictAdmin(admin.ModelAdmin):
     list_display = ("name", "code", "geojson_file")
@@ -19,9 +22,25 @@ class RealizedEntryAdmin(admin.ModelAdmin):
     list_display = ("district", "date", "horizon", "rainfall_mm", "observed_at")
 
 
+@admin.register(Station)
+class StationAdmin(admin.ModelAdmin):
+    list_display = ("code", "name", "district", "lat", "lon", "updated_at")
+    search_fields = ("code", "name", "district__code")
+    list_select_related = ("district",)
+
+
+@admin.register(StationReading)
+class StationReadingAdmin(admin.ModelAdmin):
+    list_display = ("station", "date", "rainfall_mm", "updated_at")
+    list_filter = ("date",)
+    search_fields = ("station__code",)
+    list_select_related = ("station__district",)
+
+
 @admin.register(WarningEntry)
 class WarningEntryAdmin(admin.ModelAdmin):
-    list_display = ("district", "date", "horizon", "phenomenon", "severity", "created_by", "created_at")
+    list_display = ("district", "date", "horizon", "phenomenon", "severity", "source", "created_by", "created_at")
+    list_filter = ("phenomenon", "severity", "source")
 
 
 @admin.register(VerificationScore)
@@ -34,5 +53,40 @@ class VerificationScoreAdmin(admin.ModelAdmin):
 @admin.register(MapForecast)
 class MapForecastAdmin(admin.ModelAdmin):
     list_display = ("date", "scope", "entered_by", "updated_at")
-    readonly_fields = ("created_at", "updated_at")
-    ordering = ("-date",)
\ No newline at end of file
+    readonly_fields = ("revision", "created_at", "updated_at")
+    ordering = ("-date",)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            # an admin edit is a new revision too, so editors holding the old map get a 409
+            obj.revision = F("revision") + 1
+        super().save_model(request, obj, form, change)
+        if change:
+            obj.refresh_from_db(fields=["revision"])
+        skipped = sync_map_forecast_areas(obj.id, obj.date, obj.data)
+        if skipped:
+            self.message_user(request, f"No area rows for ids longer than {MAX_AREA_ID} characters: "
+                                       f"{', '.join(skipped[:5])}", messages.WARNING)
+
+
+@admin.register(VerificationWatermark)
+class VerificationWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("start", "end", "horizon", "watermark", "computed_at")
+
+
+@admin.register(MapForecastArea)
+class MapForecastAreaAdmin(admin.ModelAdmin):
+    list_display = ("date", "area_id", "category", "rainfall_mm")
+    list_filter = ("category",)
+    search_fields = ("area_id",)
+
+
+@admin.register(VerificationRollup)
+class VerificationRollupAdmin(admin.ModelAdmin):
+    list_display = ("period", "bucket_start", "district", "horizon", "threshold", "count", "hits", "misses", "false_alarms")
+    list_filter = ("period", "horizon", "threshold")
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ("period", "watermark", "computed_at")
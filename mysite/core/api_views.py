@@ -1,26 +1,165 @@
 # core/api_views.py
+import json
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
-from .models import District, ForecastEntry, RealizedEntry, WarningEntry, VerificationScore
+from rest_framework.utils.encoders import JSONEncoder
+from .models import District, ForecastEntry, RealizedEntry, WarningEntry, VerificationScore, MapForecastArea
+from .districts import district_registry
+from .ingest import MAX_HORIZON, build_entry, existing_ids, upsert_entries
+from .pagination import DateIdCursorPagination
+from .rollups import PERIODS, rollup_scores
+from .timeseries import DEFAULT_DAYS, MAX_DAYS, district_timeseries
+from .multicategory import CATEGORIES, category_scores, contingency_tables, fetch_category_pairs
+from .spatial import district_locator, locate_point
 from .serializers import (
     DistrictSerializer, ForecastEntrySerializer,
     RealizedEntrySerializer, WarningEntrySerializer,
-    VerificationScoreSerializer
+    VerificationScoreSerializer, MapForecastAreaSerializer
 )
 
+MAX_BATCH_ROWS = 5000
+MAX_LOCATE_POINTS = 100000
+
+
+def valid_date(value):
+    """parse_date() that also gives None for well-formed but impossible dates such as 2025-02-30."""
+    try:
+        return parse_date(value)
+    except ValueError:
+        return None
+
+
+def entry_lookups(params, names=("date", "start", "end", "horizon")):
+    """
+    Validated .filter() lookups for the ?date=, ?start=, ?end= and ?horizon=
+    query params in ``names``; raises ValidationError (400) instead of letting
+    an impossible date or a non-numeric horizon reach the database.
+    """
+    lookups = {}
+    for name, lookup in (("date", "date"), ("start", "date__gte"), ("end", "date__lte")):
+        if name in names and params.get(name):
+            value = valid_date(params[name])
+            if value is None:
+                raise ValidationError({name: "Use YYYY-MM-DD."})
+            lookups[lookup] = value
+    if "horizon" in names and params.get("horizon"):
+        horizon = params["horizon"]
+        if not horizon.isdigit() or not 1 <= int(horizon) <= MAX_HORIZON:
+            raise ValidationError({"horizon": f"Must be an integer between 1 and {MAX_HORIZON}."})
+        lookups["horizon"] = int(horizon)
+    return lookups
+
+
+def stream_json_array(serializer_class, queryset, context, chunk_size=1000):
+    """Serialize ``queryset`` chunk by chunk into a JSON array without building the whole list."""
+    yield "["
+    rows = queryset.iterator(chunk_size=chunk_size)
+    first = True
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        data = serializer_class(chunk, many=True, context=context).data
+        yield ("" if first else ",") + ",".join(json.dumps(row, cls=JSONEncoder) for row in data)
+        first = False
+    yield "]"
+
+
+class StreamingExportMixin:
+    """
+    Adds /<prefix>/export/ which streams every matching row as one JSON array.
+    Filters: ?date=, ?start=&end=, ?horizon=, ?district=<code>
+    """
+
+    def filter_by_params(self, qs):
+        params = self.request.query_params
+        qs = qs.filter(**entry_lookups(params))
+        if params.get("district"):
+            qs = qs.filter(district__code=params["district"])
+        return qs
+
+    def streaming_response(self, qs):
+        rows = stream_json_array(self.get_serializer_class(), qs, self.get_serializer_context())
+        return StreamingHttpResponse(rows, content_type="application/json")
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        qs = self.filter_by_params(self.filter_queryset(self.get_queryset())).order_by("-date", "-id")
+        return self.streaming_response(qs)
+
+
 class DistrictViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = District.objects.all().order_by("name")
     serializer_class = DistrictSerializer
     permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [filters.SearchFilter]
+    search_fields = ["name", "code"]
+    pagination_class = None  # small lookup table; map_forecast.html expects a plain list
 
+    def get_queryset(self):
+        qs = super().get_queryset()
+        code = self.request.query_params.get("code")
+        if code:
+            qs = qs.filter(code=code)
+        return qs
 
-class ForecastViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        # plain and ?code= lookups are answered from the in-process registry
+        params = request.query_params
+        if params.get("search"):
+            return super().list(request, *args, **kwargs)
+        if params.get("code"):
+            info = district_registry.get(params["code"])
+            rows = [info] if info else []
+        else:
+            rows = district_registry.all()
+        return Response([info._asdict() for info in rows])
+
+    @action(detail=False, methods=["get", "post"])
+    def locate(self, request):
+        # GET /api/districts/locate/?lat=22.57&lon=88.36 -> the district containing one point (cached)
+        # POST /api/districts/locate/ {"points": [[lat, lon], ...]} -> {"districts": [code or null, ...]}
+        if request.method == "GET":
+            try:
+                lat, lon = float(request.query_params["lat"]), float(request.query_params["lon"])
+            except (KeyError, ValueError):
+                raise ValidationError("Provide numeric ?lat=&lon=.")
+            code = locate_point(lat, lon)
+            info = district_registry.get(code) if code else None
+            return Response({"lat": lat, "lon": lon, "district": code, "name": info.name if info else None})
+
+        points = request.data.get("points") if isinstance(request.data, dict) else None
+        if not isinstance(points, list):
+            raise ValidationError({"points": "Expected a list of [lat, lon] pairs."})
+        if len(points) > MAX_LOCATE_POINTS:
+            raise ValidationError({"points": f"At most {MAX_LOCATE_POINTS} points per request."})
+        try:
+            coords = np.asarray(points, dtype=float) if points else np.empty((0, 2))
+        except (TypeError, ValueError):
+            raise ValidationError({"points": "Expected a list of [lat, lon] pairs."})
+        if coords.ndim != 2 or coords.shape[1] != 2:
+            raise ValidationError({"points": "Expected a list of [lat, lon] pairs."})
+        codes = district_locator().locate(coords[:, 1], coords[:, 0])
+        return Response({"count": len(codes), "located": sum(c is not None for c in codes), "districts": codes})
+
+
+class ForecastViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = ForecastEntry.objects.all().select_related("district").order_by("-date")
     serializer_class = ForecastEntrySerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ["district__name", "district__code"]
+    pagination_class = DateIdCursorPagination
 
     def perform_create(self, serializer):
         serializer.save(entered_by=self.request.user)
@@ -28,33 +167,206 @@ class ForecastViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=["get"])
     def by_date(self, request):
         # /api/forecasts/by_date/?date=YYYY-MM-DD&horizon=1
-        date = request.query_params.get("date")
-        horizon = request.query_params.get("horizon")
-        qs = self.queryset
-        if date:
-            qs = qs.filter(date=date)
-        if horizon:
-            qs = qs.filter(horizon=horizon)
-        ser = self.get_serializer(qs, many=True)
-        return Response(ser.data)
-
-
-class RealizedViewSet(viewsets.ModelViewSet):
+        qs = self.queryset.filter(**entry_lookups(request.query_params, names=("date", "horizon")))
+        return self.streaming_response(qs)
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """
+        POST /api/forecasts/batch/
+        {"entries": [{"district": CODE, "date": ..., "horizon": ..., "rainfall_mm": ..., ...}, ...],
+         "atomic": true}
+        (a bare list is accepted too). Rows are validated against the district
+        registry and upserted in one transaction. With "atomic" (a JSON
+        boolean, default true) any invalid row rejects the whole batch with 400;
+        otherwise the valid rows are saved. Every row gets a result in input order.
+        """
+        body = request.data
+        entries = body if isinstance(body, list) else body.get("entries") if isinstance(body, dict) else None
+        if not isinstance(entries, list) or not entries:
+            raise ValidationError({"entries": "Provide a non-empty list of entries."})
+        if len(entries) > MAX_BATCH_ROWS:
+            raise ValidationError({"entries": f"At most {MAX_BATCH_ROWS} entries per batch."})
+        atomic = body.get("atomic", True) if isinstance(body, dict) else True
+        if not isinstance(atomic, bool):
+            raise ValidationError({"atomic": "Must be true or false."})
+
+        districts = district_registry.code_to_id()
+        results, objs, seen = [], {}, {}
+        for i, row in enumerate(entries):
+            if isinstance(row, dict):
+                obj, errors = build_entry(ForecastEntry, row, districts, default_source="manual")
+            else:
+                obj, errors = None, {"non_field_errors": "Expected an object."}
+            key = None if obj is None else (obj.district_id, obj.date, obj.horizon)
+            if key in seen:
+                obj, errors = None, {"non_field_errors": f"Duplicate of entry {seen[key]}."}
+            if obj is None:
+                results.append({"index": i, "status": "error", "errors": errors})
+                continue
+            obj.entered_by = request.user
+            seen[key] = i
+            objs[key] = obj
+            results.append({"index": i, "key": key})
+
+        failed = len(entries) - len(objs)
+        if failed and atomic:
+            for r in results:
+                if r.pop("key", None) is not None:
+                    r["status"] = "skipped"
+            return Response({"ok": False, "created": 0, "updated": 0, "failed": failed, "results": results},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            before = existing_ids(ForecastEntry, objs.keys())
+            if objs:
+                upsert_entries(ForecastEntry, list(objs.values()), update_entered_by=True)
+            after = existing_ids(ForecastEntry, objs.keys())
+        created = 0
+        for r in results:
+            key = r.pop("key", None)
+            if key is not None:
+                r["status"] = "updated" if key in before else "created"
+                r["id"] = after.get(key)
+                created += key not in before
+        return Response({"ok": not failed, "created": created, "updated": len(objs) - created,
+                         "failed": failed, "results": results})
+
+    @action(detail=False, methods=["get"])
+    def timeseries(self, request):
+        # /api/forecasts/timeseries/?district=CODE&horizon=1&days=30&end=YYYY-MM-DD
+        params = request.query_params
+        code = params.get("district")
+        if not code:
+            raise ValidationError({"district": "This parameter is required."})
+        try:
+            horizon = int(params.get("horizon", 1))
+            days = int(params.get("days", DEFAULT_DAYS))
+        except ValueError:
+            raise ValidationError("'horizon' and 'days' must be integers.")
+        if not 1 <= days <= MAX_DAYS:
+            raise ValidationError({"days": f"Must be between 1 and {MAX_DAYS}."})
+        end = valid_date(params["end"]) if params.get("end") else timezone.localdate()
+        if end is None:
+            raise ValidationError({"end": "Use YYYY-MM-DD."})
+        district_id = district_registry.id_for(code)
+        if district_id is None:
+            raise NotFound(f"Unknown district '{code}'")
+        return Response(dict(district=code, **district_timeseries(district_id, horizon, end, days)))
+
+
+class RealizedViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = RealizedEntry.objects.all().select_related("district").order_by("-date")
     serializer_class = RealizedEntrySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateIdCursorPagination
 
     def perform_create(self, serializer):
         serializer.save(entered_by=self.request.user)
 
 
-class WarningViewSet(viewsets.ModelViewSet):
+class WarningViewSet(StreamingExportMixin, viewsets.ModelViewSet):
     queryset = WarningEntry.objects.all().select_related("district").order_by("-date")
     serializer_class = WarningEntrySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateIdCursorPagination
 
 
 class VerificationViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = VerificationScore.objects.all().order_by("-computed_at")
     serializer_class = VerificationScoreSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateIdCursorPagination
+
+    @action(detail=False, methods=["get"])
+    def rollup(self, request):
+        # /api/verification/rollup/?period=season&start=YYYY-MM-DD&end=YYYY-MM-DD&horizon=1&district=CODE
+        # sums the rollup buckets that start within [start, end]
+        params = request.query_params
+        period = params.get("period", "month")
+        if period not in PERIODS:
+            raise ValidationError({"period": f"One of {', '.join(PERIODS)}."})
+        start, end = valid_date(params.get("start") or ""), valid_date(params.get("end") or "")
+        if start is None or end is None:
+            raise ValidationError("Provide ?start=YYYY-MM-DD&end=YYYY-MM-DD.")
+        horizons = [int(params["horizon"])] if params.get("horizon", "").isdigit() else None
+        district_ids = None
+        if params.get("district"):
+            district_id = district_registry.id_for(params["district"])
+            district_ids = [] if district_id is None else [district_id]
+
+        scores = rollup_scores(period, start, end, horizons=horizons, district_ids=district_ids)
+        codes = district_registry.id_to_code()
+        metrics = scores.metrics()
+        results = []
+        for i in range(len(scores)):
+            row = {"district": codes.get(int(scores.district_id[i])), "horizon": int(scores.horizon[i]),
+                   "count": int(scores.count[i])}
+            for name, values in metrics.items():
+                row[name] = None if values[i] != values[i] else float(values[i])  # NaN -> null
+            results.append(row)
+        return Response({"period": period, "start": start, "end": end, "results": results})
+
+    @action(detail=False, methods=["get"])
+    def categories(self, request):
+        # /api/verification/categories/?start=YYYY-MM-DD&end=YYYY-MM-DD&horizon=1&area=CODE,CODE
+        # K x K map-category contingency matrices (rows forecast, columns observed) per area and in total
+        params = request.query_params
+        start, end = valid_date(params.get("start") or ""), valid_date(params.get("end") or "")
+        if start is None or end is None:
+            raise ValidationError("Provide ?start=YYYY-MM-DD&end=YYYY-MM-DD.")
+        horizon = int(params["horizon"]) if params.get("horizon", "").isdigit() else 1
+        area_ids = [a for a in params.get("area", "").split(",") if a] or None
+
+        pairs = fetch_category_pairs(start, end, horizon=horizon, area_ids=area_ids)
+        tables = contingency_tables(pairs)
+        total = tables.sum(axis=0)
+
+        def row(table, scores):
+            out = {"count": int(table.sum()), "matrix": table.tolist()}
+            for name, value in scores.items():
+                out[name] = None if value != value else float(value)  # NaN -> null
+            return out
+
+        per_area = category_scores(tables)
+        areas = [
+            dict(area=str(area), **row(tables[i], {name: values[i] for name, values in per_area.items()}))
+            for i, area in enumerate(pairs.area_ids)
+        ]
+        return Response({"start": start, "end": end, "horizon": horizon, "categories": CATEGORIES,
+                         "total": row(total, category_scores(total)), "areas": areas})
+
+
+class MapForecastAreaViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Per-area rows of the map forecasts.
+    Filters: ?area=<area_id>, ?category=, ?date= | ?start=&end=
+    e.g. every date area X was HEAVY: /api/map-areas/?area=X&category=HEAVY
+    """
+    queryset = MapForecastArea.objects.all()
+    serializer_class = MapForecastAreaSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = DateIdCursorPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        params = self.request.query_params
+        for param, lookup in (("area", "area_id"), ("category", "category"),
+                              ("date", "date"), ("start", "date__gte"), ("end", "date__lte")):
+            value = params.get(param)
+            if not value:
+                continue
+            if lookup.startswith("date") and valid_date(value) is None:
+                raise ValidationError({param: "Use YYYY-MM-DD."})
+            qs = qs.filter(**{lookup: value})
+        return qs
+
+    @action(detail=False, methods=["get"])
+    def counts(self, request):
+        # /api/map-areas/counts/?date=YYYY-MM-DD -> [{"date", "category", "count"}, ...]
+        qs = self.get_queryset()
+        if not any(request.query_params.get(p) for p in ("date", "start", "end")):
+            raise ValidationError("Provide ?date= or ?start=&end=.")
+        rows = (qs.order_by().values("date", "category").annotate(count=Count("id"))
+                .order_by("date", "category"))
+        return Response(list(rows))
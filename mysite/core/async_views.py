@@ -0,0 +1,135 @@
+# core/async_views.py
+"""
+Async versions of the hot read endpoints for ASGI deployments (uvicorn etc).
+
+With ASYNC_READ_VIEWS enabled (mysite/asgi.py turns it on) these replace the
+sync views on the same URLs, so a request waiting on the database no longer
+holds a worker thread. They answer exactly like their sync counterparts; the
+API ones authenticate through REST_FRAMEWORK's DEFAULT_AUTHENTICATION_CLASSES
+(session and HTTP Basic unless configured otherwise), as the DRF views do.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.http import (HttpResponse, HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse,
+                         StreamingHttpResponse)
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, ValidationError
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .api_views import entry_lookups
+from .caching import aget_map_forecast_body
+from .districts import district_registry
+from .metrics import serialization_timer
+from .models import ForecastEntry, MapForecast
+from .serializers import ForecastEntrySerializer
+from .views import map_forecast_validators, set_map_forecast_headers
+
+
+@sync_to_async
+def _is_authenticated(request):
+    # resolving the lazy request.user may hit the session/user tables
+    return request.user.is_authenticated
+
+
+@sync_to_async
+def _api_auth_error(request):
+    """
+    Run the DRF authenticators like an IsAuthenticated API view; returns
+    the same 401/403 response it would, or None when the request is allowed.
+    """
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    try:
+        if drf_request.user.is_authenticated:
+            return None
+        detail = NotAuthenticated.default_detail
+    except AuthenticationFailed as exc:
+        detail = exc.detail
+    header = authenticators[0].authenticate_header(drf_request) if authenticators else None
+    response = JsonResponse({"detail": detail}, status=401 if header else 403)
+    if header:
+        response["WWW-Authenticate"] = header
+    return response
+
+
+async def get_map_forecast(request):
+    """Async get_map_forecast (same query params, headers and conditional GET)."""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET"])
+    if not await _is_authenticated(request):
+        return redirect_to_login(request.get_full_path(), settings.LOGIN_URL)
+    date_str = request.GET.get("date")
+    if not date_str:
+        return HttpResponseBadRequest("Please provide ?date=YYYY-MM-DD")
+    d = parse_date(date_str)
+    if not d:
+        return HttpResponseBadRequest("Invalid date format.")
+
+    updated_at = await MapForecast.objects.filter(date=d).values_list("updated_at", flat=True).afirst()
+    if updated_at is None:
+        return JsonResponse({"ok": True, "found": False, "date": date_str})
+
+    etag, last_modified = map_forecast_validators(d, updated_at)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(await aget_map_forecast_body(d, updated_at), content_type="application/json")
+    return set_map_forecast_headers(response, etag, last_modified)
+
+
+async def district_list(request):
+    """Async /api/districts/ (plain list and ?code=); ?search= falls back to the DRF view."""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET"])
+    if request.GET.get("search"):
+        from .api_views import DistrictViewSet
+        view = DistrictViewSet.as_view({"get": "list"})
+        return await sync_to_async(lambda: view(request).render())()
+    error = await _api_auth_error(request)
+    if error:
+        return error
+    code = request.GET.get("code")
+    if code:
+        info = await sync_to_async(district_registry.get)(code)
+        rows = [info] if info else []
+    else:
+        rows = await sync_to_async(district_registry.all)()
+    return JsonResponse([info._asdict() for info in rows], safe=False)
+
+
+async def forecasts_by_date(request, chunk_size=1000):
+    """Async /api/forecasts/by_date/?date=YYYY-MM-DD&horizon=1, streamed as one JSON array."""
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET"])
+    error = await _api_auth_error(request)
+    if error:
+        return error
+    try:
+        lookups = entry_lookups(request.GET, names=("date", "horizon"))
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    qs = ForecastEntry.objects.select_related("district").filter(**lookups).order_by("-date")
+
+    async def rows():
+        yield "["
+        chunk, first = [], True
+        async for obj in qs.aiterator(chunk_size=chunk_size):
+            chunk.append(obj)
+            if len(chunk) >= chunk_size:
+                yield ("" if first else ",") + _dump(chunk)
+                chunk, first = [], False
+        if chunk:
+            yield ("" if first else ",") + _dump(chunk)
+        yield "]"
+
+    return StreamingHttpResponse(rows(), content_type="application/json")
+
+
+def _dump(objs):
+    with serialization_timer():
+        return ",".join(json.dumps(row, cls=JSONEncoder) for row in ForecastEntrySerializer(objs, many=True).data)
@@ -0,0 +1,66 @@
+# core/caching.py
+"""
+Server-side cache for serialized MapForecast responses.
+
+Entries hold the JSON bytes of a date's forecast together with the row's
+updated_at, so a stale entry (e.g. written by another process) is detected
+and rebuilt; core.signals drops the entry whenever the row is saved or deleted.
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .metrics import serialization_timer
+from .models import MapForecast
+
+MAP_FORECAST_CACHE_TIMEOUT = getattr(settings, "MAP_FORECAST_CACHE_TIMEOUT", 60 * 60)
+
+
+def map_forecast_cache_key(d):
+    return f"map_forecast:{d.isoformat()}"
+
+
+def _serialize(obj):
+    with serialization_timer():
+        return json.dumps({
+            "ok": True,
+            "found": True,
+            "date": str(obj.date),
+            "scope": obj.scope,
+            "revision": obj.revision,
+            "data": obj.data,
+        }, cls=DjangoJSONEncoder).encode("utf-8")
+
+
+def get_map_forecast_body(d, updated_at):
+    """
+    Return the serialized get_map_forecast payload for date ``d``; the row is
+    only loaded (and its JSON blob parsed) when the cached copy is missing or
+    older than ``updated_at``.
+    """
+    key = map_forecast_cache_key(d)
+    entry = cache.get(key)
+    if entry is not None and entry[0] == updated_at:
+        return entry[1]
+    obj = MapForecast.objects.get(date=d)
+    body = _serialize(obj)
+    cache.set(key, (obj.updated_at, body), MAP_FORECAST_CACHE_TIMEOUT)
+    return body
+
+
+async def aget_map_forecast_body(d, updated_at):
+    """Async get_map_forecast_body() for the ASGI views."""
+    key = map_forecast_cache_key(d)
+    entry = await cache.aget(key)
+    if entry is not None and entry[0] == updated_at:
+        return entry[1]
+    obj = await MapForecast.objects.aget(date=d)
+    body = _serialize(obj)
+    await cache.aset(key, (obj.updated_at, body), MAP_FORECAST_CACHE_TIMEOUT)
+    return body
+
+
+def invalidate_map_forecast(d):
+    cache.delete(map_forecast_cache_key(d))
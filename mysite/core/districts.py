@@ -0,0 +1,124 @@
+# core/districts.py
+"""
+Process-wide, read-mostly registry of District rows (code -> id/name/geojson_file).
+
+The whole table is loaded once per process and reused for every lookup.
+Writes bump a generation counter in the Django cache (core.signals does this on
+save/delete; bulk writers call invalidate() themselves). Each process compares
+its copy against that counter at most every DISTRICT_REGISTRY_CHECK_SECONDS and
+reloads when it has moved on; the process that made the change drops its copy
+immediately. GenerationCachedTable holds that mechanism for other tables of
+this kind (core.stations).
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import District
+
+GENERATION_KEY = "district_registry:generation"
+CHECK_SECONDS = getattr(settings, "DISTRICT_REGISTRY_CHECK_SECONDS", 5)
+
+
+class DistrictInfo(namedtuple("DistrictInfo", "id code name geojson_file")):
+    __slots__ = ()
+
+    def instance(self):
+        """An unsaved District carrying this row's values, e.g. for FK assignment without a query."""
+        return District(id=self.id, code=self.code, name=self.name, geojson_file=self.geojson_file)
+
+
+class GenerationCachedTable:
+    """
+    A table loaded once per process and reused until the generation counter
+    under ``generation_key`` in the Django cache moves on. Subclasses set
+    generation_key and implement _load(); what it returns is never mutated.
+    """
+    generation_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (data, generation): replaced as a whole, never mutated, so readers
+        # that took a reference keep a consistent copy without holding the lock
+        self._state = None
+        self._checked_at = 0.0
+        self.loads = 0
+
+    def _current_generation(self):
+        generation = cache.get(self.generation_key)
+        if generation is None:
+            cache.add(self.generation_key, 0, None)
+            generation = cache.get(self.generation_key, 0)
+        return generation
+
+    def _load(self):
+        raise NotImplementedError
+
+    def _snapshot(self):
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now - self._checked_at < CHECK_SECONDS:
+            return state
+        with self._lock:
+            generation = self._current_generation()
+            state = self._state
+            if state is None or generation != state[1]:
+                state = (self._load(), generation)
+                self._state = state
+                self.loads += 1
+            self._checked_at = now
+            return state
+
+    def data(self):
+        return self._snapshot()[0]
+
+    @property
+    def generation(self):
+        return self._snapshot()[1]
+
+    def invalidate(self):
+        """Drop this process's copy and tell the other processes to reload."""
+        try:
+            cache.incr(self.generation_key)
+        except ValueError:  # key missing or evicted; any value no process has seen will do
+            cache.set(self.generation_key, time.time_ns(), None)
+        self._state = None
+
+
+class DistrictRegistry(GenerationCachedTable):
+    generation_key = GENERATION_KEY
+
+    def _load(self):
+        rows = [DistrictInfo(*row) for row in
+                District.objects.order_by("name").values_list("id", "code", "name", "geojson_file")]
+        return {d.code: d for d in rows}, {d.id: d for d in rows}
+
+    def get(self, code):
+        return self.data()[0].get(code)
+
+    def get_by_id(self, district_id):
+        return self.data()[1].get(district_id)
+
+    def id_for(self, code):
+        info = self.get(code)
+        return None if info is None else info.id
+
+    def code_to_id(self):
+        """A fresh {code: id} dict."""
+        return {code: d.id for code, d in self.data()[0].items()}
+
+    def id_to_code(self):
+        return {d.id: code for code, d in self.data()[0].items()}
+
+    def ids(self):
+        return list(self.data()[1])
+
+    def all(self):
+        """Every district, ordered by name."""
+        return list(self.data()[0].values())
+
+
+district_registry = DistrictRegistry()
@@ -0,0 +1,188 @@
+# core/export.py
+"""
+Streaming exports of ForecastEntry / RealizedEntry slices for analysts.
+
+Rows are read as values_list tuples, so no model instances are built, in
+keyset batches of whole dates: one query counts the rows per date, then each
+batch of about ``chunk_size`` rows is fetched with its own date-range query.
+Memory stays bounded by one batch (or one date, if larger) on every backend,
+including MySQLdb, which buffers a whole result set client-side and would do so
+for a single .iterator() query. Three output formats are produced incrementally:
+
+csv       header + one line per row
+ndjson    one JSON object per line
+columnar  b"WXCOLS1\\n", one JSON header line, then blocks of NumPy .npy arrays
+          (one per column, in header order) until EOF; see read_columnar()
+"""
+import csv
+import io
+import json
+from datetime import timezone as dt_timezone
+from itertools import islice
+
+import numpy as np
+from django.db.models import Count
+from django.utils.dateparse import parse_date
+
+from .models import ForecastEntry, RealizedEntry
+
+FORMATS = ("csv", "ndjson", "columnar")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "columnar": "application/octet-stream",
+}
+COLUMNAR_MAGIC = b"WXCOLS1\n"
+
+# kind -> (model, [(column, values_list lookup, numpy dtype)])
+_COMMON = [
+    ("district", "district__code", "U"),
+    ("date", "date", "datetime64[D]"),
+    ("horizon", "horizon", "int16"),
+    ("rainfall_mm", "rainfall_mm", "float64"),
+    ("rainfall_category", "rainfall_category", "U"),
+]
+KINDS = {
+    "forecast": (ForecastEntry, _COMMON + [("source", "source", "U")]),
+    "realized": (RealizedEntry, _COMMON + [("observed_at", "observed_at", "datetime64[s]")]),
+}
+
+
+def parse_filters(params):
+    """
+    Validate export filters from a dict-like (query params or command options).
+    Raises ValueError with a user-facing message.
+    """
+    kind = params.get("kind") or "forecast"
+    if kind not in KINDS:
+        raise ValueError(f"'kind' must be one of {', '.join(KINDS)}.")
+    fmt = params.get("format") or "csv"
+    if fmt not in FORMATS:
+        raise ValueError(f"'format' must be one of {', '.join(FORMATS)}.")
+    filters = {}
+    for key in ("date", "start", "end"):
+        if params.get(key):
+            d = parse_date(params[key])
+            if d is None:
+                raise ValueError(f"Invalid '{key}' date. Use YYYY-MM-DD.")
+            filters[key] = d
+    if "date" in filters:
+        filters["start"] = filters["end"] = filters.pop("date")
+    if params.get("horizon"):
+        try:
+            filters["horizons"] = [int(h) for h in str(params["horizon"]).split(",")]
+        except ValueError:
+            raise ValueError("'horizon' must be an integer or comma separated integers.")
+    if params.get("district"):
+        filters["districts"] = [c.strip() for c in str(params["district"]).split(",") if c.strip()]
+    return kind, fmt, filters
+
+
+def export_rows(kind, start=None, end=None, horizons=None, districts=None, chunk_size=5000):
+    """Return (column names, row tuple iterator) for the requested slice."""
+    model, columns = KINDS[kind]
+    qs = model.objects.all()
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    if horizons:
+        qs = qs.filter(horizon__in=horizons)
+    if districts:
+        qs = qs.filter(district__code__in=districts)
+    rows = qs.order_by("date", "district__code", "horizon").values_list(*[lookup for _, lookup, _ in columns])
+    return [name for name, _, _ in columns], _keyset_rows(qs, rows, chunk_size)
+
+
+def date_batches(qs, chunk_size):
+    """[(first date, last date), ...] covering ``qs`` in about ``chunk_size`` rows each; dates are never split."""
+    batches, first, last, total = [], None, None, 0
+    for day, count in qs.order_by("date").values_list("date").annotate(n=Count("id")):
+        if first is not None and total + count > chunk_size:
+            batches.append((first, last))
+            first, total = None, 0
+        if first is None:
+            first = day
+        last, total = day, total + count
+    if first is not None:
+        batches.append((first, last))
+    return batches
+
+
+def _keyset_rows(qs, rows, chunk_size):
+    for first, last in date_batches(qs, chunk_size):
+        yield from list(rows.filter(date__range=(first, last)))
+
+
+def _chunks(rows, size):
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_csv(names, rows, chunk_size=5000):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(names)
+    for chunk in _chunks(rows, chunk_size):
+        writer.writerows(chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_ndjson(names, rows, chunk_size=5000):
+    for chunk in _chunks(rows, chunk_size):
+        yield "".join(json.dumps(dict(zip(names, row)), default=str) + "\n" for row in chunk)
+
+
+def _column_array(values, dtype):
+    if dtype == "U":
+        return np.array(["" if v is None else v for v in values], dtype=str)
+    if dtype == "float64":
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    if dtype == "datetime64[s]":
+        # aware datetimes -> naive UTC, None -> NaT
+        return np.array([None if v is None else v.astimezone(dt_timezone.utc).replace(tzinfo=None)
+                         for v in values], dtype=dtype)
+    return np.array(values, dtype=dtype)
+
+
+def iter_columnar(kind, names, rows, chunk_size=65536):
+    dtypes = [dtype for _, _, dtype in KINDS[kind][1]]
+    header = {"kind": kind, "columns": [{"name": n, "dtype": d} for n, d in zip(names, dtypes)]}
+    yield COLUMNAR_MAGIC + json.dumps(header).encode("utf8") + b"\n"
+    for chunk in _chunks(rows, chunk_size):
+        buf = io.BytesIO()
+        for values, dtype in zip(zip(*chunk), dtypes):
+            np.save(buf, _column_array(values, dtype), allow_pickle=False)
+        yield buf.getvalue()
+
+
+def stream_export(kind, fmt, filters):
+    """Iterator of str (csv/ndjson) or bytes (columnar) chunks for the export."""
+    names, rows = export_rows(kind, **filters)
+    if fmt == "csv":
+        return iter_csv(names, rows)
+    if fmt == "ndjson":
+        return iter_ndjson(names, rows)
+    return iter_columnar(kind, names, rows)
+
+
+def read_columnar(fh):
+    """
+    Read a columnar export from a binary file object.
+    Yields one {column: numpy array} dict per block.
+    """
+    if fh.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar export.")
+    names = [c["name"] for c in json.loads(fh.readline())["columns"]]
+    while True:
+        try:
+            block = {name: np.load(fh, allow_pickle=False) for name in names}
+        except EOFError:
+            return
+        yield block
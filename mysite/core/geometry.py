@@ -0,0 +1,360 @@
+# core/geometry.py
+"""
+Shared-arc topology for the district/state GeoJSON.
+
+Coordinates are quantized onto an integer grid so that vertices shared by
+neighbouring polygons compare equal; every ring is then cut at junctions into
+arcs, and identical arcs (in either direction) are stored once. Simplifying the
+arcs instead of the rings keeps neighbouring boundaries identical, so coarse
+variants have no gaps or overlaps between districts.
+"""
+import numpy as np
+
+DEFAULT_QUANTIZATION = 1_000_000
+
+
+class Topology:
+    """
+    TopoJSON-like topology.
+
+    arcs        list of arcs, each a list of absolute quantized (x, y) ints
+    objects     list of {"type", "properties", "id"?, "arcs" | "coordinates"};
+                arc references use ~i for arc i traversed in reverse
+    transform   (scale_x, scale_y, translate_x, translate_y)
+    """
+
+    def __init__(self, arcs, objects, transform):
+        self.arcs = arcs
+        self.objects = objects
+        self.transform = transform
+
+    def vertex_count(self):
+        return sum(len(a) for a in self.arcs)
+
+
+def _dedupe(points):
+    out = [points[0]]
+    for p in points[1:]:
+        if p != out[-1]:
+            out.append(p)
+    return out
+
+
+def _transform_for(bbox, quantization):
+    x0, y0, x1, y1 = bbox
+    kx = (x1 - x0) / (quantization - 1) if x1 > x0 else 1.0
+    ky = (y1 - y0) / (quantization - 1) if y1 > y0 else 1.0
+    return (kx, ky, x0, y0)
+
+
+def _positions(geometry):
+    """Yield every (x, y) of a GeoJSON geometry."""
+    t, coords = geometry.get("type"), geometry.get("coordinates")
+    if t == "Point":
+        yield coords[:2]
+    elif t in ("MultiPoint", "LineString"):
+        yield from (c[:2] for c in coords)
+    elif t in ("MultiLineString", "Polygon"):
+        yield from (c[:2] for line in coords for c in line)
+    elif t == "MultiPolygon":
+        yield from (c[:2] for poly in coords for ring in poly for c in ring)
+
+
+def build_topology(collection, quantization=DEFAULT_QUANTIZATION):
+    """Build a Topology from a GeoJSON FeatureCollection (dict)."""
+    features = collection.get("features", [])
+    xy = np.array([p for f in features if f.get("geometry") for p in _positions(f["geometry"])], dtype=float)
+    bbox = (xy[:, 0].min(), xy[:, 1].min(), xy[:, 0].max(), xy[:, 1].max()) if len(xy) else (0, 0, 0, 0)
+    kx, ky, tx, ty = transform = _transform_for(bbox, quantization)
+
+    def q(c):
+        return (int(round((c[0] - tx) / kx)), int(round((c[1] - ty) / ky)))
+
+    def ring(coords):
+        pts = _dedupe([q(c) for c in coords])
+        if pts[0] != pts[-1]:
+            pts.append(pts[0])
+        return pts if len(pts) >= 4 else None
+
+    def line(coords):
+        pts = _dedupe([q(c) for c in coords])
+        return pts if len(pts) >= 2 else None
+
+    def polygon(rings):
+        # a polygon whose exterior ring collapsed is dropped
+        exterior = ring(rings[0]) if rings else None
+        if exterior is None:
+            return None
+        return [exterior] + [r for r in map(ring, rings[1:]) if r]
+
+    # 1. quantize; polygons become lists of rings, lines lists of lines
+    shapes = []
+    for f in features:
+        g = f.get("geometry") or {}
+        t, coords = g.get("type"), g.get("coordinates")
+        if t == "Polygon":
+            parts = [polygon(coords)]
+        elif t == "MultiPolygon":
+            parts = [polygon(poly) for poly in coords]
+        elif t == "LineString":
+            parts = [line(coords)]
+        elif t == "MultiLineString":
+            parts = [line(c) for c in coords]
+        else:
+            parts = None
+        if parts is not None:
+            parts = [p for p in parts if p]
+        shapes.append((f, t, parts))
+
+    # 2. junctions: vertices with more than two distinct neighbours, plus line ends
+    neighbours = {}
+    junctions = set()
+
+    def visit(pts, closed):
+        if closed:
+            cycle = pts[:-1]
+            n = len(cycle)
+            for i, p in enumerate(cycle):
+                neighbours.setdefault(p, set()).update((cycle[i - 1], cycle[(i + 1) % n]))
+        else:
+            for i, p in enumerate(pts):
+                nb = neighbours.setdefault(p, set())
+                if i > 0:
+                    nb.add(pts[i - 1])
+                if i < len(pts) - 1:
+                    nb.add(pts[i + 1])
+
+    for f, t, parts in shapes:
+        if t in ("Polygon", "MultiPolygon"):
+            for poly in parts:
+                for r in poly:
+                    visit(r, True)
+        elif t in ("LineString", "MultiLineString"):
+            for ln in parts:
+                visit(ln, False)
+                junctions.update((ln[0], ln[-1]))
+    junctions.update(p for p, nb in neighbours.items() if len(nb) > 2)
+
+    # 3. cut at junctions and store every arc once
+    arcs, index = [], {}
+
+    def ref(arc):
+        key = tuple(arc)
+        if key in index:
+            return index[key]
+        if key[::-1] in index:
+            return ~index[key[::-1]]
+        index[key] = len(arcs)
+        arcs.append(arc)
+        return index[key]
+
+    def cut(pts):
+        refs, start = [], 0
+        for i in range(1, len(pts)):
+            if pts[i] in junctions or i == len(pts) - 1:
+                refs.append(ref(pts[start:i + 1]))
+                start = i
+        return refs
+
+    def cut_ring(pts):
+        cycle = pts[:-1]
+        ks = [i for i, p in enumerate(cycle) if p in junctions]
+        # rings without junctions start at their smallest vertex so equal rings match
+        k = ks[0] if ks else cycle.index(min(cycle))
+        cycle = cycle[k:] + cycle[:k]
+        return cut(cycle + [cycle[0]])
+
+    objects = []
+    for f, t, parts in shapes:
+        obj = {"type": t, "properties": f.get("properties") or {}}
+        if "id" in f:
+            obj["id"] = f["id"]
+        g = f.get("geometry")
+        if t == "Polygon":
+            obj["arcs"] = [cut_ring(r) for r in parts[0]] if parts else []
+        elif t == "MultiPolygon":
+            obj["arcs"] = [[cut_ring(r) for r in poly] for poly in parts]
+        elif t == "LineString":
+            obj["arcs"] = cut(parts[0]) if parts else []
+        elif t == "MultiLineString":
+            obj["arcs"] = [cut(ln) for ln in parts]
+        elif t in ("Point", "MultiPoint"):
+            obj["coordinates"] = list(q(g["coordinates"])) if t == "Point" else [list(q(c)) for c in g["coordinates"]]
+        else:
+            obj["type"] = None if g is None else t
+            obj["geometry"] = g  # kept as-is (e.g. GeometryCollection)
+        objects.append(obj)
+    return Topology(arcs, objects, transform)
+
+
+def _dp_keep(points, tolerance):
+    """Douglas-Peucker keep-mask for an (n, 2) array; endpoints are always kept."""
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        seg = points[b] - points[a]
+        rel = points[a + 1:b] - points[a]
+        length = np.hypot(seg[0], seg[1])
+        if length == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance:
+            m = a + 1 + i
+            keep[m] = True
+            stack.append((a, m))
+            stack.append((m, b))
+    return keep
+
+
+def simplify_arcs(arcs, tolerance):
+    """Return Douglas-Peucker simplified copies of ``arcs`` (tolerance in quantized units)."""
+    if tolerance <= 0:
+        return arcs
+    out = []
+    for arc in arcs:
+        pts = np.asarray(arc)
+        keep = _dp_keep(pts, tolerance)
+        out.append([arc[i] for i in np.flatnonzero(keep)])
+    return out
+
+
+def _ring_points(refs, arcs):
+    pts = []
+    for r in refs:
+        arc = arcs[r] if r >= 0 else arcs[~r][::-1]
+        pts.extend(arc if not pts else arc[1:])
+    return pts
+
+
+def to_geojson(topology, arcs=None, decimals=None):
+    """
+    Rebuild a GeoJSON FeatureCollection from ``topology`` using ``arcs``
+    (e.g. a simplified copy). Holes that collapse are dropped; a collapsed
+    exterior ring falls back to its unsimplified arcs.
+    """
+    arcs = topology.arcs if arcs is None else arcs
+    kx, ky, tx, ty = topology.transform
+
+    def pos(p):
+        x, y = p[0] * kx + tx, p[1] * ky + ty
+        if decimals is not None:
+            x, y = round(x, decimals), round(y, decimals)
+        return [x, y]
+
+    def coords(pts):
+        return _dedupe([tuple(pos(p)) for p in pts])
+
+    def ring(refs, exterior):
+        pts = coords(_ring_points(refs, arcs))
+        if len(pts) < 4:
+            if not exterior:
+                return None
+            pts = coords(_ring_points(refs, topology.arcs))
+        return [list(p) for p in pts]
+
+    def polygon(rings):
+        out = [ring(rings[0], True)] + [ring(r, False) for r in rings[1:]]
+        return [r for r in out if r]
+
+    def line(refs):
+        return [list(p) for p in coords(_ring_points(refs, arcs))]
+
+    features = []
+    for obj in topology.objects:
+        t = obj["type"]
+        if t == "Polygon":
+            geometry = {"type": t, "coordinates": polygon(obj["arcs"]) if obj["arcs"] else []}
+        elif t == "MultiPolygon":
+            geometry = {"type": t, "coordinates": [polygon(p) for p in obj["arcs"]]}
+        elif t == "LineString":
+            geometry = {"type": t, "coordinates": line(obj["arcs"])}
+        elif t == "MultiLineString":
+            geometry = {"type": t, "coordinates": [line(r) for r in obj["arcs"]]}
+        elif t == "Point":
+            geometry = {"type": t, "coordinates": pos(obj["coordinates"])}
+        elif t == "MultiPoint":
+            geometry = {"type": t, "coordinates": [pos(c) for c in obj["coordinates"]]}
+        else:
+            geometry = obj.get("geometry")
+        feature = {"type": "Feature", "properties": obj["properties"], "geometry": geometry}
+        if "id" in obj:
+            feature["id"] = obj["id"]
+        features.append(feature)
+    return {"type": "FeatureCollection", "features": features}
+
+
+def encode_topojson(topology, arcs=None, name="regions", factor=1):
+    """
+    Encode ``topology`` (optionally with simplified ``arcs``) as a TopoJSON
+    document: quantized arcs are delta-encoded (first position absolute, then
+    offsets from the previous one), which keeps most numbers to a few digits.
+    ``factor`` > 1 coarsens the integer grid for low-zoom variants.
+    """
+    arcs = topology.arcs if arcs is None else arcs
+
+    def coarse(a):
+        a = np.asarray(a, dtype=np.int64)
+        return a if factor == 1 else np.rint(a / factor).astype(np.int64)
+
+    encoded = []
+    for arc in arcs:
+        a = coarse(arc)
+        a[1:] = np.diff(a, axis=0)
+        encoded.append(a.tolist())
+
+    geometries = []
+    for obj in topology.objects:
+        g = {"type": obj["type"]}
+        if "arcs" in obj:
+            g["arcs"] = obj["arcs"]
+        elif "coordinates" in obj:
+            g["coordinates"] = coarse(obj["coordinates"]).tolist()
+        else:
+            g["type"] = None  # unsupported / empty geometry
+        if "id" in obj:
+            g["id"] = obj["id"]
+        if obj["properties"]:
+            g["properties"] = obj["properties"]
+        geometries.append(g)
+
+    kx, ky, tx, ty = topology.transform
+    return {
+        "type": "Topology",
+        "transform": {"scale": [kx * factor, ky * factor], "translate": [tx, ty]},
+        "objects": {name: {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": encoded,
+    }
+
+
+def decode_topojson(doc, name=None):
+    """Decode a TopoJSON document written by encode_topojson back into a Topology."""
+    t = doc.get("transform")
+    if not t:
+        raise ValueError("Only quantized TopoJSON (with a transform) is supported.")
+    transform = (t["scale"][0], t["scale"][1], t["translate"][0], t["translate"][1])
+    arcs = []
+    for arc in doc.get("arcs", []):
+        a = np.cumsum(np.asarray(arc, dtype=np.int64).reshape(-1, 2), axis=0)
+        arcs.append([tuple(p) for p in a.tolist()])
+
+    name = name or next(iter(doc["objects"]))
+    objects = []
+    for g in doc["objects"][name].get("geometries", []):
+        obj = {"type": g.get("type"), "properties": g.get("properties") or {}}
+        if "id" in g:
+            obj["id"] = g["id"]
+        if "arcs" in g:
+            obj["arcs"] = g["arcs"]
+        elif "coordinates" in g:
+            obj["coordinates"] = g["coordinates"]
+        else:
+            obj["geometry"] = None
+        objects.append(obj)
+    return Topology(arcs, objects, transform)
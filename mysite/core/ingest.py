@@ -0,0 +1,152 @@
+# core/ingest.py
+"""
+Row validation and bulk upsert shared by the import_entries command and the
+batch forecast endpoint. District codes are resolved from a preloaded
+{code: id} dict, so validating a row never queries the database.
+"""
+import csv
+import json
+import math
+from itertools import islice
+
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ForecastEntry
+
+KEY_FIELDS = ["district", "date", "horizon"]
+# columns mapped onto model fields; anything else in a row goes into 'extras'
+KNOWN_COLUMNS = {"district", "district_code", "code", "date", "horizon", "rainfall_mm",
+                 "rainfall_category", "extras", "source", "version", "observed_at"}
+MAX_HORIZON = 7
+# CharFields checked against their max_length here: the upsert skips model validation
+TEXT_COLUMNS = {ForecastEntry: ("rainfall_category", "source", "version")}
+
+
+def read_rows(path, fmt):
+    """Yield one dict per CSV/NDJSON input row without loading the whole file."""
+    with open(path, newline="", encoding="utf8") as fh:
+        if fmt == "csv":
+            yield from csv.DictReader(fh)
+        else:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def file_format(path):
+    return "csv" if path.lower().endswith(".csv") else "ndjson"
+
+
+def build_entry(model, row, districts, default_source=None):
+    """
+    Validate one input row. Returns (unsaved entry, None) or (None, {field: message}).
+    """
+    errors = {}
+    code = str(row.get("district_code") or row.get("district") or row.get("code") or "").strip()
+    district_id = districts.get(code)
+    if district_id is None:
+        errors["district"] = f"Unknown district code '{code}'." if code else "This field is required."
+    try:
+        d = parse_date(str(row.get("date") or "").strip())
+    except ValueError:  # well formed but impossible, e.g. 2025-02-30
+        errors["date"] = "Not a valid date."
+    else:
+        if d is None:
+            errors["date"] = "Use YYYY-MM-DD."
+    horizon = row.get("horizon")
+    try:
+        # only a missing/blank horizon takes the model default; 0 is an error, not "1"
+        if horizon in (None, ""):
+            horizon = 1
+        elif isinstance(horizon, bool) or isinstance(horizon, float) and not horizon.is_integer():
+            raise ValueError(horizon)
+        else:
+            horizon = int(horizon)
+        if not 1 <= horizon <= MAX_HORIZON:
+            errors["horizon"] = f"Must be between 1 and {MAX_HORIZON}."
+    except (TypeError, ValueError):
+        errors["horizon"] = "Must be an integer."
+    try:
+        rain = row.get("rainfall_mm")
+        if isinstance(rain, bool):
+            raise ValueError(rain)
+        rain = float(rain) if rain not in (None, "") else None
+        if rain is not None and not math.isfinite(rain):
+            raise ValueError(rain)
+    except (TypeError, ValueError):
+        errors["rainfall_mm"] = "Must be a finite number."
+    text = {}
+    for name in TEXT_COLUMNS.get(model, ("rainfall_category",)):
+        value = row.get(name)
+        text[name] = None if value in (None, "") else str(value)
+        limit = model._meta.get_field(name).max_length
+        if text[name] is not None and len(text[name]) > limit:
+            errors[name] = f"At most {limit} characters."
+
+    extras = row.get("extras") or {}
+    if isinstance(extras, str):
+        try:
+            extras = json.loads(extras)
+        except ValueError:
+            errors["extras"] = "Must be a JSON object."
+    if not isinstance(extras, dict):
+        errors["extras"] = "Must be a JSON object."
+    observed = None
+    if model is not ForecastEntry and row.get("observed_at"):
+        try:
+            observed = parse_datetime(str(row["observed_at"]).strip())
+        except ValueError:
+            observed = None
+        if observed is None:
+            errors["observed_at"] = "Use an ISO 8601 date and time."
+    if errors:
+        return None, errors
+    extras.update({k: v for k, v in row.items() if k not in KNOWN_COLUMNS and v not in (None, "")})
+
+    obj = model(district_id=district_id, date=d, horizon=horizon, rainfall_mm=rain,
+                rainfall_category=text["rainfall_category"], extras=extras)
+    if model is ForecastEntry:
+        obj.source = text["source"] or default_source or "bulk"
+        obj.version = text["version"]
+    else:
+        obj.observed_at = observed
+    return obj, None
+
+
+def upsert_entries(model, objs, update_entered_by=False):
+    """
+    Insert-or-update ``objs`` on (district, date, horizon) with one bulk
+    statement per batch inside a transaction. entered_at keeps the original
+    insert time; modified_at moves so incremental verification sees the change.
+    """
+    excluded = {"entered_at", *KEY_FIELDS}
+    if not update_entered_by:
+        excluded.add("entered_by")
+    update_fields = [f.name for f in model._meta.concrete_fields if not f.primary_key and f.name not in excluded]
+    kwargs = {"update_conflicts": True, "update_fields": update_fields}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs["unique_fields"] = KEY_FIELDS
+    with transaction.atomic():
+        model.objects.bulk_create(objs, **kwargs)
+    return len(objs)
+
+
+def existing_ids(model, keys):
+    """{(district_id, date, horizon): id} for the given keys that already exist."""
+    if not keys:
+        return {}
+    district_ids, dates, horizons = (set(col) for col in zip(*keys))
+    rows = (model.objects.filter(district_id__in=district_ids, date__in=dates, horizon__in=horizons)
+            .values_list("district_id", "date", "horizon", "id"))
+    return {(d, day, h): pk for d, day, h, pk in rows if (d, day, h) in keys}
@@ -0,0 +1,38 @@
+# core/management/commands/backfill_map_areas.py
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from core.map_areas import MAX_AREA_ID, sync_map_forecast_areas
+from core.models import MapForecast
+
+
+class Command(BaseCommand):
+    help = "Rebuild MapForecastArea rows from MapForecast.data (all dates, or --start/--end)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=str, help="YYYY-MM-DD (inclusive)")
+        parser.add_argument("--end", type=str, help="YYYY-MM-DD (inclusive)")
+
+    def handle(self, *args, **options):
+        qs = MapForecast.objects.order_by("date")
+        for key, lookup in (("start", "date__gte"), ("end", "date__lte")):
+            if options[key]:
+                d = parse_date(options[key])
+                if d is None:
+                    raise CommandError(f"Invalid --{key} date. Use YYYY-MM-DD.")
+                qs = qs.filter(**{lookup: d})
+
+        forecasts = areas = 0
+        for pk, d in qs.values_list("id", "date").iterator():
+            with transaction.atomic():
+                # lock the row so a concurrent save can't interleave with the rebuild
+                data = MapForecast.objects.select_for_update().filter(pk=pk).values_list("data", flat=True).first()
+                if data is None:
+                    continue
+                skipped = sync_map_forecast_areas(pk, d, data)
+            if skipped:
+                self.stderr.write(f"{d}: skipped {len(skipped)} area ids longer than {MAX_AREA_ID} characters, "
+                                  f"e.g. {skipped[0][:80]}")
+            forecasts += 1
+            areas += len(data) - len(skipped)
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {areas} areas for {forecasts} map forecasts"))
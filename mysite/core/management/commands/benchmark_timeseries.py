@@ -0,0 +1,100 @@
+# core/management/commands/benchmark_timeseries.py
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from core.districts import district_registry
+from core.models import District, ForecastEntry
+from core.timeseries import series_queryset
+
+INDEX_NAME = "core_forecastentry_dhd"
+SYNTHETIC_PREFIX = "BENCH_"
+
+
+class Command(BaseCommand):
+    help = ("Time the per-district time-series query and show its plan. --populate fills ForecastEntry with "
+            "synthetic rows first; --compare drops and re-creates the (district, horizon, date) index "
+            "to measure the query without it. Run against a scratch database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--populate", action="store_true", help="insert synthetic BENCH_* districts/forecasts")
+        parser.add_argument("--districts", type=int, default=700)
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument("--horizons", type=int, default=5)
+        parser.add_argument("--window", type=int, default=90, help="days per time-series query")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--compare", action="store_true",
+                            help="also measure with the (district, horizon, date) index dropped")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options["populate"]:
+            self.populate(options)
+        keys = list(ForecastEntry.objects.values_list("district_id", "horizon").distinct()[:5000])
+        bounds = ForecastEntry.objects.order_by("date").values_list("date", flat=True)
+        if not keys:
+            raise CommandError("ForecastEntry is empty; use --populate.")
+        first, last = bounds.first(), bounds.last()
+        self.stdout.write(f"{ForecastEntry.objects.count()} forecast rows, {first}..{last}")
+
+        rng = random.Random(options["seed"])
+        window = timedelta(days=options["window"] - 1)
+        span = max(0, (last - first - window).days)
+        plan = [(rng.choice(keys), first + timedelta(days=rng.randint(0, span))) for _ in range(options["queries"])]
+
+        self.measure("with index", plan, window)
+        if options["compare"]:
+            index = next(i for i in ForecastEntry._meta.indexes if i.name == INDEX_NAME)
+            with connection.schema_editor() as editor:
+                editor.remove_index(ForecastEntry, index)
+            try:
+                self.measure("without index", plan, window)
+            finally:
+                with connection.schema_editor() as editor:
+                    editor.add_index(ForecastEntry, index)
+
+    def measure(self, label, plan, window):
+        (district_id, horizon), start = plan[0]
+        qs = series_queryset(ForecastEntry, district_id, horizon, start, start + window)
+        self.stdout.write(f"\n[{label}] plan:\n{qs.explain()}")
+        timings, rows = [], 0
+        for (district_id, horizon), start in plan:
+            t0 = time.perf_counter()
+            rows += len(list(series_queryset(ForecastEntry, district_id, horizon, start, start + window)))
+            timings.append((time.perf_counter() - t0) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+        self.stdout.write(f"[{label}] {len(timings)} queries, {rows / len(timings):.0f} rows each: "
+                          f"median {statistics.median(timings):.2f} ms, p95 {p95:.2f} ms")
+
+    def populate(self, options):
+        t0 = time.perf_counter()
+        existing = set(District.objects.filter(code__startswith=SYNTHETIC_PREFIX).values_list("code", flat=True))
+        District.objects.bulk_create([
+            District(code=f"{SYNTHETIC_PREFIX}{i:05d}", name=f"Bench {i}")
+            for i in range(options["districts"]) if f"{SYNTHETIC_PREFIX}{i:05d}" not in existing
+        ])
+        district_registry.invalidate()
+        ids = [d.id for d in district_registry.all() if d.code.startswith(SYNTHETIC_PREFIX)]
+        ForecastEntry.objects.filter(district_id__in=ids).delete()
+
+        rng = random.Random(options["seed"])
+        start = date(2020, 1, 1)
+        batch, total = [], 0
+        with transaction.atomic():
+            for day in range(options["days"]):
+                d = start + timedelta(days=day)
+                for district_id in ids:
+                    for horizon in range(1, options["horizons"] + 1):
+                        batch.append(ForecastEntry(district_id=district_id, date=d, horizon=horizon,
+                                                   rainfall_mm=round(rng.expovariate(0.2), 1), source="bench"))
+                if len(batch) >= 20000:
+                    ForecastEntry.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            ForecastEntry.objects.bulk_create(batch)
+            total += len(batch)
+        self.stdout.write(f"populated {total} rows in {time.perf_counter() - t0:.1f}s")
@@ -0,0 +1,128 @@
+# core/management/commands/build_geojson.py
+import gzip
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.geometry import DEFAULT_QUANTIZATION, build_topology, encode_topojson, simplify_arcs, to_geojson
+
+try:
+    import brotli
+except ImportError:  # optional: only .gz files are written without it
+    brotli = None
+
+STATIC_ROOT_DIR = Path(settings.BASE_DIR) / "core" / "static"
+BUILD_DIR = "geojson/build"
+MANIFEST = "manifest.json"
+
+# (band, max Leaflet zoom served, simplification tolerance in degrees, output decimals)
+ZOOM_BANDS = [
+    ("z5", 5, 0.02, 3),     # country / state level
+    ("z7", 7, 0.005, 4),
+    ("z9", 9, 0.001, 4),
+    ("full", None, 0, 5),  # only quantized
+]
+
+
+def count_vertices(fc):
+    def walk(c):
+        if c and isinstance(c[0], (int, float)):
+            return 1
+        return sum(walk(x) for x in c)
+    return sum(walk(f["geometry"]["coordinates"]) for f in fc["features"]
+               if f.get("geometry") and "coordinates" in f["geometry"])
+
+
+def write_compressed(name, body):
+    """Write ``body`` plus .gz (and .br) copies; return manifest fields for them."""
+    (STATIC_ROOT_DIR / name).write_bytes(body)
+    gz = gzip.compress(body, compresslevel=9, mtime=0)
+    (STATIC_ROOT_DIR / (name + ".gz")).write_bytes(gz)
+    out = {"gzip_file": name + ".gz", "gzip_bytes": len(gz)}
+    if brotli is not None:
+        br = brotli.compress(body, quality=11)
+        (STATIC_ROOT_DIR / (name + ".br")).write_bytes(br)
+        out.update(br_file=name + ".br", br_bytes=len(br))
+    return out
+
+
+def hashed_name(stem, band, body, ext):
+    return f"{BUILD_DIR}/{stem}.{band}.{hashlib.sha256(body).hexdigest()[:10]}.{ext}"
+
+
+class Command(BaseCommand):
+    help = ("Build simplified, quantized GeoJSON (and TopoJSON) variants per zoom band with "
+            "content-hashed, pre-compressed files and a manifest under static/geojson/build/.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", type=str,
+                            default=str(STATIC_ROOT_DIR / "geojson" / "combined_regions.geojson"),
+                            help="source GeoJSON FeatureCollection")
+        parser.add_argument("--quantization", type=int, default=DEFAULT_QUANTIZATION)
+        parser.add_argument("--no-topojson", action="store_true",
+                            help="skip the delta-encoded TopoJSON copy of each variant")
+        parser.add_argument("--benchmark", action="store_true",
+                            help="also report parse time per variant")
+
+    def handle(self, *args, **options):
+        source = Path(options["source"])
+        if not source.exists():
+            raise CommandError(f"Source GeoJSON not found: {source}")
+        stem = source.name.split(".")[0]
+        out_dir = STATIC_ROOT_DIR / BUILD_DIR
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        t0 = time.perf_counter()
+        with open(source, encoding="utf8") as fh:
+            collection = json.load(fh)
+        topo = build_topology(collection, options["quantization"])
+        kx, ky = topo.transform[:2]
+        self.stdout.write(f"topology: {len(topo.arcs)} arcs, {topo.vertex_count()} vertices "
+                          f"in {time.perf_counter() - t0:.2f}s")
+
+        manifest_path = out_dir / MANIFEST
+        manifest = json.loads(manifest_path.read_text(encoding="utf8")) if manifest_path.exists() else {}
+        # drop the files of the previous build of this source
+        for variant in manifest.get(stem, {}).get("variants", []):
+            for key in ("file", "gzip_file", "br_file", "topojson_file", "topojson_gzip_file", "topojson_br_file"):
+                if variant.get(key):
+                    (STATIC_ROOT_DIR / variant[key]).unlink(missing_ok=True)
+
+        variants = []
+        for band, max_zoom, tolerance, decimals in ZOOM_BANDS:
+            arcs = simplify_arcs(topo.arcs, tolerance / ((kx + ky) / 2))
+            fc = to_geojson(topo, arcs, decimals=decimals)
+            body = json.dumps(fc, separators=(",", ":"), ensure_ascii=False).encode("utf8")
+            name = hashed_name(stem, band, body, "geojson")
+            variant = {"band": band, "max_zoom": max_zoom, "file": name, "bytes": len(body),
+                       "vertices": count_vertices(fc)}
+            variant.update(write_compressed(name, body))
+
+            line = (f"{band:>5}: {variant['vertices']:>9} vertices  {len(body):>10} B  "
+                    f"gz {variant['gzip_bytes']:>9} B" + (f"  br {variant['br_bytes']:>9} B" if brotli else ""))
+
+            if not options["no_topojson"]:
+                # match the grid to the band's output precision
+                factor = max(1, int(10 ** -decimals / max(kx, ky)))
+                topo_body = json.dumps(encode_topojson(topo, arcs, name=stem, factor=factor), separators=(",", ":"),
+                                       ensure_ascii=False).encode("utf8")
+                topo_name = hashed_name(stem, band, topo_body, "topojson")
+                variant.update(topojson_file=topo_name, topojson_bytes=len(topo_body))
+                variant.update({"topojson_" + k: v for k, v in write_compressed(topo_name, topo_body).items()})
+                line += f"  | topojson {len(topo_body):>9} B  gz {variant['topojson_gzip_bytes']:>8} B"
+            variants.append(variant)
+
+            if options["benchmark"]:
+                runs = 5
+                t1 = time.perf_counter()
+                for _ in range(runs):
+                    json.loads(body)
+                line += f"  parse {(time.perf_counter() - t1) / runs * 1000:.1f} ms"
+            self.stdout.write(line)
+
+        manifest[stem] = {"source": source.name, "variants": variants}
+        manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf8")
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(variants)} variants and {manifest_path}"))
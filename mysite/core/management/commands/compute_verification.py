@@ -1,9 +1,14 @@
 # core/management/commands/compute_verification.py
 from django.core.management.base import BaseCommand
-from django.db.models import F
-from core.models import ForecastEntry, RealizedEntry, VerificationScore, District
-from datetime import date, timedelta
-import math
+from django.utils import timezone
+from core.districts import district_registry
+from core.models import VerificationWatermark
+from core.multicategory import contingency_tables, fetch_category_pairs, save_category_scores
+from core.verification import (
+    IMD_THRESHOLDS, WATERMARK_LAG, fetch_pairs, score_pairs, score_parallel, save_scores, changed_cells, cell_mask,
+)
+from datetime import datetime
+import time
 
 class Command(BaseCommand):
     help = "Compute simple verification metrics for forecasts vs realized."
@@ -12,62 +17,103 @@ class Command(BaseCommand):
         parser.add_argument("--start", type=str, help="start date YYYY-MM-DD", required=True)
         parser.add_argument("--end", type=str, help="end date YYYY-MM-DD", required=True)
         parser.add_argument("--horizon", type=int, default=1)
+        parser.add_argument("--all-horizons", action="store_true",
+                            help="score every horizon present in the range (ignores --horizon)")
+        parser.add_argument("--incremental", action="store_true",
+                            help="only rescore district/horizon cells with entries newer than the last run "
+                                 "(deleting an entry through the ORM forces the next run to rescore everything; "
+                                 "after raw SQL deletes run once without --incremental)")
+        parser.add_argument("--workers", type=int, default=1,
+                            help="score district shards in this many worker processes")
+        parser.add_argument("--threshold", type=float, action="append",
+                            help="event threshold in mm (repeatable; default: "
+                                 f"{', '.join(f'{t:g}' for t in IMD_THRESHOLDS)})")
+        parser.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                            help="also store bootstrap confidence intervals from N resamples per group")
+        parser.add_argument("--confidence", type=float, default=0.95)
+        parser.add_argument("--seed", type=int, default=0, help="bootstrap random seed")
+        parser.add_argument("--categories", action="store_true",
+                            help="verify the map's DRY/ISOL/SCT/FWS/WS categories instead (MC_PC, MC_HSS, MC_GSS)")
 
     def handle(self, *args, **options):
-        start = options["start"]
-        end = options["end"]
-        horizon = options["horizon"]
-        from datetime import datetime
-        start_d = datetime.fromisoformat(start).date()
-        end_d = datetime.fromisoformat(end).date()
-
-        # iterate districts
-        districts = District.objects.all()
-        threshold = 2.5  # mm threshold for event
-        for d in districts:
-            # pair forecasts and realized by date
-            f_qs = ForecastEntry.objects.filter(district=d, horizon=horizon, date__range=(start_d, end_d))
-            r_qs = RealizedEntry.objects.filter(district=d, horizon=horizon, date__range=(start_d, end_d))
-
-            # map by date
-            f_map = {f.date: f for f in f_qs}
-            r_map = {r.date: r for r in r_qs}
-            paired_dates = set(f_map.keys()) & set(r_map.keys())
-            if not paired_dates:
-                continue
-
-            abs_errors = []
-            H = F = M = 0
-            for dt in paired_dates:
-                fval = f_map[dt].rainfall_mm or 0.0
-                oval = r_map[dt].rainfall_mm or 0.0
-                abs_errors.append(abs(fval - oval))
-                f_evt = fval >= threshold
-                o_evt = oval >= threshold
-                if f_evt and o_evt:
-                    H += 1
-                elif f_evt and not o_evt:
-                    F += 1
-                elif not f_evt and o_evt:
-                    M += 1
-
-            mae = sum(abs_errors)/len(abs_errors) if abs_errors else None
-            csi = H / (H+F+M) if (H+F+M) else None
-            pod = H / (H+M) if (H+M) else None
-            far = F / (H+F) if (H+F) else None
-
-            # store VerificationScore records
-            if mae is not None:
-                VerificationScore.objects.create(date=end_d, horizon=horizon,
-                    metric="MAE", district=d, value=mae)
-            if pod is not None:
-                VerificationScore.objects.create(date=end_d, horizon=horizon,
-                    metric="POD", district=d, value=pod)
-            if far is not None:
-                VerificationScore.objects.create(date=end_d, horizon=horizon,
-                    metric="FAR", district=d, value=far)
-            if csi is not None:
-                VerificationScore.objects.create(date=end_d, horizon=horizon,
-                    metric="CSI", district=d, value=csi)
+        start_d = datetime.fromisoformat(options["start"]).date()
+        end_d = datetime.fromisoformat(options["end"]).date()
+        horizons = None if options["all_horizons"] else [options["horizon"]]
+        thresholds = sorted(options["threshold"] or IMD_THRESHOLDS)
+        bootstrap = {"n_resamples": options["bootstrap"], "confidence": options["confidence"],
+                     "seed": options["seed"]}
+        run_started = timezone.now()
 
+        if options["categories"]:
+            self.handle_categories(start_d, end_d, options["horizon"])
+            return
+
+        # incremental runs only look at cells touched since the stored watermark
+        cells = None
+        mark = VerificationWatermark.objects.filter(
+            start=start_d, end=end_d, horizon=0 if horizons is None else horizons[0],
+        ).first()
+        if options["incremental"] and mark:
+            t0 = time.perf_counter()
+            cells = changed_cells(start_d, end_d, mark.watermark, horizons=horizons)
+            self._stage("changes", t0, f"{len(cells)} changed cells since {mark.watermark.isoformat()}")
+            if not cells:
+                self._save_watermark(start_d, end_d, horizons, run_started)
+                self.stdout.write(self.style.SUCCESS("Verification up to date."))
+                return
+
+        fetch_horizons = horizons if cells is None else {h for _, h in cells}
+        district_ids = None if cells is None else {d for d, _ in cells}
+
+        if options["workers"] > 1:
+            # fetch + score district shards in a process pool, merged in the parent
+            t0 = time.perf_counter()
+            if district_ids is None:
+                district_ids = district_registry.ids()
+            scores = score_parallel(start_d, end_d, district_ids, horizons=fetch_horizons,
+                                    workers=options["workers"], thresholds=thresholds, **bootstrap)
+            self._stage("fetch+score", t0, f"{len(scores)} district/horizon groups on {options['workers']} workers")
+        else:
+            # one joined query for all forecast/realized pairs in the range
+            t0 = time.perf_counter()
+            pairs = fetch_pairs(start_d, end_d, horizons=fetch_horizons, district_ids=district_ids)
+            self._stage("fetch", t0, f"{len(pairs)} pairs")
+
+            # score every district x horizon group and threshold at once
+            t0 = time.perf_counter()
+            scores = score_pairs(pairs, thresholds, **bootstrap)
+            self._stage("score", t0, f"{len(scores)} district/horizon groups")
+
+        if cells is not None:
+            scores = scores.select(cell_mask(scores, cells))
+
+        # store VerificationScore records
+        t0 = time.perf_counter()
+        written = save_scores(scores, end_d)
+        self._stage("write", t0, f"{written} scores")
+
+        self._save_watermark(start_d, end_d, horizons, run_started)
         self.stdout.write(self.style.SUCCESS("Verification compute done."))
+
+    def handle_categories(self, start_d, end_d, horizon):
+        t0 = time.perf_counter()
+        pairs = fetch_category_pairs(start_d, end_d, horizon=horizon)
+        self._stage("fetch", t0, f"{len(pairs)} area/date pairs")
+
+        t0 = time.perf_counter()
+        tables = contingency_tables(pairs)
+        self._stage("score", t0, f"{len(tables)} areas")
+
+        t0 = time.perf_counter()
+        written = save_category_scores(pairs, tables, end_d, horizon)
+        self._stage("write", t0, f"{written} scores")
+        self.stdout.write(self.style.SUCCESS("Category verification done."))
+
+    def _save_watermark(self, start_d, end_d, horizons, run_started):
+        VerificationWatermark.objects.update_or_create(
+            start=start_d, end=end_d, horizon=0 if horizons is None else horizons[0],
+            defaults={"watermark": run_started - WATERMARK_LAG},
+        )
+
+    def _stage(self, name, t0, detail):
+        self.stdout.write(f"{name}: {detail} in {time.perf_counter() - t0:.3f}s")
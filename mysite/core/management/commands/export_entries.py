@@ -0,0 +1,48 @@
+# core/management/commands/export_entries.py
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.export import FORMATS, KINDS, parse_filters, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream a date/horizon/district filtered slice of forecasts or observations as CSV, NDJSON or columnar."
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=list(KINDS))
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--date", type=str, help="single date YYYY-MM-DD")
+        parser.add_argument("--start", type=str, help="YYYY-MM-DD (inclusive)")
+        parser.add_argument("--end", type=str, help="YYYY-MM-DD (inclusive)")
+        parser.add_argument("--horizon", type=str, help="horizon or comma separated horizons")
+        parser.add_argument("--district", type=str, help="district code or comma separated codes")
+        parser.add_argument("--output", "-o", type=str, help="output file (default: stdout)")
+
+    def handle(self, *args, **options):
+        try:
+            kind, fmt, filters = parse_filters(options)
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        binary = fmt == "columnar"
+        if options["output"]:
+            out = open(options["output"], "wb") if binary else open(options["output"], "w", encoding="utf8", newline="")
+            write = out.write
+        elif binary:
+            write = sys.stdout.buffer.write
+        else:
+            write = lambda chunk: self.stdout.write(chunk, ending="")  # noqa: E731
+        t0 = time.perf_counter()
+        written = 0
+        try:
+            for chunk in stream_export(kind, fmt, filters):
+                write(chunk)
+                written += len(chunk)
+        finally:
+            if options["output"]:
+                out.close()
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(
+                f"Wrote {written} {'bytes' if binary else 'chars'} to {options['output']} "
+                f"in {time.perf_counter() - t0:.2f}s"))
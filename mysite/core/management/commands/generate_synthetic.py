@@ -0,0 +1,111 @@
+# core/management/commands/generate_synthetic.py
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+from core.districts import district_registry
+from core.map_areas import sync_map_forecast_areas
+from core.models import District, ForecastEntry, MapForecast, RealizedEntry
+from core.multicategory import CATEGORIES, rainfall_codes
+
+CODE_PREFIX = "SYN_"
+
+
+def map_category(mm):
+    # map categories by forecast rainfall; used only to give the synthetic maps a realistic mix
+    return CATEGORIES[int(rainfall_codes(mm))]
+
+
+def synthetic_rainfall(rng, n_districts, n_days, n_horizons):
+    """
+    Observed and forecast rainfall arrays of shape (days, districts) and
+    (days, districts, horizons): wet days are gamma distributed, and forecast
+    error grows with the horizon.
+    """
+    wet = rng.random((n_days, n_districts)) < 0.45
+    obs = np.where(wet, rng.gamma(0.8, 12.0, (n_days, n_districts)), 0.0)
+    spread = 0.25 + 0.15 * np.arange(1, n_horizons + 1)
+    noise = rng.lognormal(0.0, spread[None, None, :], (n_days, n_districts, n_horizons))
+    missed = rng.random((n_days, n_districts, n_horizons)) < 0.08 * spread
+    fcst = np.where(missed, rng.exponential(1.0, noise.shape), obs[:, :, None] * noise)
+    return np.round(obs, 1), np.round(fcst, 1)
+
+
+class Command(BaseCommand):
+    help = ("Create N districts x D days x H horizons of synthetic ForecastEntry/RealizedEntry rows "
+            "(and one MapForecast per day, replacing any map on those dates) with a fixed seed. "
+            "Districts are coded SYN_00000...; meant for scratch databases.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--districts", type=int, default=50)
+        parser.add_argument("--days", type=int, default=90)
+        parser.add_argument("--horizons", type=int, default=7)
+        parser.add_argument("--start", type=str, default="2024-06-01", help="first date YYYY-MM-DD")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--no-map", action="store_true", help="skip MapForecast rows")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"])
+        except ValueError:
+            raise CommandError("Invalid --start date. Use YYYY-MM-DD.")
+        n_districts, n_days, n_horizons = options["districts"], options["days"], options["horizons"]
+        batch_size = options["batch_size"]
+        rng = np.random.default_rng(options["seed"])
+        obs, fcst = synthetic_rainfall(rng, n_districts, n_days, n_horizons)
+        dates = [start + timedelta(days=i) for i in range(n_days)]
+
+        t0 = time.perf_counter()
+        with transaction.atomic():
+            # re-running replaces the previous synthetic data set
+            old = District.objects.filter(code__startswith=CODE_PREFIX)
+            ForecastEntry.objects.filter(district__in=old).delete()
+            RealizedEntry.objects.filter(district__in=old).delete()
+            codes = [f"{CODE_PREFIX}{i:05d}" for i in range(n_districts)]
+            existing = set(old.values_list("code", flat=True))
+            District.objects.bulk_create([District(code=c, name=f"Synthetic {c[len(CODE_PREFIX):]}")
+                                          for c in codes if c not in existing], batch_size=batch_size)
+            district_registry.invalidate()
+            ids = district_registry.code_to_id()
+            district_ids = [ids[c] for c in codes]
+
+            realized, forecasts = [], []
+            for i, d in enumerate(dates):
+                for j, district_id in enumerate(district_ids):
+                    for h in range(n_horizons):
+                        realized.append(RealizedEntry(district_id=district_id, date=d, horizon=h + 1,
+                                                      rainfall_mm=float(obs[i, j])))
+                        forecasts.append(ForecastEntry(district_id=district_id, date=d, horizon=h + 1,
+                                                       rainfall_mm=float(fcst[i, j, h]), source="synthetic"))
+                if len(forecasts) >= batch_size:
+                    RealizedEntry.objects.bulk_create(realized, batch_size=batch_size)
+                    ForecastEntry.objects.bulk_create(forecasts, batch_size=batch_size)
+                    realized, forecasts = [], []
+            RealizedEntry.objects.bulk_create(realized, batch_size=batch_size)
+            ForecastEntry.objects.bulk_create(forecasts, batch_size=batch_size)
+
+            maps = 0
+            if not options["no_map"]:
+                for i, d in enumerate(dates):
+                    # the day-1 forecast drives the map
+                    data = {c: {"category": map_category(fcst[i, j, 0]), "rainfall_mm": float(fcst[i, j, 0])}
+                            for j, c in enumerate(codes)}
+                    obj = MapForecast.objects.select_for_update().filter(date=d).first() or MapForecast(date=d)
+                    obj.data, obj.scope = data, "district"
+                    # a new revision, so editors holding the old map get a 409 instead of overwriting this one
+                    obj.revision = F("revision") + 1 if obj.pk else 1
+                    obj.save()
+                    sync_map_forecast_areas(obj.id, d, data)
+                    maps += 1
+
+        # again after commit, for processes that reloaded in between
+        district_registry.invalidate()
+        rows = 2 * n_days * n_districts * n_horizons
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {n_districts} districts, {rows} entries and {maps} map forecasts "
+            f"in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} entries/s)"))
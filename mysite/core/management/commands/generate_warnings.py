@@ -0,0 +1,47 @@
+# core/management/commands/generate_warnings.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.districts import district_registry
+from core.warning_rules import generate_warnings, load_rules
+
+
+class Command(BaseCommand):
+    help = ("Issue, update and clear rule-based WarningEntry rows from the forecasts dated in "
+            "[--start, --end] (every district and horizon), using settings.WARNING_RULES or --rules. "
+            "Manual warnings are left alone.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start", type=str, help="start date YYYY-MM-DD", required=True)
+        parser.add_argument("--end", type=str, help="end date YYYY-MM-DD (default: --start)")
+        parser.add_argument("--rules", type=str, help="JSON file with a list of rules, as in WARNING_RULES")
+        parser.add_argument("--district", action="append", dest="districts", help="district code (repeatable)")
+        parser.add_argument("--dry-run", action="store_true", help="report the changes without writing them")
+
+    def handle(self, *args, **options):
+        start = parse_date(options["start"])
+        end = parse_date(options["end"]) if options["end"] else start
+        if start is None or end is None or end < start:
+            raise CommandError("Use YYYY-MM-DD dates with --end on or after --start.")
+        try:
+            if options["rules"]:
+                with open(options["rules"], encoding="utf8") as fh:
+                    rules = load_rules(json.load(fh))
+            else:
+                rules = load_rules()
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            raise CommandError(f"Invalid rules: {exc}")
+
+        district_ids = None
+        if options["districts"]:
+            code_to_id = district_registry.code_to_id()
+            unknown = [code for code in options["districts"] if code not in code_to_id]
+            if unknown:
+                raise CommandError(f"Unknown district code(s): {', '.join(unknown)}")
+            district_ids = [code_to_id[code] for code in options["districts"]]
+
+        plan = generate_warnings(start, end, rules, district_ids, dry_run=options["dry_run"])
+        summary = " ".join(f"{k}={v}" for k, v in {**plan.counts(), **plan.timings}.items())
+        self.stdout.write(self.style.SUCCESS(f"{'Dry run' if options['dry_run'] else 'Warnings'}: {summary}"))
@@ -1,6 +1,8 @@
 # core/management/commands/import_districts.py
 import csv
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.districts import district_registry
 from core.models import District
 
 class Command(BaseCommand):
@@ -8,11 +10,13 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("csvfile", type=str)
+        parser.add_argument("--bulk", action="store_true",
+                            help="diff against existing districts in memory and apply with bulk queries in one transaction")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="report what --bulk would create/update without writing (implies --bulk)")
+        parser.add_argument("--batch-size", type=int, default=1000)
 
-    def handle(self, *args, **options):
-        fpath = options["csvfile"]
-        created = 0
-        updated = 0
+    def read_rows(self, fpath):
         with open(fpath, newline="", encoding="utf8") as fh:
             reader = csv.DictReader(fh)
             for row in reader:
@@ -22,12 +26,69 @@ class Command(BaseCommand):
                 if not code or not name:
                     self.stdout.write(self.style.WARNING(f"Skipping row missing code/name: {row}"))
                     continue
-                obj, ok = District.objects.update_or_create(
-                    code=code.strip(),
-                    defaults={"name": name.strip(), "geojson_file": (geo or "").strip()},
-                )
-                if ok:
-                    created += 1
-                else:
-                    updated += 1
+                yield code.strip(), name.strip(), (geo or "").strip()
+
+    def handle(self, *args, **options):
+        if options["bulk"] or options["dry_run"]:
+            return self.handle_bulk(options["csvfile"], options["dry_run"], options["batch_size"])
+
+        created = 0
+        updated = 0
+        for code, name, geo in self.read_rows(options["csvfile"]):
+            obj, ok = District.objects.update_or_create(
+                code=code,
+                defaults={"name": name, "geojson_file": geo},
+            )
+            if ok:
+                created += 1
+            else:
+                updated += 1
         self.stdout.write(self.style.SUCCESS(f"Import done. created={created} updated={updated}"))
+
+    def handle_bulk(self, fpath, dry_run, batch_size):
+        existing = {d.code: d for d in District.objects.only("id", "code", "name", "geojson_file")}
+        original = {code: (d.name, d.geojson_file) for code, d in existing.items()}
+        to_create = {}
+        to_update = {}
+        created = 0
+        updated = 0
+        for code, name, geo in self.read_rows(fpath):
+            # counts match the row-by-row mode: a code seen before (in DB or earlier in the file) is an update
+            if code in existing or code in to_create:
+                updated += 1
+            else:
+                created += 1
+
+            if code in to_create:
+                to_create[code].name, to_create[code].geojson_file = name, geo
+            elif code in existing:
+                obj = existing[code]
+                if (obj.name, obj.geojson_file) != (name, geo):
+                    obj.name, obj.geojson_file = name, geo
+                    to_update[code] = obj
+            else:
+                to_create[code] = District(code=code, name=name, geojson_file=geo)
+        # a code repeated in the file may end up back at its stored values
+        to_update = {code: obj for code, obj in to_update.items()
+                     if (obj.name, obj.geojson_file) != original[code]}
+
+        if dry_run:
+            for code, obj in to_update.items():
+                old_name, old_geo = original[code]
+                self.stdout.write(f"~ {code}: name {old_name!r} -> {obj.name!r}, "
+                                  f"geojson_file {old_geo!r} -> {obj.geojson_file!r}")
+            for code, obj in to_create.items():
+                self.stdout.write(f"+ {code}: {obj.name!r} geojson_file={obj.geojson_file!r}")
+            self.stdout.write(self.style.WARNING(
+                f"Dry run: created={created} updated={updated} "
+                f"(new rows={len(to_create)}, changed rows={len(to_update)}); nothing written."))
+            return
+
+        with transaction.atomic():
+            District.objects.bulk_create(to_create.values(), batch_size=batch_size)
+            District.objects.bulk_update(to_update.values(), ["name", "geojson_file"], batch_size=batch_size)
+            # bulk writes send no signals
+            transaction.on_commit(district_registry.invalidate)
+        district_registry.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f"Import done. created={created} updated={updated} (changed rows={len(to_update)})"))
@@ -0,0 +1,77 @@
+# core/management/commands/import_entries.py
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.districts import district_registry
+from core.ingest import build_entry, chunked, file_format, read_rows, upsert_entries
+from core.models import ForecastEntry, RealizedEntry
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+MODELS = {"forecast": ForecastEntry, "realized": RealizedEntry}
+
+
+def max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class Command(BaseCommand):
+    help = ("Bulk import ForecastEntry/RealizedEntry rows from CSV or NDJSON files, "
+            "upserting on (district, date, horizon).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(MODELS), help="which table to load")
+        parser.add_argument("files", nargs="+", type=str)
+        parser.add_argument("--format", choices=["csv", "ndjson"],
+                            help="input format (default: from file extension)")
+        parser.add_argument("--chunk-size", type=int, default=5000,
+                            help="rows per bulk upsert / transaction")
+        parser.add_argument("--source", type=str, default=None,
+                            help="ForecastEntry.source for rows that don't carry one")
+
+    def handle(self, *args, **options):
+        self.model = MODELS[options["kind"]]
+        self.default_source = options["source"]
+        # resolve district codes in memory instead of one query per row
+        self.districts = district_registry.code_to_id()
+        self.skipped = 0
+
+        total = 0
+        t0 = time.perf_counter()
+        for path in options["files"]:
+            if not os.path.exists(path):
+                raise CommandError(f"File not found: {path}")
+            fmt = options["format"] or file_format(path)
+            for chunk in chunked(read_rows(path, fmt), options["chunk_size"]):
+                total += self.upsert(chunk)
+            self.stdout.write(f"{path}: {total} rows so far")
+
+        elapsed = time.perf_counter() - t0
+        rss = max_rss_mb()
+        self.stdout.write(self.style.SUCCESS(
+            f"Import done. upserted={total} skipped={self.skipped} "
+            f"in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/s)"
+            + (f", peak RSS {rss:.1f} MB" if rss is not None else "")
+        ))
+
+    def upsert(self, rows):
+        objs = {}
+        for row in rows:
+            obj, errors = build_entry(self.model, row, self.districts, self.default_source)
+            if obj is None:
+                self.skipped += 1
+                continue
+            # last row wins when a key repeats inside a chunk
+            objs[(obj.district_id, obj.date, obj.horizon)] = obj
+        if not objs:
+            return 0
+        return upsert_entries(self.model, list(objs.values()))
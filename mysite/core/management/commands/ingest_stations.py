@@ -0,0 +1,48 @@
+# core/management/commands/ingest_stations.py
+import os
+import time
+from itertools import chain
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ingest import MAX_HORIZON, file_format, read_rows
+from core.stations import ingest_station_rows, relocate_stations
+
+
+class Command(BaseCommand):
+    help = ("Aggregate raw rain-gauge readings (CSV/NDJSON: station, date, rainfall_mm, and lat/lon for "
+            "new stations) into per-district daily RealizedEntry rows: mean, max, station count and "
+            "the spatial-distribution category from the share of wet stations.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", type=str)
+        parser.add_argument("--format", choices=["csv", "ndjson"],
+                            help="input format (default: from file extension)")
+        parser.add_argument("--horizon", type=int, action="append", dest="horizons",
+                            help=f"RealizedEntry horizon to write (repeatable; default 1..{MAX_HORIZON})")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="rows parsed per chunk")
+        parser.add_argument("--relocate", action="store_true",
+                            help="re-resolve every station's district from its lat/lon first")
+
+    def handle(self, *args, **options):
+        for path in options["files"]:
+            if not os.path.exists(path):
+                raise CommandError(f"File not found: {path}")
+        horizons = options["horizons"] or range(1, MAX_HORIZON + 1)
+        if any(not 1 <= h <= MAX_HORIZON for h in horizons):
+            raise CommandError(f"--horizon must be between 1 and {MAX_HORIZON}.")
+
+        t0 = time.perf_counter()
+        if options["relocate"]:
+            self.stdout.write(f"Relocated {relocate_stations()} stations.")
+        rows = chain.from_iterable(read_rows(path, options["format"] or file_format(path))
+                                   for path in options["files"])
+        aggregator, aggregates, written = ingest_station_rows(rows, horizons, options["chunk_size"])
+        elapsed = time.perf_counter() - t0
+
+        skipped = " ".join(f"{k}={v}" for k, v in aggregator.skipped.items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingest done. readings={aggregator.rows} new_stations={aggregator.registered} "
+            f"district_days={len(aggregates)} upserted={written} skipped: {skipped} "
+            f"in {elapsed:.2f}s ({aggregator.rows / elapsed if elapsed else 0:.0f} readings/s)"
+        ))
@@ -0,0 +1,116 @@
+# core/management/commands/loadtest.py
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PATHS = ["/forecast/get_map/?date={date}", "/api/districts/", "/api/forecasts/by_date/?date={date}&horizon=1"]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class Command(BaseCommand):
+    help = ("Closed-loop HTTP load test against a running server (gunicorn/WSGI or uvicorn/ASGI): "
+            "--concurrency keep-alive clients each request the paths round-robin for --duration seconds. "
+            "Prints req/s and p50/p99 latency per path as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("base_url", help="e.g. http://127.0.0.1:8000")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help="path to request (repeatable); {date} is replaced by --date")
+        parser.add_argument("--date", default="2025-07-01")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument("--user", help="log in as this user (a session is created in the database)")
+        parser.add_argument("--label", default="")
+
+    def handle(self, *args, **options):
+        url = urlsplit(options["base_url"])
+        if url.scheme != "http":
+            raise CommandError("Only http:// servers are supported.")
+        paths = [p.format(date=options["date"]) for p in options["paths"] or DEFAULT_PATHS]
+        headers = {"Connection": "keep-alive"}
+        if options["user"]:
+            headers["Cookie"] = f"{settings.SESSION_COOKIE_NAME}={self.session_for(options['user'])}"
+
+        results = {path: [] for path in paths}
+        errors = {path: 0 for path in paths}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options["duration"]
+
+        def client(offset):
+            conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+            i = offset
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                t0 = time.perf_counter()
+                try:
+                    conn.request("GET", path, headers=headers)
+                    response = conn.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+                    ok = False
+                elapsed = (time.perf_counter() - t0) * 1000
+                with lock:
+                    if ok:
+                        results[path].append(elapsed)
+                    else:
+                        errors[path] += 1
+            conn.close()
+
+        t0 = time.perf_counter()
+        threads = [threading.Thread(target=client, args=(n,)) for n in range(options["concurrency"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - t0
+
+        everything = sorted(t for timings in results.values() for t in timings)
+        report = {
+            "label": options["label"],
+            "concurrency": options["concurrency"],
+            "seconds": round(wall, 2),
+            "requests": len(everything),
+            "errors": sum(errors.values()),
+            "req_per_s": round(len(everything) / wall, 1),
+            "p50_ms": round(percentile(everything, 0.50) or 0, 2),
+            "p99_ms": round(percentile(everything, 0.99) or 0, 2),
+            "paths": {},
+        }
+        for path, timings in results.items():
+            timings.sort()
+            report["paths"][path] = {
+                "requests": len(timings),
+                "errors": errors[path],
+                "p50_ms": round(percentile(timings, 0.50) or 0, 2),
+                "p99_ms": round(percentile(timings, 0.99) or 0, 2),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def session_for(self, username):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"No user '{username}'.")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
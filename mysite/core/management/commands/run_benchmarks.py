@@ -0,0 +1,178 @@
+# core/management/commands/run_benchmarks.py
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, timedelta
+from io import StringIO
+
+import django
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+
+def latency(fn, repeat):
+    """Run ``fn`` ``repeat`` times; return {median_ms, p95_ms, min_ms}."""
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "min_ms": round(timings[0], 3),
+    }
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(__file__)).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Benchmark ingest, compute_verification, generate_warnings, map forecast save/get and DRF list latency on a "
+            "throwaway test database filled by generate_synthetic; writes the results as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", type=str, default="benchmark.json")
+        parser.add_argument("--districts", type=int, default=50)
+        parser.add_argument("--days", type=int, default=60)
+        parser.add_argument("--horizons", type=int, default=7)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--repeat", type=int, default=30, help="requests per latency measurement")
+        parser.add_argument("--compare", type=str, help="earlier results JSON to diff against")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "revision": git_revision(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "params": {k: options[k] for k in ("districts", "days", "horizons", "seed", "repeat")},
+            },
+            "results": results,
+        }
+        with open(options["output"], "w", encoding="utf8") as fh:
+            json.dump(report, fh, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        if options["compare"]:
+            self.compare(options["compare"], results)
+
+    def run(self, options):
+        results = {}
+        quiet = StringIO()
+        n_districts, n_days, n_horizons = options["districts"], options["days"], options["horizons"]
+        start = date(2024, 6, 1)
+        end = start + timedelta(days=n_days - 1)
+        entries = 2 * n_districts * n_days * n_horizons
+
+        elapsed = timed(lambda: call_command("generate_synthetic", districts=n_districts, days=n_days,
+                                             horizons=n_horizons, seed=options["seed"], stdout=quiet))
+        results["generate_synthetic"] = {"entries": entries, "seconds": round(elapsed, 3),
+                                         "entries_per_s": round(entries / elapsed)}
+        self.report("generate_synthetic", results)
+
+        # ingest: re-import the forecasts through the CSV upsert path
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "forecast.csv")
+            call_command("export_entries", "forecast", format="csv", output=path, stdout=quiet)
+            elapsed = timed(lambda: call_command("import_entries", "forecast", path, stdout=quiet))
+        rows = entries // 2
+        results["import_entries_csv"] = {"rows": rows, "seconds": round(elapsed, 3), "rows_per_s": round(rows / elapsed)}
+        self.report("import_entries_csv", results)
+
+        elapsed = timed(lambda: call_command("compute_verification", start=str(start), end=str(end),
+                                             all_horizons=True, stdout=quiet))
+        results["compute_verification"] = {"pairs": rows, "seconds": round(elapsed, 3)}
+        # nothing changed since the full run: measures the watermark check alone
+        elapsed = timed(lambda: call_command("compute_verification", start=str(start), end=str(end),
+                                             all_horizons=True, incremental=True, stdout=quiet))
+        results["compute_verification_noop"] = {"seconds": round(elapsed, 3)}
+        self.report("compute_verification", results)
+        self.report("compute_verification_noop", results)
+
+        # rule-based warnings over every forecast, then again with nothing to change
+        elapsed = timed(lambda: call_command("generate_warnings", start=str(start), end=str(end), stdout=quiet))
+        results["generate_warnings"] = {"forecasts": rows, "seconds": round(elapsed, 3)}
+        elapsed = timed(lambda: call_command("generate_warnings", start=str(start), end=str(end), stdout=quiet))
+        results["generate_warnings_noop"] = {"seconds": round(elapsed, 3)}
+        self.report("generate_warnings", results)
+        self.report("generate_warnings_noop", results)
+
+        client = Client()
+        client.force_login(User.objects.create_user("benchmark"))
+        day = str(start + timedelta(days=n_days // 2))
+        results["get_map_forecast"] = latency(
+            lambda: client.get("/forecast/get_map/", {"date": day}), options["repeat"])
+        etag = client.get("/forecast/get_map/", {"date": day})["ETag"]
+        results["get_map_forecast_304"] = latency(
+            lambda: client.get("/forecast/get_map/", {"date": day}, HTTP_IF_NONE_MATCH=etag), options["repeat"])
+
+        body = json.loads(client.get("/forecast/get_map/", {"date": day}).content)["data"]
+        results["save_map_forecast_full"] = latency(
+            lambda: client.post("/forecast/save_map/", {"date": day, "data": body}, content_type="application/json"),
+            options["repeat"])
+        area = next(iter(body))
+        results["save_map_forecast_patch"] = latency(
+            lambda: client.post("/forecast/save_map/", {"date": day, "patch": {area: {"category": "WS"}}},
+                                content_type="application/json"),
+            options["repeat"])
+
+        results["api_forecasts_list"] = latency(lambda: client.get("/api/forecasts/", {"page_size": 100}),
+                                                options["repeat"])
+        results["api_districts_list"] = latency(lambda: client.get("/api/districts/"), options["repeat"])
+
+        # one full issuance: every district x horizon for a day, as one batch upsert
+        codes = [d["code"] for d in client.get("/api/districts/").json()]
+        issuance = [{"district": code, "date": day, "horizon": h, "rainfall_mm": 5.0}
+                    for code in codes for h in range(1, n_horizons + 1)]
+        results["api_forecasts_batch"] = dict(
+            rows=len(issuance),
+            **latency(lambda: client.post("/api/forecasts/batch/", issuance, content_type="application/json"),
+                      options["repeat"]))
+        for name in ("get_map_forecast", "get_map_forecast_304", "save_map_forecast_full",
+                     "save_map_forecast_patch", "api_forecasts_list", "api_districts_list", "api_forecasts_batch"):
+            self.report(name, results)
+        return results
+
+    def report(self, name, results):
+        self.stdout.write(f"{name:<34} " + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    def compare(self, path, results):
+        with open(path, encoding="utf8") as fh:
+            before = json.load(fh)
+        self.stdout.write(f"\nvs {path} ({before['meta'].get('revision')}):")
+        for name, values in results.items():
+            old = before["results"].get(name, {})
+            for key in ("seconds", "median_ms"):
+                if key in values and old.get(key):
+                    change = (values[key] - old[key]) / old[key] * 100
+                    self.stdout.write(f"{name:<34} {key} {old[key]} -> {values[key]} ({change:+.1f}%)")
@@ -0,0 +1,34 @@
+# core/management/commands/update_rollups.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import RollupWatermark
+from core.rollups import PERIODS, save_watermark, update_rollups
+from core.verification import DEFAULT_THRESHOLD
+
+
+class Command(BaseCommand):
+    help = ("Fold new forecast/realized entries into the weekly, monthly and seasonal verification rollups. "
+            "The first run (or --full) rebuilds every bucket, as does the first run after an entry is deleted; "
+            "run with --full after deleting entries with raw SQL.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", choices=PERIODS, action="append",
+                            help="period to update (repeatable; default: all)")
+        parser.add_argument("--threshold", type=float, action="append",
+                            help=f"event threshold in mm (repeatable; default: {DEFAULT_THRESHOLD:g}); "
+                                 "run with --full after changing the set")
+        parser.add_argument("--full", action="store_true", help="rebuild every bucket instead of changed cells")
+
+    def handle(self, *args, **options):
+        thresholds = options["threshold"] or [DEFAULT_THRESHOLD]
+        for period in options["period"] or PERIODS:
+            run_started = timezone.now()
+            mark = None if options["full"] else RollupWatermark.objects.filter(period=period).first()
+            t0 = time.perf_counter()
+            cells, rows = update_rollups(period, since=mark.watermark if mark else None, thresholds=thresholds)
+            save_watermark(period, run_started)
+            mode = f"since {mark.watermark.isoformat()}" if mark else "full"
+            self.stdout.write(f"{period}: {cells} cells, {rows} rows ({mode}) in {time.perf_counter() - t0:.3f}s")
+        self.stdout.write(self.style.SUCCESS("Rollups updated."))
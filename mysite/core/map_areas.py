@@ -0,0 +1,52 @@
+# core/map_areas.py
+"""
+Keeps MapForecastArea (one indexed row per area) in step with MapForecast.data.
+Callers run these inside the transaction that writes the MapForecast row.
+"""
+from .models import MapForecastArea
+
+MAX_AREA_ID = MapForecastArea._meta.get_field("area_id").max_length
+
+
+def invalid_area_ids(area_ids):
+    """The ids in ``area_ids`` too long for MapForecastArea.area_id."""
+    return [str(a) for a in area_ids if len(str(a)) > MAX_AREA_ID]
+
+
+def _rainfall(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def area_row(forecast_id, d, area_id, value):
+    value = value if isinstance(value, dict) else {}
+    category = value.get("category")
+    return MapForecastArea(
+        forecast_id=forecast_id, date=d, area_id=str(area_id),
+        category=str(category) if category not in (None, "") else None,
+        rainfall_mm=_rainfall(value.get("rainfall_mm")),
+    )
+
+
+def sync_map_forecast_areas(forecast_id, d, data, area_ids=None, batch_size=1000):
+    """
+    Rewrite the area rows of one MapForecast from ``data``.
+    With ``area_ids`` (a patch) only those areas are rewritten; ids missing from
+    ``data`` are removed. Ids longer than MAX_AREA_ID get no row (truncating
+    could merge two areas); they are returned so the caller can report them.
+    """
+    qs = MapForecastArea.objects.filter(forecast_id=forecast_id)
+    if area_ids is None:
+        qs.delete()
+        area_ids = data.keys()
+    else:
+        area_ids = [str(a) for a in area_ids]
+        qs.filter(area_id__in=area_ids).delete()
+    skipped = invalid_area_ids(area_ids)
+    MapForecastArea.objects.bulk_create(
+        [area_row(forecast_id, d, a, data[a]) for a in area_ids if a in data and len(a) <= MAX_AREA_ID],
+        batch_size=batch_size,
+    )
+    return skipped
@@ -0,0 +1,330 @@
+# core/map_render.py
+"""
+Static SVG/PNG choropleths of a MapForecast, for bulletins and clients that
+can't run Leaflet.
+
+The map GeoJSON (settings.MAP_RENDER_GEOJSON, the file forecast_entry_map.js
+draws) is read, simplified below pixel size along shared borders and projected
+to Web Mercator once per geometry version: each
+feature's SVG path is built up front, and PNG label rasters (feature index per
+pixel, by scanline fill over all edges at once) are kept per width. A render
+then only looks up each area's category colour. Finished files are cached on
+disk under MAP_RENDER_DIR, named by date, the row's updated_at, the geometry
+version and the width, so a save simply makes the next request render a new
+file; older files for the same date are removed then.
+"""
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils.html import escape
+
+from .geometry import build_topology, simplify_arcs, to_geojson
+from .models import MapForecast
+from .spatial import geometry_polygons
+
+GEOJSON_DIR = Path(settings.BASE_DIR) / "core" / "static" / "geojson"
+MAP_RENDER_GEOJSON = Path(getattr(settings, "MAP_RENDER_GEOJSON", GEOJSON_DIR / "combined_regions.geojson"))
+MAP_RENDER_DIR = Path(getattr(settings, "MAP_RENDER_DIR", Path(settings.BASE_DIR) / "var" / "map_renders"))
+FORMATS = {"svg": "image/svg+xml", "png": "image/png"}
+DEFAULT_WIDTH = 800
+MAX_WIDTH = 4000
+VIEW_WIDTH = 1000.0    # SVG user units across the map
+RENDER_STYLE = 1       # bump when the drawing changes so cached files are not reused
+RASTER_WIDTHS_KEPT = 4
+SIMPLIFY_DEGREES = 0.005  # below a pixel even at MAX_WIDTH across the country
+
+# same colours as rainfallColor in static/js/forecast_entry_map.js; areas without data are DRY there too
+CATEGORY_COLORS = {"DRY": "#d3d3d3", "ISOL": "#a4c2f4", "SCT": "#6fa8dc", "FWS": "#3d85c6", "WS": "#1c4587"}
+DEFAULT_CATEGORY = "DRY"
+DISTRICT_STROKE = "#444444"
+STATE_STROKE = "#111111"
+
+
+class GeometryUnavailable(Exception):
+    pass
+
+
+def area_id(properties):
+    """The MapForecast.data key of a feature, as featureId() in forecast_entry_map.js builds it."""
+    p = properties or {}
+    for key in ("DIST_ID", "dist_id", "DISTCODE", "distcode"):
+        if p.get(key):
+            return f"D_{p[key]}"
+    for key in ("STATE_CODE", "state_code", "STATE", "state"):
+        if p.get(key):
+            return f"S_{p[key]}"
+    if p.get("id"):
+        return str(p["id"])
+    return f"UNK_{p['NAME']}" if p.get("NAME") else None
+
+
+def area_level(properties):
+    p = properties or {}
+    return "district" if any(p.get(k) for k in ("DIST_ID", "dist_id", "DIST_NAME", "dist_name")) else "state"
+
+
+def mercator(lon, lat):
+    lat = np.clip(lat, -85.0, 85.0)
+    return lon, np.degrees(np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)))
+
+
+def _hex(color):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encode_png(pixels, palette, transparent=()):
+    """8-bit palette PNG from an (h, w) array of palette indices."""
+    h, w = pixels.shape
+    rows = np.zeros((h, w + 1), dtype=np.uint8)  # each scanline starts with filter type 0
+    rows[:, 1:] = pixels
+    out = [b"\x89PNG\r\n\x1a\n", _png_chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 3, 0, 0, 0)),
+           _png_chunk(b"PLTE", b"".join(bytes(_hex(c)) for c in palette))]
+    if transparent:
+        out.append(_png_chunk(b"tRNS", bytes(0 if i in transparent else 255 for i in range(len(palette)))))
+    out += [_png_chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)), _png_chunk(b"IEND", b"")]
+    return b"".join(out)
+
+
+class MapGeometry:
+    """Features of the map GeoJSON projected into a VIEW_WIDTH-wide, y-down frame."""
+
+    def __init__(self, features):
+        self.area_ids, self.levels = [], []
+        edges, rings_xy = [], []
+        for feature in features:
+            props = feature.get("properties")
+            aid = area_id(props)
+            polygons = list(geometry_polygons(feature.get("geometry")))
+            if aid is None or not polygons:
+                continue
+            index = len(self.area_ids)
+            self.area_ids.append(aid)
+            self.levels.append(area_level(props))
+            rings = [ring for polygon in polygons for ring in polygon]
+            for ring in rings:
+                if (ring[0] != ring[-1]).any():
+                    ring = np.vstack([ring, ring[:1]])
+                x, y = mercator(ring[:, 0], ring[:, 1])
+                rings_xy.append((index, x, y))
+        if not rings_xy:
+            raise GeometryUnavailable("no polygon features with area ids")
+
+        xs = np.concatenate([x for _, x, _ in rings_xy])
+        ys = np.concatenate([y for _, _, y in rings_xy])
+        x0, y1 = xs.min(), ys.max()
+        scale = VIEW_WIDTH / max(xs.max() - x0, 1e-9)
+        self.view_height = max((y1 - ys.min()) * scale, 1.0)
+
+        ring_paths = [[] for _ in self.area_ids]
+        for index, x, y in rings_xy:
+            px, py = (x - x0) * scale, (y1 - y) * scale
+            edges.append(np.column_stack([px[:-1], py[:-1], px[1:], py[1:], np.full(len(px) - 1, index)]))
+            points = " ".join(f"{a:.1f} {b:.1f}" for a, b in zip(px[:-1], py[:-1]))
+            ring_paths[index].append(f"M{points}Z")
+        self.paths = ["".join(parts) for parts in ring_paths]
+        self.edges = np.concatenate(edges)
+        self.levels = np.asarray(self.levels)
+        self._rasters = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.area_ids)
+
+    def fill_mask(self, scope):
+        """Which features are coloured: states for a state-scope forecast, districts otherwise."""
+        level = "state" if scope == "state" else "district"
+        mask = self.levels == level
+        return mask if mask.any() else np.ones(len(self), dtype=bool)
+
+    def categories(self, data):
+        """Category of every feature from MapForecast.data (unknown or missing -> DEFAULT_CATEGORY)."""
+        out = []
+        for aid in self.area_ids:
+            value = data.get(aid)
+            category = str(value.get("category") or "").upper() if isinstance(value, dict) else ""
+            out.append(category if category in CATEGORY_COLORS else DEFAULT_CATEGORY)
+        return out
+
+    def height_for(self, width):
+        return max(1, int(round(self.view_height * width / VIEW_WIDTH)))
+
+    def svg(self, data, scope, width, title=""):
+        height = self.height_for(width)
+        fill = self.fill_mask(scope)
+        categories = self.categories(data)
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                 f'viewBox="0 0 {VIEW_WIDTH:g} {self.view_height:.1f}">']
+        if title:
+            parts.append(f"<title>{escape(title)}</title>")
+        parts.append(f'<g stroke="{DISTRICT_STROKE}" stroke-width="0.6" stroke-linejoin="round" fill-rule="evenodd">')
+        for i in np.flatnonzero(fill):
+            parts.append(f'<path fill="{CATEGORY_COLORS[categories[i]]}" d="{self.paths[i]}"/>')
+        parts.append("</g>")
+        outlines = np.flatnonzero(~fill)
+        if len(outlines):
+            parts.append(f'<g fill="none" stroke="{STATE_STROKE}" stroke-width="1.2" stroke-linejoin="round">')
+            parts.extend(f'<path d="{self.paths[i]}"/>' for i in outlines)
+            parts.append("</g>")
+        # legend, bottom left, in view units
+        y = self.view_height - 12 * len(CATEGORY_COLORS) - 6
+        parts.append('<g font-family="sans-serif" font-size="10">')
+        for k, (name, color) in enumerate(CATEGORY_COLORS.items()):
+            parts.append(f'<rect x="8" y="{y + 12 * k:.1f}" width="14" height="10" fill="{color}" '
+                         f'stroke="{DISTRICT_STROKE}" stroke-width="0.5"/>'
+                         f'<text x="26" y="{y + 12 * k + 9:.1f}">{name}</text>')
+        parts.append("</g></svg>")
+        return "".join(parts).encode("utf-8")
+
+    def labels(self, width, fill):
+        """(h, w) int32 raster: 1 + index of the filled feature covering each pixel centre, 0 for none, -1 overlaps."""
+        key = (width, fill.tobytes())
+        raster = self._rasters.get(key)
+        if raster is not None:
+            return raster
+        height = self.height_for(width)
+        scale = width / VIEW_WIDTH
+        edges = self.edges[fill[self.edges[:, 4].astype(np.int64)]]
+        x0, y0, x1, y1 = (edges[:, i] * scale for i in range(4))
+        feature = edges[:, 4].astype(np.int64)
+
+        # rows whose centre (r + 0.5) lies in [min(y0, y1), max(y0, y1)) for each edge
+        lo = np.ceil(np.minimum(y0, y1) - 0.5).astype(np.int64)
+        hi = np.ceil(np.maximum(y0, y1) - 0.5).astype(np.int64)
+        lo, hi = np.clip(lo, 0, height), np.clip(hi, 0, height)
+        counts = np.maximum(hi - lo, 0)
+        edge = np.repeat(np.arange(len(edges)), counts)
+        row = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        yc = row + 0.5
+        x = x0[edge] + (yc - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+
+        # crossings of one feature on one row pair up left to right (even-odd rule)
+        order = np.lexsort((x, row, feature[edge]))
+        x, row, f = x[order], row[order], feature[edge][order]
+        start = np.clip(np.ceil(x[0::2] - 0.5), 0, width).astype(np.int64)
+        stop = np.clip(np.ceil(x[1::2] - 0.5), 0, width).astype(np.int64)
+        span_row, span_f = row[0::2], f[0::2] + 1
+        keep = stop > start
+        start, stop, span_row, span_f = start[keep], stop[keep], span_row[keep], span_f[keep]
+
+        # +v at each span start and -v at its end, summed along rows, with v = f + n so that
+        # a pixel's total is label + n * (number of spans covering it)
+        n = len(self) + 1
+        cells = np.concatenate([span_row * (width + 1) + start, span_row * (width + 1) + stop])
+        step = np.bincount(cells, np.concatenate([span_f + n, -(span_f + n)]), minlength=height * (width + 1))
+        total = np.cumsum(step.astype(np.int32).reshape(height, width + 1), axis=1, dtype=np.int32)[:, :width]
+        cover, label = np.divmod(total, n)
+        raster = np.where(cover > 1, -1, label)
+        with self._lock:
+            if len(self._rasters) >= RASTER_WIDTHS_KEPT:
+                self._rasters.pop(next(iter(self._rasters)))
+            self._rasters[key] = raster
+        return raster
+
+    def png(self, data, scope, width):
+        fill = self.fill_mask(scope)
+        labels = self.labels(width, fill)
+        names = list(CATEGORY_COLORS)
+        palette = ["#ffffff"] + [CATEGORY_COLORS[n] for n in names] + [DISTRICT_STROKE]
+        border = len(palette) - 1
+        lut = np.zeros(len(self) + 1, dtype=np.uint8)
+        lut[1:] = [names.index(c) + 1 for c in self.categories(data)]
+        pixels = lut[np.maximum(labels, 0)]
+        # one-pixel outlines wherever the feature changes to the right or below (or areas overlap)
+        edge = np.zeros(labels.shape, dtype=bool)
+        edge[:, :-1] |= labels[:, :-1] != labels[:, 1:]
+        edge[:-1, :] |= labels[:-1, :] != labels[1:, :]
+        pixels[(edge & (labels != 0)) | (labels < 0)] = border
+        return encode_png(pixels, palette, transparent=(0,))
+
+
+def simplified_features(path, tolerance=SIMPLIFY_DEGREES):
+    """The file's features with shared borders simplified together (as build_geojson does), so no gaps open."""
+    with open(path, encoding="utf8") as fh:
+        doc = json.load(fh)
+    if doc.get("type") != "FeatureCollection":
+        doc = {"type": "FeatureCollection", "features": [doc]}
+    topo = build_topology(doc)
+    kx, ky = topo.transform[:2]
+    return to_geojson(topo, simplify_arcs(topo.arcs, tolerance / ((kx + ky) / 2)))["features"]
+
+
+_lock = threading.Lock()
+_geometry = None
+_version = None
+
+
+def geometry_version(source=None):
+    """Changes when the map GeoJSON file (or the drawing style) changes; part of every cache key."""
+    source = Path(source or MAP_RENDER_GEOJSON)
+    try:
+        st = source.stat()
+    except OSError:
+        raise GeometryUnavailable(f"map GeoJSON not found: {source}")
+    raw = f"{source.resolve()}:{st.st_mtime_ns}:{st.st_size}:{RENDER_STYLE}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
+
+
+def map_geometry():
+    """(MapGeometry, version), projected once per process and geometry version."""
+    global _geometry, _version
+    version = geometry_version()
+    if _geometry is None or version != _version:
+        with _lock:
+            if _geometry is None or version != _version:
+                _geometry = MapGeometry(simplified_features(MAP_RENDER_GEOJSON))
+                _version = version
+    return _geometry, _version
+
+
+def render_name(d, updated_at, version, width, fmt):
+    return f"{d.isoformat()}_{int(updated_at.timestamp() * 1_000_000)}_{version}_{width}.{fmt}"
+
+
+def rendered_map(d, updated_at, fmt="svg", width=DEFAULT_WIDTH):
+    """
+    Bytes of the ``fmt`` rendering of the MapForecast for ``d`` (current as of
+    ``updated_at``), from the disk cache or rendered now and stored there.
+    """
+    version = geometry_version()
+    path = MAP_RENDER_DIR / render_name(d, updated_at, version, width, fmt)
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        pass
+
+    geometry, version = map_geometry()
+    obj = MapForecast.objects.only("date", "scope", "data", "updated_at").get(date=d)
+    if fmt == "png":
+        body = geometry.png(obj.data or {}, obj.scope, width)
+    else:
+        body = geometry.svg(obj.data or {}, obj.scope, width, title=f"Rainfall forecast {d.isoformat()}")
+
+    # named after the row actually rendered, written atomically so readers never see a partial file
+    path = MAP_RENDER_DIR / render_name(d, obj.updated_at, version, width, fmt)
+    MAP_RENDER_DIR.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=MAP_RENDER_DIR, suffix=".tmp")
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(body)
+    os.replace(tmp, path)
+    for stale in MAP_RENDER_DIR.glob(f"{d.isoformat()}_*_{width}.{fmt}"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return body
+
+
+def discard_renders(d):
+    """Remove every cached rendering for date ``d``."""
+    for path in MAP_RENDER_DIR.glob(f"{d.isoformat()}_*"):
+        path.unlink(missing_ok=True)
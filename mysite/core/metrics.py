@@ -0,0 +1,192 @@
+# core/metrics.py
+"""
+In-process request metrics, exported in the Prometheus text format.
+
+MetricsMiddleware (core.middleware) fills one RequestMetrics per request and
+folds it into the process-wide REGISTRY, keyed by URL name. Each worker
+process keeps its own counters (scrape every worker, or sum them). Recording
+costs a few dict updates under a lock per request plus one timer per SQL
+statement; nothing is collected when METRICS_ENABLED is False.
+"""
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework.renderers import JSONRenderer
+
+# request latency histogram bounds, seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_LOGGED_SQL = 50
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Per-request accumulator; also used as a DB execute_wrapper."""
+    __slots__ = ("queries", "db_time", "serialization_time", "sql", "keep_sql")
+
+    def __init__(self, keep_sql=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.sql = []
+        self.keep_sql = keep_sql
+
+    def __call__(self, execute, sql, params, many, context):
+        t0 = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - t0
+            self.queries += 1
+            self.db_time += elapsed
+            if self.keep_sql:
+                # a min-heap of the slowest MAX_LOGGED_SQL statements; 'queries' still counts every one
+                if len(self.sql) < MAX_LOGGED_SQL:
+                    heapq.heappush(self.sql, (elapsed, sql))
+                elif elapsed > self.sql[0][0]:
+                    heapq.heapreplace(self.sql, (elapsed, sql))
+
+
+def start_request(keep_sql=False):
+    """Make a fresh RequestMetrics current; returns (record, token for finish_request)."""
+    record = RequestMetrics(keep_sql)
+    return record, _current.set(record)
+
+
+def resume_request(record):
+    """Make ``record`` current again (while a streaming response produces its body)."""
+    return _current.set(record)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_current_sql(execute, sql, params, many, context):
+    """execute_wrapper that times the statement into whichever request is current, if any."""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    return record(execute, sql, params, many, context)
+
+
+def install_sql_recorder(sender, connection, **kwargs):
+    """connection_created receiver: async requests run their SQL in worker threads whose
+    connections the middleware can't wrap per request, so wrap them once at connect time."""
+    if record_current_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_current_sql)
+
+
+@contextmanager
+def serialization_timer():
+    """Add the time spent in the block to the current request's serialization time."""
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.serialization_time += time.perf_counter() - t0
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """DRF JSON renderer that reports its time as serialization time."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with serialization_timer():
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class ViewStats:
+    __slots__ = ("buckets", "count", "duration", "queries", "db_time", "serialization_time",
+                 "response_bytes", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, status, duration, record, size):
+        status_class = f"{status // 100}xx"
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    stats.buckets[i] += 1
+                    break
+            stats.count += 1
+            stats.duration += duration
+            stats.queries += record.queries
+            stats.db_time += record.db_time
+            stats.serialization_time += record.serialization_time
+            stats.response_bytes += size or 0
+            stats.statuses[status_class] = stats.statuses.get(status_class, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """Return the Prometheus text exposition (format 0.0.4) of all counters."""
+        with self._lock:
+            views = sorted(self._views.items())
+            lines = [
+                "# HELP weather_request_duration_seconds Request latency by URL name.",
+                "# TYPE weather_request_duration_seconds histogram",
+            ]
+            for view, s in views:
+                label = _label(view)
+                cumulative = 0
+                for bound, n in zip(BUCKETS, s.buckets):
+                    cumulative += n
+                    lines.append(f'weather_request_duration_seconds_bucket{{view="{label}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'weather_request_duration_seconds_bucket{{view="{label}",le="+Inf"}} {s.count}')
+                lines.append(f'weather_request_duration_seconds_sum{{view="{label}"}} {s.duration:.6f}')
+                lines.append(f'weather_request_duration_seconds_count{{view="{label}"}} {s.count}')
+
+            counters = [
+                ("weather_requests_total", "Requests by URL name and status class.", None),
+                ("weather_db_queries_total", "SQL statements executed.", "queries"),
+                ("weather_db_duration_seconds_total", "Time spent in SQL.", "db_time"),
+                ("weather_serialization_duration_seconds_total", "Time spent serializing JSON.",
+                 "serialization_time"),
+                ("weather_response_bytes_total", "Response body bytes (non-streaming responses).", "response_bytes"),
+            ]
+            for name, help_text, attr in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for view, s in views:
+                    label = _label(view)
+                    if attr is None:
+                        for status_class, n in sorted(s.statuses.items()):
+                            lines.append(f'{name}{{view="{label}",status="{status_class}"}} {n}')
+                    else:
+                        value = getattr(s, attr)
+                        lines.append(f'{name}{{view="{label}"}} {value:.6f}' if isinstance(value, float)
+                                     else f'{name}{{view="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = MetricsRegistry()
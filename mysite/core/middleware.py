@@ -0,0 +1,151 @@
+# core/middleware.py
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import REGISTRY, finish_request, install_sql_recorder, resume_request, start_request
+
+slow_logger = logging.getLogger("core.metrics.slow")
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL count/time, serialization time and response size per
+    URL name into core.metrics.REGISTRY (served at /metrics/). Requests slower
+    than METRICS_SLOW_REQUEST_MS are logged to 'core.metrics.slow' with their
+    slowest SQL statements. Put it first in MIDDLEWARE so it sees the full request.
+    Works in both sync (WSGI) and async (ASGI) middleware chains. Streaming
+    responses are recorded when their body is exhausted or closed, including
+    the SQL and serialization done while producing it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, "METRICS_SLOW_REQUEST_MS", None)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            connection_created.connect(install_sql_recorder, dispatch_uid="core.metrics.sql")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        record, token = start_request(keep_sql=self.slow_ms is not None)
+        t0 = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(record))
+                response = self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, record, t0, wrap_connections=True)
+
+    async def __acall__(self, request):
+        record, token = start_request(keep_sql=self.slow_ms is not None)
+        t0 = time.perf_counter()
+        try:
+            # SQL runs in sync_to_async threads; install_sql_recorder finds this record via the context
+            response = await self.get_response(request)
+        finally:
+            finish_request(token)
+        return self.finish(request, response, record, t0)
+
+    def finish(self, request, response, record, t0, wrap_connections=False):
+        """Record ``response`` now, or once its streaming body is done."""
+        if not response.streaming:
+            return self.record(request, response, record, time.perf_counter() - t0)
+
+        def done():
+            self.record(request, response, record, time.perf_counter() - t0)
+
+        metered = MeteredAsyncStream if response.is_async else MeteredStream
+        response.streaming_content = metered(response.streaming_content, record, done, wrap_connections)
+        return response
+
+    def record(self, request, response, record, duration):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<unresolved>"
+        size = None if response.streaming else len(response.content)
+        REGISTRY.observe(view, response.status_code, duration, record, size)
+
+        if self.slow_ms is not None and duration * 1000 >= self.slow_ms:
+            slowest = sorted(record.sql, key=lambda item: item[0], reverse=True)[:5]
+            slow_logger.warning(
+                "slow request %s %s (%s) %.0f ms, %d queries / %.0f ms SQL, %.0f ms serializing, "
+                "slowest %d of %d statements:%s",
+                request.method, request.get_full_path(), view, duration * 1000, record.queries,
+                record.db_time * 1000, record.serialization_time * 1000, len(slowest), record.queries,
+                "".join(f"\n  {elapsed * 1000:.1f} ms  {sql}" for elapsed, sql in slowest),
+            )
+        return response
+
+
+@contextmanager
+def resumed(record, wrap_connections):
+    """Count SQL and serialization towards ``record`` again for the duration of the block."""
+    token = resume_request(record)
+    try:
+        with ExitStack() as stack:
+            # the sync chain wraps connections per request; async ones were wrapped at connect time
+            if wrap_connections:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(record))
+            yield
+    finally:
+        finish_request(token)
+
+
+class MeteredStream:
+    """
+    streaming_content wrapper: producing each chunk counts towards the
+    request, and ``done`` runs once, when the body is exhausted or closed
+    (StreamingHttpResponse.close() calls our close()).
+    """
+
+    def __init__(self, content, record, done, wrap_connections=False):
+        self.content = content
+        self.record = record
+        self.done = done
+        self.wrap_connections = wrap_connections
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            with resumed(self.record, self.wrap_connections):
+                return next(self.content)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        done, self.done = self.done, None
+        if done is not None:
+            done()
+
+
+class MeteredAsyncStream(MeteredStream):
+    """MeteredStream for async iterators."""
+    __iter__ = __next__ = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            with resumed(self.record, self.wrap_connections):
+                return await self.content.__anext__()
+        except StopAsyncIteration:
+            self.close()
+            raise
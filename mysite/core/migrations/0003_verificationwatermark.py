@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_mapforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerificationWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField()),
+                ('end', models.DateField()),
+                ('horizon', models.PositiveSmallIntegerField(default=0, help_text='0 = all horizons')),
+                ('watermark', models.DateTimeField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('start', 'end', 'horizon')},
+            },
+        ),
+    ]
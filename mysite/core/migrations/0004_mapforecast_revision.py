@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_verificationwatermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mapforecast',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, help_text='Bumped on every save; used for optimistic concurrency.'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_mapforecast_revision'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='forecastentry',
+            index=models.Index(fields=['date', 'id'], name='core_forecastentry_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='realizedentry',
+            index=models.Index(fields=['date', 'id'], name='core_realizedentry_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='warningentry',
+            index=models.Index(fields=['date', 'id'], name='core_warningentry_date_id'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_date_id_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='forecastentry',
+            index=models.Index(fields=['district', 'horizon', 'date', 'rainfall_mm'], name='core_forecastentry_dhd'),
+        ),
+        migrations.AddIndex(
+            model_name='realizedentry',
+            index=models.Index(fields=['district', 'horizon', 'date', 'rainfall_mm'], name='core_realizedentry_dhd'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_district_horizon_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapForecastArea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('area_id', models.CharField(max_length=64)),
+                ('category', models.CharField(blank=True, max_length=32, null=True)),
+                ('rainfall_mm', models.FloatField(blank=True, null=True)),
+                ('forecast', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='areas', to='core.mapforecast')),
+            ],
+            options={
+                'verbose_name': 'Map Forecast Area',
+                'indexes': [models.Index(fields=['area_id', 'category', 'date'], name='core_mfarea_area_cat_date'), models.Index(fields=['date', 'category'], name='core_mfarea_date_cat')],
+                'unique_together': {('date', 'area_id')},
+            },
+        ),
+    ]
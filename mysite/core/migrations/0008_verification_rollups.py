@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_mapforecastarea'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(max_length=8, unique=True)),
+                ('watermark', models.DateTimeField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VerificationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month'), ('season', 'Season')], max_length=8)),
+                ('bucket_start', models.DateField()),
+                ('horizon', models.PositiveSmallIntegerField()),
+                ('threshold', models.FloatField(help_text='Event threshold in mm')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('abs_err_sum', models.FloatField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('false_alarms', models.PositiveIntegerField(default=0)),
+                ('misses', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('district', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.district')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'horizon', 'bucket_start'], name='core_rollup_period_h_start')],
+                'unique_together': {('period', 'bucket_start', 'district', 'horizon', 'threshold')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_verification_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verificationrollup',
+            name='err_sum',
+            field=models.FloatField(default=0, help_text='Sum of forecast - observed'),
+        ),
+        migrations.AddField(
+            model_name='verificationrollup',
+            name='sq_err_sum',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='verificationscore',
+            name='ci_high',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='verificationscore',
+            name='ci_low',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
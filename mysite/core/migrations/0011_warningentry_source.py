@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_station'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='warningentry',
+            name='source',
+            field=models.CharField(default='manual', max_length=32),
+        ),
+    ]
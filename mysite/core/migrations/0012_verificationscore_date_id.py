@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_warningentry_source'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='verificationscore',
+            index=models.Index(fields=['date', 'id'], name='core_verificationscore_date_id'),
+        ),
+    ]
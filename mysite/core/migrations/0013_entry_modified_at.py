@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def copy_entered_at(apps, schema_editor):
+    # existing rows were last written when entered (upserts refreshed entered_at until now)
+    for name in ("ForecastEntry", "RealizedEntry"):
+        apps.get_model("core", name).objects.update(modified_at=F("entered_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_verificationscore_date_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forecastentry',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='realizedentry',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(copy_entered_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_entry_modified_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StationReading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('rainfall_mm', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='core.station')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', 'station'], name='core_stationreading_date')],
+                'unique_together': {('station', 'date')},
+            },
+        ),
+    ]
@@ -24,10 +24,19 @@ class ForecastEntryBase(models.Model):
     extras = models.JSONField(default=dict, blank=True)    # store optional values like temperatures
     entered_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     entered_at = models.DateTimeField(auto_now_add=True)
+    # every save and upsert moves this; incremental verification and rollups scan it
+    modified_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         abstract = True
         unique_together = ("district", "date", "horizon")
+        indexes = [
+            # keyset pagination / streaming exports walk (date, id)
+            models.Index(fields=["date", "id"], name="%(app_label)s_%(class)s_date_id"),
+            # per-district time series: equality on (district, horizon), range on date; rainfall_mm
+            # is a trailing key column so the scan is index-only on MySQL/SQLite as well
+            models.Index(fields=["district", "horizon", "date", "rainfall_mm"], name="%(app_label)s_%(class)s_dhd"),
+        ]
 
 
 class ForecastEntry(ForecastEntryBase):
@@ -45,6 +54,38 @@ class RealizedEntry(ForecastEntryBase):
         verbose_name = "Realized Entry"
 
 
+class Station(models.Model):
+    """
+    A rain gauge. Its district is resolved from lat/lon once, when the station
+    is first seen (core.stations), and reused for every later reading.
+    """
+    code = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=120, blank=True)
+    lat = models.FloatField(null=True, blank=True)
+    lon = models.FloatField(null=True, blank=True)
+    district = models.ForeignKey(District, null=True, blank=True, on_delete=models.SET_NULL, related_name="stations")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.code} ({self.district.code if self.district else 'unmapped'})"
+
+
+class StationReading(models.Model):
+    """
+    One gauge's rainfall for one day, the last value reported. Areal
+    aggregates are recomputed from every stored reading of a district/day, so
+    a partial second file adds to the mean instead of replacing it.
+    """
+    station = models.ForeignKey(Station, on_delete=models.CASCADE, related_name="readings")
+    date = models.DateField()
+    rainfall_mm = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("station", "date")
+        indexes = [models.Index(fields=["date", "station"], name="core_stationreading_date")]
+
+
 class WarningEntry(models.Model):
     district = models.ForeignKey(District, on_delete=models.PROTECT)
     date = models.DateField()
@@ -52,25 +93,34 @@ class WarningEntry(models.Model):
     phenomenon = models.CharField(max_length=64)  # e.g., "Heavy Rain", "Heat Wave"
     severity = models.CharField(max_length=32, blank=True, null=True)  # e.g., "Yellow","Orange","Red"
     description = models.TextField(blank=True)
+    # "manual", or "rules" for warnings maintained by core.warning_rules (which never touches manual ones)
+    source = models.CharField(max_length=32, default="manual")
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ("district", "date", "horizon", "phenomenon")
+        indexes = [
+            models.Index(fields=["date", "id"], name="core_warningentry_date_id"),
+        ]
 
 
 class VerificationScore(models.Model):
     # aggregated verification results for a district (or null for aggregated region)
     date = models.DateField(help_text="Date or period end the metric refers to")
     horizon = models.PositiveSmallIntegerField(default=1)
-    metric = models.CharField(max_length=64)  # e.g., 'MAE', 'RMSE', 'POD', 'FAR', 'CSI'
+    metric = models.CharField(max_length=64)  # e.g., 'MAE', 'RMSE', 'POD', 'ETS@15.6'
     district = models.ForeignKey(District, null=True, blank=True, on_delete=models.SET_NULL)
     value = models.FloatField()
+    # bootstrap confidence interval (compute_verification --bootstrap)
+    ci_low = models.FloatField(null=True, blank=True)
+    ci_high = models.FloatField(null=True, blank=True)
     computed_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["date", "horizon", "metric"]),
+            models.Index(fields=["date", "id"], name="core_verificationscore_date_id"),
         ]
 
     def __str__(self):
@@ -78,6 +128,77 @@ class VerificationScore(models.Model):
         return f"{self.date} H{self.horizon} {self.metric} {d} = {self.value:.3f}"
 
 
+class VerificationWatermark(models.Model):
+    """
+    Last time compute_verification scored a (start, end, horizon) period.
+    Incremental runs only rescore district/horizon cells whose ForecastEntry or
+    RealizedEntry rows were modified after 'watermark', which trails the run's
+    start by VERIFICATION_WATERMARK_LAG_SECONDS. Deleting entries drops the
+    watermarks overlapping their dates (core.signals).
+    """
+    start = models.DateField()
+    end = models.DateField()
+    horizon = models.PositiveSmallIntegerField(default=0, help_text="0 = all horizons")
+    watermark = models.DateTimeField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("start", "end", "horizon")
+
+    def __str__(self):
+        h = f"H{self.horizon}" if self.horizon else "all horizons"
+        return f"{self.start}..{self.end} {h} @ {self.watermark:%Y-%m-%d %H:%M:%S}"
+
+
+class VerificationRollup(models.Model):
+    """
+    Additive verification statistics per district, horizon, threshold and
+    calendar bucket (week starting Monday, month, or IMD season). Scores for any
+    run of buckets are sums of these rows; see core.rollups.
+    """
+    PERIOD_CHOICES = [
+        ("week", "Week"),
+        ("month", "Month"),
+        ("season", "Season"),
+    ]
+
+    period = models.CharField(max_length=8, choices=PERIOD_CHOICES)
+    bucket_start = models.DateField()
+    district = models.ForeignKey(District, on_delete=models.CASCADE)
+    horizon = models.PositiveSmallIntegerField()
+    threshold = models.FloatField(help_text="Event threshold in mm")
+    count = models.PositiveIntegerField(default=0)
+    abs_err_sum = models.FloatField(default=0)
+    sq_err_sum = models.FloatField(default=0)
+    err_sum = models.FloatField(default=0, help_text="Sum of forecast - observed")
+    hits = models.PositiveIntegerField(default=0)
+    false_alarms = models.PositiveIntegerField(default=0)
+    misses = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("period", "bucket_start", "district", "horizon", "threshold")
+        indexes = [
+            models.Index(fields=["period", "horizon", "bucket_start"], name="core_rollup_period_h_start"),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start} H{self.horizon} {self.district_id} @{self.threshold:g}mm"
+
+
+class RollupWatermark(models.Model):
+    """
+    Entries modified after 'watermark' have not been folded into this
+    period's rollups yet. Deleting an entry drops every period's row (core.signals).
+    """
+    period = models.CharField(max_length=8, unique=True)
+    watermark = models.DateTimeField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.period} @ {self.watermark:%Y-%m-%d %H:%M:%S}"
+
+
 
 class MapForecast(models.Model):
     """
@@ -93,6 +214,7 @@ class MapForecast(models.Model):
     date = models.DateField(unique=True, help_text="Forecast valid date (one row per date).")
     scope = models.CharField(max_length=16, choices=SCOPE_CHOICES, default="mixed")
     data = models.JSONField(default=dict, help_text="Map of area_id -> {category, rainfall_mm, ...}")
+    revision = models.PositiveIntegerField(default=0, help_text="Bumped on every save; used for optimistic concurrency.")
     entered_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -104,3 +226,26 @@ class MapForecast(models.Model):
 
     def __str__(self):
         return f"MapForecast {self.date} ({self.scope})"
+
+
+class MapForecastArea(models.Model):
+    """
+    One row per (date, area) of MapForecast.data, kept in sync by save_map_forecast
+    so per-area and per-category questions are index lookups instead of JSON scans.
+    """
+    forecast = models.ForeignKey(MapForecast, on_delete=models.CASCADE, related_name="areas")
+    date = models.DateField()
+    area_id = models.CharField(max_length=64)
+    category = models.CharField(max_length=32, blank=True, null=True)
+    rainfall_mm = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ("date", "area_id")
+        indexes = [
+            models.Index(fields=["area_id", "category", "date"], name="core_mfarea_area_cat_date"),
+            models.Index(fields=["date", "category"], name="core_mfarea_date_cat"),
+        ]
+        verbose_name = "Map Forecast Area"
+
+    def __str__(self):
+        return f"{self.date} {self.area_id}: {self.category}"
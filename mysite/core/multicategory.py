@@ -0,0 +1,224 @@
+# core/multicategory.py
+"""
+Multi-category verification of the map's spatial-distribution categories
+(DRY / ISOL / SCT / FWS / WS) against observed categories.
+
+Forecast categories come from MapForecastArea, observations from RealizedEntry
+(its rainfall_category, or the category of its rainfall_mm when that is
+blank) for the district each map area_id resolves to: the map names areas
+"D_<Dist_Code>" while imported districts may carry the bare code, so both
+forms are tried (see area_district_ids). Categories are encoded
+as integers 0..K-1 and every area's K x K contingency matrix
+(rows = forecast, columns = observed) is built with one bincount.
+"""
+import warnings
+
+import numpy as np
+from django.db import transaction
+
+from .districts import district_registry
+from .models import MapForecastArea, RealizedEntry, VerificationScore
+
+CATEGORIES = ("DRY", "ISOL", "SCT", "FWS", "WS")
+# upper rainfall bound (mm, exclusive) of every category but the last, for observations without a category
+CATEGORY_UPPER_MM = np.array([0.1, 2.5, 15.6, 64.5])
+CATEGORY_METRICS = ("MC_PC", "MC_HSS", "MC_GSS")
+# upper share of wet stations (inclusive) for ISOL, SCT and FWS; no wet station is DRY, more is WS
+COVERAGE_UPPER = np.array([0.25, 0.50, 0.75])
+
+
+def encode(categories):
+    """Integer codes for category labels; unknown or missing labels become -1."""
+    lookup = {name: i for i, name in enumerate(CATEGORIES)}
+    return np.fromiter((lookup.get((c or "").upper(), -1) for c in categories), dtype=np.int64,
+                       count=len(categories))
+
+
+def rainfall_codes(mm):
+    """Category codes for rainfall amounts (NaN -> -1)."""
+    mm = np.asarray(mm, dtype=float)
+    return np.where(np.isnan(mm), -1, np.searchsorted(CATEGORY_UPPER_MM, mm, side="right"))
+
+
+def coverage_codes(wet_share):
+    """Category codes for the share of an area's stations that reported rain."""
+    wet_share = np.asarray(wet_share, dtype=float)
+    return np.where(wet_share > 0, np.searchsorted(COVERAGE_UPPER, wet_share, side="left") + 1, 0)
+
+
+class CategoryPairs:
+    """Forecast/observed category codes per (area, date); ``area`` indexes ``area_ids``."""
+
+    def __init__(self, area_ids, area, date, fcst, obs):
+        self.area_ids = area_ids
+        self.area = area
+        self.date = date
+        self.fcst = fcst
+        self.obs = obs
+
+    def __len__(self):
+        return len(self.area)
+
+
+def area_district_ids(area_ids, code_to_id):
+    """
+    {area_id: district id} for the map areas that are districts. An area id
+    matches a District code as is, without its "D_" prefix, or with one added
+    (the candidates core.spatial.feature_code tries for GeoJSON features).
+    """
+    resolved = {}
+    for area_id in area_ids:
+        bare = area_id[2:] if area_id.startswith("D_") else area_id
+        for candidate in (area_id, bare, f"D_{bare}"):
+            if candidate in code_to_id:
+                resolved[area_id] = code_to_id[candidate]
+                break
+    return resolved
+
+
+def fetch_category_pairs(start, end, horizon=1, area_ids=None):
+    """
+    Pair every MapForecastArea in [start, end] with the RealizedEntry of the
+    district its area_id resolves to, for the same date and ``horizon``.
+    Areas that aren't districts, and rows whose category is unknown, are skipped.
+    """
+    forecasts = MapForecastArea.objects.filter(date__range=(start, end))
+    if area_ids is not None:
+        forecasts = forecasts.filter(area_id__in=list(area_ids))
+    f_rows = list(forecasts.order_by().values_list("area_id", "date", "category"))
+
+    area_districts = area_district_ids({a for a, _, _ in f_rows}, district_registry.code_to_id())
+    o_rows = list(
+        RealizedEntry.objects.filter(date__range=(start, end), horizon=horizon, district_id__in=set(area_districts.values()))
+        .order_by().values_list("district_id", "date", "rainfall_category", "rainfall_mm")
+    )
+    if not f_rows or not o_rows:
+        empty = np.empty(0, dtype=np.int64)
+        return CategoryPairs(np.empty(0, dtype=object), empty, np.empty(0, dtype="datetime64[D]"), empty, empty)
+
+    f_area, f_date, f_cat = zip(*f_rows)
+    district_areas = {d: a for a, d in area_districts.items()}
+    o_district, o_date, o_cat, o_mm = zip(*o_rows)
+    o_area = [district_areas.get(d) for d in o_district]
+
+    labels, inverse = np.unique(np.asarray(f_area + tuple(a or "" for a in o_area), dtype=object),
+                                return_inverse=True)
+    inverse = inverse.ravel()
+    f_idx, o_idx = inverse[:len(f_rows)], inverse[len(f_rows):]
+    f_day = np.asarray(f_date, dtype="datetime64[D]")
+    o_day = np.asarray(o_date, dtype="datetime64[D]")
+
+    # join on (area, date) through one integer key per row
+    origin = min(f_day.min(), o_day.min())
+    span = (max(f_day.max(), o_day.max()) - origin).astype(np.int64) + 1
+    f_key = f_idx * span + (f_day - origin).astype(np.int64)
+    o_key = o_idx * span + (o_day - origin).astype(np.int64)
+    _, fi, oi = np.intersect1d(f_key, o_key, assume_unique=True, return_indices=True)
+
+    fcst = encode(f_cat)[fi]
+    obs = encode(o_cat)[oi]
+    missing = obs < 0
+    obs[missing] = rainfall_codes(np.asarray(o_mm, dtype=float)[oi][missing])
+    keep = (fcst >= 0) & (obs >= 0)
+
+    # re-index the areas that survived the join so area_ids holds only those
+    used, area = np.unique(f_idx[fi][keep], return_inverse=True)
+    return CategoryPairs(labels[used], area.ravel(), f_day[fi][keep], fcst[keep], obs[keep])
+
+
+def contingency_tables(pairs, k=len(CATEGORIES)):
+    """(areas, K, K) counts, rows = forecast category, columns = observed category."""
+    n_areas = len(pairs.area_ids)
+    cell = (pairs.area * k + pairs.fcst) * k + pairs.obs
+    return np.bincount(cell, minlength=n_areas * k * k).reshape(n_areas, k, k)
+
+
+def heidke(tables):
+    """Multi-category Heidke skill score for each (..., K, K) table; NaN where undefined."""
+    tables = np.asarray(tables, dtype=float)
+    n = tables.sum(axis=(-2, -1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pc = np.trace(tables, axis1=-2, axis2=-1) / n
+        expected = (tables.sum(axis=-1) * tables.sum(axis=-2)).sum(axis=-1) / (n * n)
+        return (pc - expected) / (1.0 - expected)
+
+
+def gerrity_weights(observed_share):
+    """
+    Gerrity scoring matrices (..., K, K) from the observed category shares
+    (..., K). Entries are inf/NaN when a cumulative share is 0 or 1.
+    """
+    p = np.asarray(observed_share, dtype=float)
+    k = p.shape[-1]
+    cum = np.cumsum(p, axis=-1)[..., :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        odds = (1.0 - cum) / cum                      # a_r, r = 1..K-1
+        inv = 1.0 / odds
+    zero = np.zeros(p.shape[:-1] + (1,))
+    below = np.concatenate([zero, np.cumsum(inv, axis=-1)], axis=-1)                   # sum_{r<i} 1/a_r
+    above = np.concatenate([np.cumsum(odds[..., ::-1], axis=-1)[..., ::-1], zero], axis=-1)  # sum_{r>=j} a_r
+    i = np.arange(k)[:, None]
+    j = np.arange(k)[None, :]
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    with np.errstate(invalid="ignore"):
+        return (below[..., lo] - (hi - lo) + above[..., hi]) / (k - 1)
+
+
+def gerrity(tables):
+    """
+    Gerrity skill score for each (..., K, K) table, weighted by that table's
+    observed climatology. Computed as the mean Peirce skill score of the K-1
+    two-category splits (fcst/obs above category r vs not), which equals the
+    score from gerrity_weights() when every category is observed. A split with
+    no observations on one side (a category never observed at the extremes,
+    or one missing in between making two splits identical) has no Peirce
+    score; it is left out of the mean instead of turning the score into NaN.
+    """
+    tables = np.asarray(tables, dtype=float)
+    k = tables.shape[-1]
+    n = tables.sum(axis=(-2, -1))[..., None]
+    cum = tables.cumsum(axis=-2).cumsum(axis=-1)       # cells with forecast <= i and observed <= j
+    r = np.arange(k - 1)
+    both_low = cum[..., r, r]                          # forecast <= r and observed <= r
+    obs_low = cum[..., k - 1, r]
+    fcst_low = cum[..., r, k - 1]
+    false_alarms = obs_low - both_low
+    misses = fcst_low - both_low
+    hits = n - false_alarms - misses - both_low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pss = hits / (hits + misses) - false_alarms / (false_alarms + both_low)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices: nothing observed at all
+            return np.nanmean(pss, axis=-1)
+
+
+def category_scores(tables):
+    """{metric: array over tables} of proportion correct, Heidke and Gerrity."""
+    tables = np.asarray(tables)
+    n = tables.sum(axis=(-2, -1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pc = np.trace(tables, axis1=-2, axis2=-1) / n
+    return {"MC_PC": pc, "MC_HSS": heidke(tables), "MC_GSS": gerrity(tables)}
+
+
+def save_category_scores(pairs, tables, end_date, horizon, batch_size=1000):
+    """
+    Store per-district scores plus a regional row (district NULL) from the
+    summed table as VerificationScore rows dated ``end_date``.
+    """
+    area_districts = area_district_ids(pairs.area_ids, district_registry.code_to_id())
+    district_ids = [area_districts.get(a) for a in pairs.area_ids]
+    per_area = category_scores(tables)
+    regional = category_scores(tables.sum(axis=0)) if len(tables) else {}
+    objs = []
+    for metric, values in per_area.items():
+        for i in np.flatnonzero(~np.isnan(values)):
+            objs.append(VerificationScore(date=end_date, horizon=horizon, metric=metric,
+                                          district_id=district_ids[i], value=float(values[i])))
+    for metric, value in regional.items():
+        if not np.isnan(value):
+            objs.append(VerificationScore(date=end_date, horizon=horizon, metric=metric, value=float(value)))
+    with transaction.atomic():
+        VerificationScore.objects.filter(date=end_date, horizon=horizon, metric__in=CATEGORY_METRICS).delete()
+        VerificationScore.objects.bulk_create(objs, batch_size=batch_size)
+    return len(objs)
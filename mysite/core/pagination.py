@@ -0,0 +1,80 @@
+# core/pagination.py
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class DateIdCursorPagination(BasePagination):
+    """
+    Keyset pagination on (date, id), newest first.
+
+    The cursor holds the (date, id) of the last row of the previous page, and
+    the next page is "WHERE date < d OR (date = d AND id < i)", so page N costs
+    the same as page 1 instead of scanning an ever growing OFFSET.
+    """
+    cursor_query_param = "cursor"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def encode_cursor(self, obj):
+        raw = json.dumps([obj.date.isoformat(), obj.pk]).encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            d, pk = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            d = parse_date(d)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            d = None
+        if d is None:
+            raise NotFound("Invalid cursor")
+        return d, pk
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        qs = queryset.order_by("-date", "-id")
+        if cursor:
+            d, pk = cursor
+            qs = qs.filter(Q(date__lt=d) | Q(date=d, id__lt=pk))
+        rows = list(qs[:size + 1])
+        self.has_next = len(rows) > size
+        self.page = rows[:size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,189 @@
+# core/rollups.py
+"""
+Weekly / monthly / seasonal verification rollups.
+
+VerificationRollup rows hold additive statistics (pair count, sums of absolute,
+squared and signed errors, hits / false alarms / misses per threshold), so the scores of any run
+of buckets are column sums over O(buckets) rows instead of a rescan of every
+forecast/realized pair. Incremental updates recompute only the
+(district, horizon, bucket) cells touched by entries newer than the
+period's watermark; recomputing a cell (rather than adding deltas) keeps edits
+of existing entries exact.
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import ForecastEntry, RealizedEntry, RollupWatermark, VerificationRollup
+from .verification import DEFAULT_THRESHOLD, WATERMARK_LAG, Scores, fetch_pairs, group_index, group_stats
+
+PERIODS = ("week", "month", "season")
+
+# IMD seasons: winter (Jan-Feb), pre-monsoon (Mar-May), south-west monsoon (Jun-Sep),
+# post-monsoon (Oct-Dec); first month of the season for each calendar month
+SEASON_START_MONTH = np.array([1, 1, 3, 3, 3, 6, 6, 6, 6, 10, 10, 10])
+SEASON_LENGTH = np.array([2, 0, 3, 0, 0, 4, 0, 0, 0, 3, 0, 0])  # months, indexed by start month - 1
+
+
+def bucket_start(dates, period):
+    """Vectorized start date of the ``period`` bucket containing each of ``dates`` (datetime64[D])."""
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    if period == "week":
+        # 1970-01-01 was a Thursday; weeks start on Monday
+        return dates - ((dates.astype(np.int64) + 3) % 7)
+    months = dates.astype("datetime64[M]")
+    if period == "month":
+        return months.astype("datetime64[D]")
+    if period == "season":
+        m = months.astype(np.int64)
+        start = m - m % 12 + SEASON_START_MONTH[m % 12] - 1
+        return start.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"Unknown period '{period}'")
+
+
+def bucket_end(starts, period):
+    """Last day of the buckets starting at ``starts``."""
+    starts = np.asarray(starts, dtype="datetime64[D]")
+    if period == "week":
+        return starts + 6
+    if period == "month":
+        return (starts.astype("datetime64[M]") + 1).astype("datetime64[D]") - 1
+    m = starts.astype("datetime64[M]")
+    return (m + SEASON_LENGTH[m.astype(np.int64) % 12]).astype("datetime64[D]") - 1
+
+
+def bucket_stats(pairs, period, thresholds):
+    """
+    Group ``pairs`` by (district, horizon, bucket) and return
+    (keys, count, abs_err_sum, sq_err_sum, err_sum, hits, false_alarms, misses); keys columns are
+    district_id, horizon and the bucket start as days since the epoch.
+    """
+    starts = bucket_start(pairs.date, period).astype(np.int64)
+    keys = np.stack([pairs.district_id, pairs.horizon, starts], axis=1)
+    return group_stats(keys, pairs.fcst, pairs.obs, np.asarray(thresholds, dtype=float))
+
+
+def changed_entries(since):
+    """(district_id, horizon, date) arrays of entries created or edited after ``since``."""
+    rows = set()
+    for model in (ForecastEntry, RealizedEntry):
+        qs = model.objects.filter(modified_at__gt=since)
+        rows.update(qs.order_by().values_list("district_id", "horizon", "date").distinct())
+    if not rows:
+        return None
+    district_id, horizon, dates = zip(*rows)
+    return (np.asarray(district_id, dtype=np.int64), np.asarray(horizon, dtype=np.int64),
+            np.asarray(dates, dtype="datetime64[D]"))
+
+
+def save_watermark(period, run_started):
+    """Store the ``period`` watermark, WATERMARK_LAG behind the run's start (see core.verification)."""
+    RollupWatermark.objects.update_or_create(period=period, defaults={"watermark": run_started - WATERMARK_LAG})
+
+
+def forget_watermarks():
+    """A deleted entry leaves nothing for changed_entries to find: the next run of every period rebuilds."""
+    RollupWatermark.objects.all().delete()
+
+
+def _key_mask(keys, wanted):
+    wanted = {tuple(k) for k in wanted.tolist()}
+    return np.fromiter((tuple(k) in wanted for k in keys.tolist()), dtype=bool, count=len(keys))
+
+
+def update_rollups(period, since=None, thresholds=(DEFAULT_THRESHOLD,), batch_size=1000):
+    """
+    Rebuild the ``period`` rollups: every bucket when ``since`` is None,
+    otherwise only the (district, horizon, bucket) cells touched after ``since``.
+    Returns (cells recomputed, rows written).
+    """
+    thresholds = sorted(float(t) for t in thresholds)
+    if since is None:
+        pairs = fetch_pairs(None, None)
+        affected = None
+    else:
+        changed = changed_entries(since)
+        if changed is None:
+            return 0, 0
+        district_id, horizon, dates = changed
+        starts = bucket_start(dates, period)
+        affected = np.unique(np.stack([district_id, horizon, starts.astype(np.int64)], axis=1), axis=0)
+        # one fetch spanning every affected bucket of the touched districts/horizons
+        pairs = fetch_pairs(starts.min().item(), bucket_end(starts.max(), period).item(),
+                            horizons=np.unique(horizon).tolist(), district_ids=np.unique(district_id).tolist())
+
+    if len(pairs):
+        keys, *stats = bucket_stats(pairs, period, thresholds)
+        if affected is not None:
+            keep = _key_mask(keys, affected)
+            keys, stats = keys[keep], [a[keep] for a in stats]
+        count, abs_err_sum, sq_err_sum, err_sum, hits, false_alarms, misses = stats
+    else:
+        keys = np.empty((0, 3), dtype=np.int64)
+
+    objs = []
+    starts = keys[:, 2].astype("datetime64[D]").tolist() if len(keys) else []
+    for i, (d, h, _) in enumerate(keys.tolist()):
+        for j, thr in enumerate(thresholds):
+            objs.append(VerificationRollup(
+                period=period, bucket_start=starts[i], district_id=d, horizon=h, threshold=thr,
+                count=int(count[i]), abs_err_sum=float(abs_err_sum[i]), sq_err_sum=float(sq_err_sum[i]),
+                err_sum=float(err_sum[i]), hits=int(hits[i, j]),
+                false_alarms=int(false_alarms[i, j]), misses=int(misses[i, j]),
+            ))
+
+    with transaction.atomic():
+        existing = VerificationRollup.objects.filter(period=period, threshold__in=thresholds)
+        if affected is None:
+            existing.delete()
+        else:
+            # one delete per (horizon, bucket), like save_scores
+            for h in np.unique(affected[:, 1]).tolist():
+                for b in np.unique(affected[affected[:, 1] == h, 2]).tolist():
+                    rows = affected[(affected[:, 1] == h) & (affected[:, 2] == b)]
+                    existing.filter(horizon=h, bucket_start=np.datetime64(b, "D").item(),
+                                    district_id__in=rows[:, 0].tolist()).delete()
+        VerificationRollup.objects.bulk_create(objs, batch_size=batch_size)
+    return len(affected) if affected is not None else len(keys), len(objs)
+
+
+def rollup_scores(period, start, end, horizons=None, district_ids=None, thresholds=(DEFAULT_THRESHOLD,)):
+    """
+    Scores per (district, horizon) summed over the ``period`` buckets starting
+    in [start, end]. Returns a Scores object (see Scores.metrics()).
+    """
+    thresholds = np.asarray(sorted(float(t) for t in thresholds))
+    qs = VerificationRollup.objects.filter(period=period, bucket_start__range=(start, end),
+                                           threshold__in=thresholds.tolist())
+    if horizons is not None:
+        qs = qs.filter(horizon__in=list(horizons))
+    if district_ids is not None:
+        qs = qs.filter(district_id__in=list(district_ids))
+    rows = list(
+        qs.order_by().values_list("district_id", "horizon", "threshold")
+        .annotate(Sum("count"), Sum("abs_err_sum"), Sum("sq_err_sum"), Sum("err_sum"),
+                  Sum("hits"), Sum("false_alarms"), Sum("misses"))
+        .order_by("district_id", "horizon", "threshold")
+    )
+    T = len(thresholds)
+    if not rows:
+        return Scores.empty(thresholds)
+
+    data = np.asarray(rows, dtype=float)
+    groups, inverse = group_index(data[:, :2].astype(np.int64))
+    col = np.searchsorted(thresholds, data[:, 2])
+    G = len(groups)
+    count = np.zeros(G, dtype=np.int64)
+    # the continuous sums are repeated on every threshold row of a group
+    count[inverse] = data[:, 3]
+    sums = []
+    for k in (4, 5, 6):
+        column = np.zeros(G)
+        column[inverse] = data[:, k]
+        sums.append(column)
+    tables = []
+    for k in (7, 8, 9):
+        table = np.zeros((G, T), dtype=np.int64)
+        table[inverse, col] = data[:, k]
+        tables.append(table)
+    return Scores(groups[:, 0], groups[:, 1], count, *sums, thresholds, *tables)
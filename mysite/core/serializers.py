@@ -1,6 +1,7 @@
 # core/serializers.py
 from rest_framework import serializers
-from .models import District, ForecastEntry, RealizedEntry, WarningEntry, VerificationScore
+from .districts import district_registry
+from .models import District, ForecastEntry, RealizedEntry, WarningEntry, VerificationScore, MapForecastArea
 
 class DistrictSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,7 +9,30 @@ class DistrictSerializer(serializers.ModelSerializer):
         fields = ["id", "code", "name", "geojson_file"]
 
 
+class DistrictField(serializers.PrimaryKeyRelatedField):
+    """
+    A district given by id (a JSON integer) or by code (a string; codes are
+    often numeric, so "24" is the code 24, not the id), resolved through the
+    in-process registry instead of a query per row. Always rendered as the id.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if isinstance(data, int):
+            info = district_registry.get_by_id(data)
+        elif isinstance(data, str):
+            info = district_registry.get(data)
+        else:
+            self.fail("incorrect_type", data_type=type(data).__name__)
+        if info is None:
+            self.fail("does_not_exist", pk_value=data)
+        return info.instance()
+
+
 class ForecastEntrySerializer(serializers.ModelSerializer):
+    district = DistrictField(queryset=District.objects.all())
+
     class Meta:
         model = ForecastEntry
         fields = "__all__"
@@ -16,6 +40,8 @@ class ForecastEntrySerializer(serializers.ModelSerializer):
 
 
 class RealizedEntrySerializer(serializers.ModelSerializer):
+    district = DistrictField(queryset=District.objects.all())
+
     class Meta:
         model = RealizedEntry
         fields = "__all__"
@@ -23,6 +49,8 @@ class RealizedEntrySerializer(serializers.ModelSerializer):
 
 
 class WarningEntrySerializer(serializers.ModelSerializer):
+    district = DistrictField(queryset=District.objects.all())
+
     class Meta:
         model = WarningEntry
         fields = "__all__"
@@ -33,3 +61,9 @@ class VerificationScoreSerializer(serializers.ModelSerializer):
     class Meta:
         model = VerificationScore
         fields = "__all__"
+
+
+class MapForecastAreaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MapForecastArea
+        fields = ["id", "date", "area_id", "category", "rainfall_mm"]
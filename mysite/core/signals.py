@@ -0,0 +1,68 @@
+# core/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_map_forecast
+from .districts import district_registry
+from .map_render import discard_renders
+from .models import District, ForecastEntry, MapForecast, RealizedEntry, Station
+from .rollups import forget_watermarks as forget_rollup_watermarks
+from .stations import station_table
+from .verification import forget_watermarks
+
+
+@receiver(post_save, sender=MapForecast)
+@receiver(post_delete, sender=MapForecast)
+def map_forecast_changed(sender, instance, **kwargs):
+    invalidate_map_forecast(instance.date)
+
+
+@receiver(post_delete, sender=MapForecast)
+def map_forecast_deleted(sender, instance, **kwargs):
+    # saves need nothing: renders are keyed by updated_at and replaced on the next request
+    discard_renders(instance.date)
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+def district_changed(sender, instance, **kwargs):
+    # now for this process (which may read its own uncommitted write), and
+    # again after commit so other processes can't reload the old rows in between
+    district_registry.invalidate()
+    transaction.on_commit(district_registry.invalidate)
+
+
+@receiver(post_save, sender=Station)
+@receiver(post_delete, sender=Station)
+def station_changed(sender, instance, **kwargs):
+    station_table.invalidate()
+    transaction.on_commit(station_table.invalidate)
+
+
+class _DeletedEntries:
+    """Date span of the entries deleted in one transaction; called once on commit."""
+
+    def __init__(self, day):
+        self.first = self.last = day
+
+    def add(self, day):
+        self.first, self.last = min(self.first, day), max(self.last, day)
+
+    def __call__(self):
+        forget_watermarks(self.first, self.last)
+        forget_rollup_watermarks()
+
+
+@receiver(post_delete, sender=ForecastEntry)
+@receiver(post_delete, sender=RealizedEntry)
+def entry_deleted(sender, instance, **kwargs):
+    # no queries per row: the watermarks are dropped once, after the deleting transaction commits
+    connection = transaction.get_connection()
+    pending = getattr(connection, "deleted_entries", None)
+    # a rollback discards the queued callback along with the deletes
+    if pending is None or not any(pending in queued for queued in connection.run_on_commit):
+        pending = connection.deleted_entries = _DeletedEntries(instance.date)
+        transaction.on_commit(pending)
+    else:
+        pending.add(instance.date)
@@ -0,0 +1,308 @@
+# core/spatial.py
+"""
+Point-in-polygon lookup of lat/lon -> District over the district GeoJSON.
+
+Every polygon ring is flattened into one edge table. A uniform grid over the
+polygons' bounding box stores, per cell, the edges that touch the cell and the
+polygons that contain the cell's centre. A point lies in polygon P when its
+cell centre is in P XOR the segment centre -> point crosses an odd number of
+P's edges, so a lookup only tests the few edges of one cell. Batches are
+classified with array operations over all (point, candidate edge) pairs.
+
+Polygons come from settings.DISTRICT_GEOJSON (features matched to District
+codes by their DIST_ID / code / name properties) and from each District's own
+geojson_file. district_locator() rebuilds the index when the district
+registry's generation moves on.
+"""
+import json
+import threading
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .districts import district_registry
+
+GEOJSON_DIR = Path(settings.BASE_DIR) / "core" / "static" / "geojson"
+DISTRICT_GEOJSON = Path(getattr(settings, "DISTRICT_GEOJSON", GEOJSON_DIR / "combined_regions_normalized.geojson"))
+LOCATE_CACHE_TIMEOUT = getattr(settings, "DISTRICT_LOCATE_CACHE_TIMEOUT", 24 * 60 * 60)
+LOCATE_DECIMALS = 5  # ~1 m; single-point lookups are cached per rounded coordinate
+EDGES_PER_CELL = 8   # target grid density
+MAX_GRID = 2048      # cells per axis
+CHUNK_POINTS = 20000
+
+# feature properties tried, in order, to find a feature's District
+ID_PROPERTIES = ("DIST_ID", "dist_id", "DISTCODE", "distcode")
+CODE_PROPERTIES = ("code", "CODE", "district_code")
+NAME_PROPERTIES = ("DIST_NAME", "dist_name", "D_NAME")
+
+
+def _orient(ax, ay, bx, by, cx, cy):
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+def _positive(orientation, tie):
+    return (orientation > 0) | ((orientation == 0) & tie)
+
+
+def _crosses(ax, ay, bx, by, cx, cy, px, py):
+    """
+    Whether segment c -> p crosses edge a -> b. Zero orientations are resolved
+    as if every query point were shifted by (eps, eps**2), so a point on a
+    shared edge or vertex lands in exactly one polygon and a path through a
+    vertex is counted once.
+    """
+    edge_tie = (by < ay) | ((by == ay) & (bx > ax))
+    path_tie = (py > cy) | ((py == cy) & (px < cx))
+    return ((_positive(_orient(ax, ay, bx, by, cx, cy), edge_tie) != _positive(_orient(ax, ay, bx, by, px, py), edge_tie))
+            & (_positive(_orient(cx, cy, px, py, ax, ay), path_tie)
+               != _positive(_orient(cx, cy, px, py, bx, by), path_tie)))
+
+
+def _expand(ptr, items, rows):
+    """For CSR (ptr, items), return (position in ``rows``, item) for every item of every row."""
+    counts = ptr[rows + 1] - ptr[rows]
+    position = np.repeat(np.arange(len(rows)), counts)
+    first = np.repeat(ptr[rows] - (np.cumsum(counts) - counts), counts)
+    return position, items[first + np.arange(counts.sum())]
+
+
+def _csr(rows, items, n_rows):
+    order = np.argsort(rows, kind="stable")
+    ptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=ptr[1:])
+    return ptr, items[order]
+
+
+def _odd_keys(keys):
+    keys, counts = np.unique(keys, return_counts=True)
+    return keys[counts % 2 == 1]
+
+
+def geometry_polygons(geometry):
+    """Yield each polygon of a (Multi)Polygon geometry as a list of (n, 2) lon/lat ring arrays."""
+    if not geometry:
+        return
+    kind = geometry.get("type")
+    if kind == "Polygon":
+        yield [np.asarray(ring, dtype=float)[:, :2] for ring in geometry["coordinates"] if len(ring) >= 3]
+    elif kind == "MultiPolygon":
+        for polygon in geometry["coordinates"]:
+            yield [np.asarray(ring, dtype=float)[:, :2] for ring in polygon if len(ring) >= 3]
+    elif kind == "GeometryCollection":
+        for part in geometry.get("geometries") or []:
+            yield from geometry_polygons(part)
+
+
+class DistrictLocator:
+    """Grid-indexed point-in-polygon classifier; ``polygons`` is [(code, rings)]."""
+
+    def __init__(self, polygons, edges_per_cell=EDGES_PER_CELL):
+        codes, owner, starts, ends, edge_poly = {}, [], [], [], []
+        for code, rings in polygons:
+            poly = len(owner)
+            owner.append(codes.setdefault(code, len(codes)))
+            for ring in rings:
+                starts.append(ring)
+                ends.append(np.roll(ring, -1, axis=0))  # closing edge; a repeated first vertex adds a null edge
+                edge_poly.append(np.full(len(ring), poly, dtype=np.int64))
+        self.codes = list(codes)
+        self.poly_district = np.asarray(owner, dtype=np.int64)
+        self.n_polygons = len(owner)
+        if not starts:
+            self.n_edges = 0
+            return
+
+        a = np.concatenate(starts)
+        b = np.concatenate(ends)
+        self.edge_poly = np.concatenate(edge_poly)
+        self.ax, self.ay, self.bx, self.by = a[:, 0], a[:, 1], b[:, 0], b[:, 1]
+        self.n_edges = len(a)
+
+        # grid sized for about edges_per_cell edges per cell
+        self.x0, self.y0 = a[:, 0].min(), a[:, 1].min()
+        width = max(a[:, 0].max() - self.x0, 1e-9)
+        height = max(a[:, 1].max() - self.y0, 1e-9)
+        cells = max(1.0, self.n_edges / edges_per_cell)
+        self.nx = int(np.clip(np.ceil(np.sqrt(cells * width / height)), 1, MAX_GRID))
+        self.ny = int(np.clip(np.ceil(cells / self.nx), 1, MAX_GRID))
+        self.dx, self.dy = width / self.nx, height / self.ny
+
+        # every edge is listed in each cell its bounding box overlaps
+        ix0, ix1 = self._col(np.minimum(self.ax, self.bx)), self._col(np.maximum(self.ax, self.bx))
+        iy0, iy1 = self._row(np.minimum(self.ay, self.by)), self._row(np.maximum(self.ay, self.by))
+        span_x = ix1 - ix0 + 1
+        counts = span_x * (iy1 - iy0 + 1)
+        edge = np.repeat(np.arange(self.n_edges), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell = (iy0[edge] + local // span_x[edge]) * self.nx + ix0[edge] + local % span_x[edge]
+        self.cell_ptr, self.cell_edges = _csr(cell, edge, self.nx * self.ny)
+
+        self.center_ptr, self.center_polys = self._center_polygons()
+
+    def __len__(self):
+        return self.n_polygons
+
+    def _col(self, x):
+        return np.clip(((x - self.x0) / self.dx).astype(np.int64), 0, self.nx - 1)
+
+    def _row(self, y):
+        return np.clip(((y - self.y0) / self.dy).astype(np.int64), 0, self.ny - 1)
+
+    def _centers(self, cells):
+        return self.x0 + (cells % self.nx + 0.5) * self.dx, self.y0 + (cells // self.nx + 0.5) * self.dy
+
+    def _center_polygons(self):
+        """CSR of the polygons containing each cell centre, by ray casting from left of the grid."""
+        cells, polys = [], []
+        low, high = np.minimum(self.ay, self.by), np.maximum(self.ay, self.by)
+        cx = self.x0 + (np.arange(self.nx) + 0.5) * self.dx
+        ref_x = self.x0 - 1.0
+        for row in range(self.ny):
+            cy = self.y0 + (row + 0.5) * self.dy
+            e = np.flatnonzero((low <= cy) & (high >= cy))
+            if not len(e):
+                continue
+            ax, ay, bx, by = self.ax[e][None, :], self.ay[e][None, :], self.bx[e][None, :], self.by[e][None, :]
+            step = max(1, CHUNK_POINTS * 100 // len(e))  # bound the (centres, edges) arrays
+            for c0 in range(0, self.nx, step):
+                col, k = np.nonzero(_crosses(ax, ay, bx, by, ref_x, cy, cx[c0:c0 + step, None], cy))
+                keys = _odd_keys((c0 + col) * self.n_polygons + self.edge_poly[e][k])
+                cells.append(row * self.nx + keys // self.n_polygons)
+                polys.append(keys % self.n_polygons)
+        if not cells:
+            return np.zeros(self.nx * self.ny + 1, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return _csr(np.concatenate(cells), np.concatenate(polys), self.nx * self.ny)
+
+    def locate_indices(self, lon, lat):
+        """Index into self.codes for every point, -1 where no polygon contains it."""
+        lon, lat = np.asarray(lon, dtype=float).ravel(), np.asarray(lat, dtype=float).ravel()
+        out = np.full(len(lon), -1, dtype=np.int64)
+        if not self.n_edges:
+            return out
+        for start in range(0, len(lon), CHUNK_POINTS):
+            x, y = lon[start:start + CHUNK_POINTS], lat[start:start + CHUNK_POINTS]
+            fx, fy = (x - self.x0) / self.dx, (y - self.y0) / self.dy
+            inside = np.flatnonzero((fx >= 0) & (fx <= self.nx) & (fy >= 0) & (fy <= self.ny))
+            if not len(inside):
+                continue
+            px, py = x[inside], y[inside]
+            cell = self._row(py) * self.nx + self._col(px)
+            cx, cy = self._centers(cell)
+
+            # polygons whose edges the centre -> point segment crosses an odd number of times
+            point, e = _expand(self.cell_ptr, self.cell_edges, cell)
+            hit = _crosses(self.ax[e], self.ay[e], self.bx[e], self.by[e], cx[point], cy[point], px[point], py[point])
+            crossed = _odd_keys(point[hit] * self.n_polygons + self.edge_poly[e[hit]])
+            # XOR with the polygons containing the centre
+            point, poly = _expand(self.center_ptr, self.center_polys, cell)
+            keys = _odd_keys(np.concatenate([crossed, point * self.n_polygons + poly]))
+            if not len(keys):
+                continue
+            point, poly = keys // self.n_polygons, keys % self.n_polygons
+            # overlapping polygons: keys are sorted, so the first per point has the lowest index
+            point, first = np.unique(point, return_index=True)
+            out[start + inside[point]] = self.poly_district[poly[first]]
+        return out
+
+    def locate(self, lon, lat):
+        """District code (or None) for every point."""
+        lookup = np.asarray(self.codes + [None], dtype=object)
+        return lookup[self.locate_indices(lon, lat)].tolist()
+
+
+def _read_features(path):
+    with open(path, encoding="utf8") as fh:
+        doc = json.load(fh)
+    if doc.get("type") == "FeatureCollection":
+        return doc.get("features") or []
+    if doc.get("type") == "Feature":
+        return [doc]
+    return [{"type": "Feature", "properties": {}, "geometry": doc}]
+
+
+def feature_code(properties, code_to_id, name_to_code):
+    """The District code a GeoJSON feature belongs to, or None."""
+    properties = properties or {}
+    for key in ID_PROPERTIES:
+        value = properties.get(key)
+        if value not in (None, ""):
+            for candidate in (f"D_{value}", str(value)):
+                if candidate in code_to_id:
+                    return candidate
+    for key in CODE_PROPERTIES:
+        value = properties.get(key)
+        if value not in (None, "") and str(value) in code_to_id:
+            return str(value)
+    for key in NAME_PROPERTIES:
+        value = properties.get(key)
+        if value and str(value).strip().lower() in name_to_code:
+            return name_to_code[str(value).strip().lower()]
+    return None
+
+
+def load_district_polygons(source=DISTRICT_GEOJSON):
+    """[(district code, rings)] from the combined GeoJSON and every District.geojson_file."""
+    districts = district_registry.all()
+    code_to_id = {d.code: d.id for d in districts}
+    names = {}
+    for d in districts:
+        names.setdefault(d.name.strip().lower(), []).append(d.code)
+    name_to_code = {name: codes[0] for name, codes in names.items() if len(codes) == 1}
+
+    polygons = []
+    source = Path(source)
+    if source.exists():
+        for feature in _read_features(source):
+            code = feature_code(feature.get("properties"), code_to_id, name_to_code)
+            if code is not None:
+                polygons.extend((code, rings) for rings in geometry_polygons(feature.get("geometry")))
+
+    for d in districts:
+        if not d.geojson_file:
+            continue
+        path = Path(d.geojson_file)
+        path = path if path.is_absolute() else GEOJSON_DIR / path
+        if not path.exists() or path.resolve() == source.resolve():
+            continue
+        features = _read_features(path)
+        # a file shared by several districts: keep only the features that name this one
+        own = [f for f in features if feature_code(f.get("properties"), code_to_id, name_to_code) == d.code]
+        for feature in own or features:
+            polygons.extend((d.code, rings) for rings in geometry_polygons(feature.get("geometry")))
+    return polygons
+
+
+_lock = threading.Lock()
+_locator = None
+_generation = None
+
+
+def district_locator():
+    """The process-wide DistrictLocator, rebuilt when districts change."""
+    global _locator, _generation
+    generation = district_registry.generation
+    if _locator is None or generation != _generation:
+        with _lock:
+            if _locator is None or generation != _generation:
+                _locator = DistrictLocator(load_district_polygons())
+                _generation = generation
+    return _locator
+
+
+def locator_generation():
+    """Changes whenever the index is rebuilt; part of cached lookup keys."""
+    district_locator()
+    return _generation
+
+
+def locate_point(lat, lon):
+    """Cached district code (or None) for one coordinate, rounded to LOCATE_DECIMALS."""
+    lat, lon = round(float(lat), LOCATE_DECIMALS), round(float(lon), LOCATE_DECIMALS)
+    key = f"district_locate:{locator_generation()}:{lat}:{lon}"
+    entry = cache.get(key)
+    if entry is None:
+        entry = (district_locator().locate([lon], [lat])[0],)  # wrapped so a miss (None) is cached too
+        cache.set(key, entry, LOCATE_CACHE_TIMEOUT)
+    return entry[0]
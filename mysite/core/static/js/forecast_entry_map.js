@@ -1,6 +1,7 @@
 // core/static/js/forecast_entry_map.js
 // Forecast entry frontend: supports district + state polygons, selection, apply, clear, save/load.
-// Expects template to define GEOJSON_URL (path to combined GeoJSON).
+// Expects template to define GEOJSON_URL (path to combined GeoJSON) and optionally
+// GEOJSON_VARIANTS (simplified per-zoom variants from `manage.py build_geojson`).
 // Expects districts CSV at /static/data/districts_from_geojson.csv
 //
 // IMPORTANT: adapt featureId/featureName/featureStateKey helpers below if your GeoJSON uses different property names.
@@ -32,6 +33,10 @@ let stateLayer = null;
 let mapData = []; // array of {id: area_id_string, name, level:'district'|'state', rainfallCategory, rainfall_mm}
 let selectedAreas = []; // array of area_id strings
 let districtsByState = {}; // mapping state_code -> [area_id_for_district,...]
+let currentRevision = null; // revision of the loaded MapForecast (null = nothing saved for this date)
+let dirtyAreas = new Set(); // area ids changed since the last load/save, sent as a patch
+let loadedDate = null; // date whose forecast (and dirtyAreas) is on the map
+let loadedGeojsonUrl = null; // variant currently drawn
 
 // default CSV path (place your updated CSV here)
 const DISTRICTS_CSV_PATH = "/static/geojson/districts_from_geojson.csv";
@@ -170,7 +175,7 @@ function applySelectedCategory() {
   // apply to direct districts
   districtIds.forEach(did => {
     const rec = getMapDataEntry(did);
-    if (rec) rec.rainfallCategory = cat;
+    if (rec) { rec.rainfallCategory = cat; dirtyAreas.add(String(rec.id)); }
   });
 
   // expand each state to its districts via mapping
@@ -179,7 +184,7 @@ function applySelectedCategory() {
     const districts = districtsByState[state_code] || [];
     districts.forEach(areaId => {
       const rec = getMapDataEntry(areaId);
-      if (rec) rec.rainfallCategory = cat;
+      if (rec) { rec.rainfallCategory = cat; dirtyAreas.add(String(rec.id)); }
     });
   }
 
@@ -211,19 +216,24 @@ function renderLegend() {
   el.legend.innerHTML = legendHtml;
 }
 
-// Save full map forecast via POST to backend
+function areaPayload(item) {
+  return {
+    category: item.rainfallCategory || "DRY",
+    rainfall_mm: item.rainfall_mm ?? null,
+    name: item.name || null,
+    level: item.level || null,
+  };
+}
+
+// Save map forecast via POST to backend: only the changed areas when a saved
+// revision is loaded, otherwise the full map
 async function saveFullMapForecast() {
   // build payload: date + map data (area_id -> {category, rainfall_mm})
   const dateIso = el.date ? el.date.value : null;
   if (!dateIso) { alert("Please select a date before saving"); return; }
   const dataObj = {};
   mapData.forEach(item => {
-    dataObj[String(item.id)] = {
-      category: item.rainfallCategory || "DRY",
-      rainfall_mm: item.rainfall_mm ?? null,
-      name: item.name || null,
-      level: item.level || null,
-    };
+    if (currentRevision === null || dirtyAreas.has(String(item.id))) dataObj[String(item.id)] = areaPayload(item);
   });
 
   // CSRF token
@@ -233,7 +243,9 @@ async function saveFullMapForecast() {
   }
   const csrftoken = getCookie('csrftoken');
 
-  const payload = { date: dateIso, scope: "mixed", data: dataObj };
+  const payload = currentRevision === null
+    ? { date: dateIso, scope: "mixed", data: dataObj }
+    : { date: dateIso, scope: "mixed", patch: dataObj, expected_revision: currentRevision };
 
   try {
     const resp = await fetch('/forecast/save_map/', {
@@ -245,6 +257,11 @@ async function saveFullMapForecast() {
       credentials: 'same-origin',
       body: JSON.stringify(payload)
     });
+    if (resp.status === 409) {
+      alert("This forecast was changed by someone else. Reloading the latest version; re-apply your changes.");
+      await loadMapForecastForDate(dateIso);
+      return;
+    }
     if (!resp.ok) {
       const text = await resp.text();
       console.error("Save failed:", resp.status, text);
@@ -253,6 +270,8 @@ async function saveFullMapForecast() {
     }
     const j = await resp.json();
     if (j.ok) {
+      currentRevision = j.revision ?? null;
+      dirtyAreas.clear();
       alert(`Forecast saved for ${j.date}`);
     } else {
       alert("Save returned not-ok");
@@ -263,13 +282,30 @@ async function saveFullMapForecast() {
   }
 }
 
+// Date picker changes: ask before dropping unsaved edits of the date on the map
+function switchDate(dateIso) {
+  if (dateIso === loadedDate) return;
+  const where = loadedDate ? ` for ${loadedDate}` : "";
+  if (dirtyAreas.size && !confirm(`You have unsaved changes${where} (${dirtyAreas.size} areas). Discard them?`)) {
+    // put the picker back on the date being edited
+    if (el.date && el.date._flatpickr) el.date._flatpickr.setDate(loadedDate || "", false);
+    else if (el.date) el.date.value = loadedDate || "";
+    return;
+  }
+  loadMapForecastForDate(dateIso);
+}
+
 // Load for selected date (if exists)
 async function loadMapForecastForDate(dateIso) {
+  currentRevision = null;
+  dirtyAreas.clear();
+  loadedDate = dateIso;
   try {
     const resp = await fetch(`/forecast/get_map/?date=${encodeURIComponent(dateIso)}`, { credentials: 'same-origin' });
     if (!resp.ok) { console.warn("Load fetch failed", resp.status); return null; }
     const j = await resp.json();
     if (!j.ok || !j.found) { console.log("No saved forecast for date", dateIso); return null; }
+    currentRevision = j.revision ?? null;
     // j.data: area_id -> {category,...}
     const dmap = j.data || {};
     // apply to mapData entries
@@ -291,6 +327,52 @@ async function loadMapForecastForDate(dateIso) {
   }
 }
 
+// pick the simplified variant for a zoom level (coarsest that covers it)
+function geojsonUrlForZoom(zoom) {
+  const variants = (typeof GEOJSON_VARIANTS !== 'undefined') ? GEOJSON_VARIANTS : [];
+  const v = variants.find(v => v.maxZoom === null || zoom <= v.maxZoom);
+  // TopoJSON variants are smaller but need topojson-client to decode
+  if (v && v.topoUrl && typeof topojson !== 'undefined') return v.topoUrl;
+  return v ? v.url : ((typeof GEOJSON_URL !== 'undefined') ? GEOJSON_URL : null);
+}
+
+async function fetchFeatures(url) {
+  const r = await fetch(url, { credentials: 'same-origin' });
+  if (!r.ok) throw new Error("GeoJSON fetch failed: " + r.status);
+  let gj = await r.json();
+  if (gj.type === 'Topology') gj = topojson.feature(gj, Object.values(gj.objects)[0]);
+  return (gj.type === 'FeatureCollection') ? gj.features : (Array.isArray(gj) ? gj : []);
+}
+
+// (re)create the district/state layers from features; mapData is kept
+function buildLayers(features) {
+  const districtFeatures = [];
+  const stateFeatures = [];
+  features.forEach(f => {
+    if (featureLevel(f) === 'district') districtFeatures.push(f);
+    else stateFeatures.push(f);
+  });
+  if (districtLayer) feMap.removeLayer(districtLayer);
+  if (stateLayer) feMap.removeLayer(stateLayer);
+  districtLayer = L.geoJSON({ type:'FeatureCollection', features: districtFeatures }, { style: styleForFeature, onEachFeature }).addTo(feMap);
+  stateLayer = L.geoJSON({ type:'FeatureCollection', features: stateFeatures }, { style: styleForFeature, onEachFeature }).addTo(feMap);
+  applyGranularity();
+  return { districtFeatures, stateFeatures };
+}
+
+// swap to a finer/coarser geometry variant when the zoom band changes
+async function onZoomEnd() {
+  const url = geojsonUrlForZoom(feMap.getZoom());
+  if (url === loadedGeojsonUrl) return;
+  loadedGeojsonUrl = url;
+  try {
+    const features = await fetchFeatures(url);
+    if (url === loadedGeojsonUrl) buildLayers(features);
+  } catch (err) {
+    console.warn("GeoJSON variant load failed:", err);
+  }
+}
+
 // Initialize map & layers
 async function init() {
   if (typeof L === 'undefined') {
@@ -307,24 +389,17 @@ async function init() {
   await loadDistrictsCsv();
 
   // fetch geojson
-  if (typeof GEOJSON_URL === 'undefined' || !GEOJSON_URL) {
+  if (!geojsonUrlForZoom(feMap.getZoom())) {
     console.error("GEOJSON_URL not defined in template. Please set it to your combined geojson static path.");
     el.legend && (el.legend.innerHTML = "<div style='color:#b91c1c'>GEOJSON_URL not set</div>");
     return;
   }
 
   try {
-    const r = await fetch(GEOJSON_URL, { credentials: 'same-origin' });
-    if (!r.ok) throw new Error("GeoJSON fetch failed: " + r.status);
-    const gj = await r.json();
-    const features = (gj.type === 'FeatureCollection') ? gj.features : (Array.isArray(gj) ? gj : []);
-    // split into district & state features
-    const districtFeatures = [];
-    const stateFeatures = [];
-    features.forEach(f => {
-      if (featureLevel(f) === 'district') districtFeatures.push(f);
-      else stateFeatures.push(f);
-    });
+    loadedGeojsonUrl = geojsonUrlForZoom(feMap.getZoom());
+    const features = await fetchFeatures(loadedGeojsonUrl);
+    // split into district & state features and add layers
+    const { districtFeatures, stateFeatures } = buildLayers(features);
 
     // init mapData entries for all features
     mapData = [];
@@ -341,10 +416,6 @@ async function init() {
       mapData.push({ id, name, level: 'state', rainfallCategory: 'DRY', rainfall_mm: null });
     });
 
-    // add layers
-    districtLayer = L.geoJSON({ type:'FeatureCollection', features: districtFeatures }, { style: styleForFeature, onEachFeature }).addTo(feMap);
-    stateLayer = L.geoJSON({ type:'FeatureCollection', features: stateFeatures }, { style: styleForFeature, onEachFeature }).addTo(feMap);
-
     // fit bounds
     try {
       const bounds = districtLayer.getBounds().extend(stateLayer.getBounds());
@@ -355,6 +426,7 @@ async function init() {
     applyGranularity();
 
     // wire UI
+    feMap.on('zoomend', onZoomEnd);
     if (el.granularity) el.granularity.addEventListener('change', applyGranularity);
     if (el.applyBtn) el.applyBtn.addEventListener('click', applySelectedCategory);
     if (el.clearBtn) el.clearBtn.addEventListener('click', () => { selectedAreas = []; if (districtLayer) districtLayer.eachLayer(l => l.setStyle(styleForFeature(l.feature))); if (stateLayer) stateLayer.eachLayer(l => l.setStyle(styleForFeature(l.feature))); updateApplyState(); renderLegend(); });
@@ -368,16 +440,19 @@ async function init() {
         dateFormat: "Y-m-d",
         onChange(selectedDates, str) {
           // When date changes, load any saved map forecast for that date
-          if (str) loadMapForecastForDate(str);
+          if (str) switchDate(str);
         }
       });
     } else if (el.date) {
       el.date.type = 'date';
-      el.date.addEventListener('change', () => { if (el.date.value) loadMapForecastForDate(el.date.value); });
+      el.date.addEventListener('change', () => { if (el.date.value) switchDate(el.date.value); });
     }
     if (el.todayBtn) el.todayBtn.addEventListener('click', () => {
       const today = new Date().toISOString().slice(0,10);
-      if (el.date) { el.date.value = today; loadMapForecastForDate(today); }
+      if (el.date) { el.date.value = today; switchDate(today); }
+    });
+    window.addEventListener('beforeunload', (e) => {
+      if (dirtyAreas.size) { e.preventDefault(); e.returnValue = ""; }
     });
 
     updateApplyState();
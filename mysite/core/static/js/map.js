@@ -1,4 +1,5 @@
 // map.js — expects GEOJSON_URL and CSV_URL variables set in the page template
+// (and optionally GEOJSON_VARIANTS, the simplified per-zoom files from `manage.py build_geojson`)
 document.addEventListener('DOMContentLoaded', function () {
   window.map = L.map('map').setView([22.57, 87.0], 7);
 
@@ -24,40 +25,77 @@ document.addEventListener('DOMContentLoaded', function () {
   var featureMap = {};
 
   var geojsonUrl = (typeof GEOJSON_URL !== 'undefined') ? GEOJSON_URL : '/static/geojson/combined_regions.geojson';
+  var geojsonVariants = (typeof GEOJSON_VARIANTS !== 'undefined') ? GEOJSON_VARIANTS : [];
   var csvUrl = (typeof CSV_URL !== 'undefined') ? CSV_URL : '/static/geojson/districts_from_geojson.csv';
+  var loadedUrl = null;
 
-  fetch(geojsonUrl)
-    .then(function (r) {
-      if (!r.ok) throw new Error('GeoJSON not found: ' + r.status);
-      return r.json();
-    })
-    .then(function (data) {
-      areaLayer = L.geoJSON(data, {
-        style: function (f) {
-          const lvl = getAreaLevel(f.properties);
-          return {
-            color: (lvl === 'state' ? '#111' : '#2b7'), // darker outline for states
-            weight: (lvl === 'state' ? 2 : 1),
-            fillOpacity: 0.12
-          };
-        },
-        onEachFeature: function (feature, layer) {
-          var name = getAreaName(feature.properties);
-          var level = getAreaLevel(feature.properties);
-          layer.bindPopup('<strong>' + name + '</strong><br/>(' + level + ')');
-          layer.on('click', function () {
-            layer.openPopup();
-            highlightFeature(layer);
-            var sel = document.getElementById('district-select');
-            if (sel) sel.value = name;
-          });
-          featureMap[name] = layer;
+  // coarsest simplified variant that covers the zoom level, else the full file
+  function geojsonUrlForZoom(zoom) {
+    for (var i = 0; i < geojsonVariants.length; i++) {
+      var v = geojsonVariants[i];
+      if (v.maxZoom === null || zoom <= v.maxZoom) {
+        // TopoJSON variants are smaller but need topojson-client to decode
+        return (v.topoUrl && typeof topojson !== 'undefined') ? v.topoUrl : v.url;
+      }
+    }
+    return geojsonUrl;
+  }
+
+  function loadAreas(url, fit) {
+    loadedUrl = url;
+    return fetch(url)
+      .then(function (r) {
+        if (!r.ok) throw new Error('GeoJSON not found: ' + r.status);
+        return r.json();
+      })
+      .then(function (data) {
+        if (url !== loadedUrl) return null;  // a newer zoom band was requested meanwhile
+        if (data.type === 'Topology') data = topojson.feature(data, Object.values(data.objects)[0]);
+        if (areaLayer) window.map.removeLayer(areaLayer);
+        lastHighlighted = null;
+        featureMap = {};
+        drawAreas(data);
+        if (fit) {
+          try { window.map.fitBounds(areaLayer.getBounds(), {padding:[20,20]}); } catch(e){}
         }
-      }).addTo(window.map);
+        return data;
+      });
+  }
 
-      try { window.map.fitBounds(areaLayer.getBounds(), {padding:[20,20]}); } catch(e){}
+  function drawAreas(data) {
+    areaLayer = L.geoJSON(data, {
+      style: function (f) {
+        const lvl = getAreaLevel(f.properties);
+        return {
+          color: (lvl === 'state' ? '#111' : '#2b7'), // darker outline for states
+          weight: (lvl === 'state' ? 2 : 1),
+          fillOpacity: 0.12
+        };
+      },
+      onEachFeature: function (feature, layer) {
+        var name = getAreaName(feature.properties);
+        var level = getAreaLevel(feature.properties);
+        layer.bindPopup('<strong>' + name + '</strong><br/>(' + level + ')');
+        layer.on('click', function () {
+          layer.openPopup();
+          highlightFeature(layer);
+          var sel = document.getElementById('district-select');
+          if (sel) sel.value = name;
+        });
+        featureMap[name] = layer;
+      }
+    }).addTo(window.map);
+  }
 
-      populateDropdownFromGeoJSON(data);
+  loadAreas(geojsonUrlForZoom(window.map.getZoom()), true)
+    .then(function (data) {
+      if (data) populateDropdownFromGeoJSON(data);
+      window.map.on('zoomend', function () {
+        var url = geojsonUrlForZoom(window.map.getZoom());
+        if (url !== loadedUrl) {
+          loadAreas(url, false).catch(function (err) { console.warn('GeoJSON variant load failed:', err); });
+        }
+      });
     })
     .catch(function (err) {
       console.error('Failed to load geojson:', err);
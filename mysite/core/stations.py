@@ -0,0 +1,300 @@
+# core/stations.py
+"""
+Areal rainfall from raw gauge readings.
+
+Station files (CSV/NDJSON rows with station, date, rainfall_mm and, for
+stations not seen before, lat/lon) are streamed in chunks. Each station is
+mapped to its district once, when it is registered, and the {code: (station
+id, district id)} table is cached per process like the district registry.
+Readings are kept as flat arrays, stored as StationReading rows (the last
+report per station and day), and every district/day they touch is reduced from
+all of its stored readings in one pass: mean, max, station count and the share
+of wet stations, which gives the map's spatial-distribution category. So a
+second, partial file for a day adds its gauges to the first one's. The results
+are bulk-upserted as RealizedEntry rows for every requested horizon.
+"""
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .districts import GenerationCachedTable, district_registry
+from .ingest import MAX_HORIZON, chunked, upsert_entries
+from .models import RealizedEntry, Station, StationReading
+from .multicategory import CATEGORIES, CATEGORY_UPPER_MM, coverage_codes
+
+GENERATION_KEY = "station_table:generation"
+STATION_COLUMNS = ("station", "station_id", "station_code", "code")
+RAIN_COLUMNS = ("rainfall_mm", "rainfall", "rain_mm")
+WET_MM = CATEGORY_UPPER_MM[0]  # a station reporting at least this much is "wet" (the DRY upper bound)
+MAX_STATION_CODE = Station._meta.get_field("code").max_length
+
+
+class StationTable(GenerationCachedTable):
+    """Process-wide {station code: (station id, district id or None)}."""
+    generation_key = GENERATION_KEY
+
+    def _current_generation(self):
+        # a deleted district nulls its stations' FK without a Station signal
+        return super()._current_generation(), district_registry.generation
+
+    def _load(self):
+        return {code: (pk, district_id) for pk, code, district_id in
+                Station.objects.order_by().values_list("id", "code", "district_id")}
+
+    def table(self):
+        return self.data()
+
+
+station_table = StationTable()
+
+
+def _first(row, columns):
+    for column in columns:
+        value = row.get(column)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def register_stations(rows):
+    """
+    Create the stations in ``rows`` (dicts with code, lat, lon, name) that
+    don't exist yet, locating all of them with one batch call. Returns how
+    many were created.
+    """
+    from .spatial import district_locator
+
+    known = station_table.table()
+    new = {}
+    for row in rows:
+        if row["code"] not in known:
+            new[row["code"]] = row
+    if not new:
+        return 0
+    rows = list(new.values())
+    codes = district_locator().locate([r["lon"] for r in rows], [r["lat"] for r in rows])
+    code_to_id = district_registry.code_to_id()
+    Station.objects.bulk_create(
+        [Station(code=r["code"], name=(r.get("name") or "")[:120], lat=r["lat"], lon=r["lon"],
+                 district_id=code_to_id.get(code)) for r, code in zip(rows, codes)],
+        ignore_conflicts=True, batch_size=1000,
+    )
+    station_table.invalidate()
+    return len(rows)
+
+
+def relocate_stations():
+    """Re-resolve the district of every station with coordinates (after boundaries change)."""
+    from .spatial import district_locator
+
+    stations = list(Station.objects.exclude(lat=None).exclude(lon=None).only("id", "lat", "lon", "district_id"))
+    if not stations:
+        return 0
+    codes = district_locator().locate([s.lon for s in stations], [s.lat for s in stations])
+    code_to_id = district_registry.code_to_id()
+    changed = []
+    for station, code in zip(stations, codes):
+        district_id = code_to_id.get(code)
+        if district_id != station.district_id:
+            station.district_id = district_id
+            changed.append(station)
+    Station.objects.bulk_update(changed, ["district_id"], batch_size=1000)
+    station_table.invalidate()
+    return len(changed)
+
+
+class AreaAggregates:
+    """Per (district, day) areal statistics, all arrays of the same length."""
+
+    def __init__(self, district, day, mean, max, count, wet):
+        self.district = district
+        self.day = day
+        self.mean = mean
+        self.max = max
+        self.count = count
+        self.wet = wet
+
+    def __len__(self):
+        return len(self.district)
+
+    def categories(self):
+        return coverage_codes(self.wet / np.maximum(self.count, 1))
+
+    def select(self, mask):
+        return AreaAggregates(self.district[mask], self.day[mask], self.mean[mask], self.max[mask],
+                              self.count[mask], self.wet[mask])
+
+
+class StationAggregator:
+    """
+    Accumulates readings chunk by chunk; ``aggregate()`` reduces them.
+    A station reporting twice for the same day keeps its last reading.
+    """
+
+    def __init__(self):
+        self.stations = []
+        self.districts = []
+        self.days = []
+        self.mm = []
+        self.rows = 0
+        self.skipped = {"invalid": 0, "unknown_station": 0, "unmapped": 0}
+        self.registered = 0
+
+    def add(self, rows):
+        """Parse one chunk of row dicts, registering any new stations that carry lat/lon."""
+        parsed = []
+        new = []
+        known = station_table.table()
+        for row in rows:
+            self.rows += 1
+            code = _first(row, STATION_COLUMNS)
+            try:
+                day = parse_date(str(row.get("date") or "").strip()[:10])
+            except ValueError:  # well formed but not a real date
+                day = None
+            mm = _float(_first(row, RAIN_COLUMNS))
+            if code is None or day is None or mm is None or not mm >= 0:  # also drops NaN and -999 fill values
+                self.skipped["invalid"] += 1
+                continue
+            code = str(code).strip()
+            if len(code) > MAX_STATION_CODE:
+                self.skipped["invalid"] += 1
+                continue
+            parsed.append((code, day, mm))
+            if code not in known:
+                lat, lon = _float(row.get("lat")), _float(row.get("lon"))
+                if lat is not None and lon is not None:
+                    new.append({"code": code, "lat": lat, "lon": lon, "name": row.get("name")})
+        if new:
+            self.registered += register_stations(new)
+            known = station_table.table()
+
+        station, district, days, mm = [], [], [], []
+        for code, day, value in parsed:
+            entry = known.get(code)
+            if entry is None:
+                self.skipped["unknown_station"] += 1
+            elif entry[1] is None:
+                self.skipped["unmapped"] += 1
+            else:
+                station.append(entry[0])
+                district.append(entry[1])
+                days.append(day)
+                mm.append(value)
+        self.stations.append(np.asarray(station, dtype=np.int64))
+        self.districts.append(np.asarray(district, dtype=np.int64))
+        self.days.append(np.asarray(days, dtype="datetime64[D]"))
+        self.mm.append(np.asarray(mm, dtype=float))
+
+    def readings(self):
+        """(station, district, day, mm) arrays with the last reading per station and day."""
+        if not self.mm:
+            return last_readings(*_no_readings())
+        return last_readings(np.concatenate(self.stations), np.concatenate(self.districts),
+                             np.concatenate(self.days), np.concatenate(self.mm))
+
+    def aggregate(self):
+        return aggregate_readings(*self.readings())
+
+
+def _no_readings():
+    return tuple(np.empty(0, dtype=t) for t in (np.int64, np.int64, "datetime64[D]", float))
+
+
+def last_readings(station, district, day, mm):
+    """Drop all but the last reading per (station, day) from flat reading arrays."""
+    # stable sort by (station, day) keeps file order within a key, so the last index is the last reading
+    order = np.lexsort((day, station))
+    s, d = station[order], day[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = (s[1:] != s[:-1]) | (d[1:] != d[:-1])
+    keep = order[last]
+    return station[keep], district[keep], day[keep], mm[keep]
+
+
+def aggregate_readings(station, district, day, mm):
+    """Grouped reductions over flat reading arrays (last reading wins per station and day)."""
+    if not len(mm):
+        empty = np.empty(0, dtype=np.int64)
+        return AreaAggregates(empty, np.empty(0, dtype="datetime64[D]"), np.empty(0), np.empty(0), empty, empty)
+    _, district, day, mm = last_readings(station, district, day, mm)
+    order = np.lexsort((day, district))
+    district, day, mm = district[order], day[order], mm[order]
+    starts = np.flatnonzero(np.r_[True, (district[1:] != district[:-1]) | (day[1:] != day[:-1])])
+    count = np.diff(np.r_[starts, len(mm)])
+    wet = np.add.reduceat((mm >= WET_MM).astype(np.int64), starts)
+    return AreaAggregates(district[starts], day[starts], np.add.reduceat(mm, starts) / count,
+                          np.maximum.reduceat(mm, starts), count, wet)
+
+
+def save_readings(station, day, mm, batch_size=2000):
+    """Upsert StationReading rows on (station, date); a later report replaces the stored value."""
+    objs = [StationReading(station_id=int(s), date=d, rainfall_mm=float(v))
+            for s, d, v in zip(station, day.tolist(), mm)]
+    kwargs = {"update_conflicts": True, "update_fields": ["rainfall_mm", "updated_at"]}
+    if connection.features.supports_update_conflicts_with_target:
+        kwargs["unique_fields"] = ["station", "date"]
+    StationReading.objects.bulk_create(objs, batch_size=batch_size, **kwargs)
+
+
+def stored_aggregates(district, day):
+    """Aggregates of the given (district, day) pairs over every stored reading of their stations."""
+    keys = set(zip(district.tolist(), day.tolist()))
+    if not keys:
+        return aggregate_readings(*_no_readings())
+    rows = list(StationReading.objects.filter(date__in={d for _, d in keys},
+                                              station__district_id__in={k for k, _ in keys})
+                .order_by().values_list("station_id", "station__district_id", "date", "rainfall_mm"))
+    station, districts, days, mm = zip(*rows)
+    aggregates = aggregate_readings(np.asarray(station, dtype=np.int64), np.asarray(districts, dtype=np.int64),
+                                    np.asarray(days, dtype="datetime64[D]"), np.asarray(mm, dtype=float))
+    # the filter is a cross product of districts and days; keep only the pairs asked for
+    wanted = [(k, d) in keys for k, d in zip(aggregates.district.tolist(), aggregates.day.tolist())]
+    return aggregates.select(np.asarray(wanted, dtype=bool))
+
+
+def realized_entries(aggregates, horizons, observed_at=None):
+    """Unsaved RealizedEntry rows, one per aggregate and horizon."""
+    observed_at = observed_at or timezone.now()
+    categories = aggregates.categories()
+    objs = []
+    for i in range(len(aggregates)):
+        district_id = int(aggregates.district[i])
+        day = aggregates.day[i].item()
+        extras = {"station_count": int(aggregates.count[i]), "wet_stations": int(aggregates.wet[i]),
+                  "max_mm": round(float(aggregates.max[i]), 2)}
+        for horizon in horizons:
+            objs.append(RealizedEntry(district_id=district_id, date=day, horizon=horizon,
+                                      rainfall_mm=round(float(aggregates.mean[i]), 2),
+                                      rainfall_category=CATEGORIES[categories[i]], extras=dict(extras),
+                                      observed_at=observed_at))
+    return objs
+
+
+def ingest_station_rows(rows, horizons=None, chunk_size=5000, batch_size=2000):
+    """
+    Stream ``rows`` through a StationAggregator, store the readings and
+    upsert the areal aggregates of every district/day they touch, computed
+    from all stored readings. Returns (aggregator, aggregates, entries written).
+    """
+    horizons = sorted(set(horizons or range(1, MAX_HORIZON + 1)))
+    aggregator = StationAggregator()
+    for chunk in chunked(rows, chunk_size):
+        aggregator.add(chunk)
+    station, district, day, mm = aggregator.readings()
+    written = 0
+    with transaction.atomic():
+        save_readings(station, day, mm, batch_size)
+        aggregates = stored_aggregates(district, day)
+        objs = realized_entries(aggregates, horizons)
+        for batch in chunked(objs, batch_size):
+            written += upsert_entries(RealizedEntry, batch)
+    return aggregator, aggregates, written
@@ -0,0 +1,38 @@
+# core/templatetags/geojson_tags.py
+import json
+import os
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.templatetags.static import static
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+MANIFEST_PATH = "geojson/build/manifest.json"
+_manifest = {"path": None, "mtime": None, "data": {}}
+
+
+def load_manifest():
+    """The build_geojson manifest, re-read only when the file changes."""
+    path = finders.find(MANIFEST_PATH)
+    if not path:
+        return {}
+    mtime = os.path.getmtime(path)
+    if (_manifest["path"], _manifest["mtime"]) != (path, mtime):
+        with open(path, encoding="utf8") as fh:
+            _manifest.update(path=path, mtime=mtime, data=json.load(fh))
+    return _manifest["data"]
+
+
+@register.simple_tag
+def geojson_variants(stem):
+    """
+    JSON list of {band, maxZoom, url, topoUrl} for the simplified variants of
+    ``stem`` (coarsest first), or [] when build_geojson has not been run.
+    """
+    variants = load_manifest().get(stem, {}).get("variants", [])
+    out = [{"band": v["band"], "maxZoom": v["max_zoom"], "url": static(v["file"]),
+            "topoUrl": static(v["topojson_file"]) if v.get("topojson_file") else None}
+           for v in variants]
+    return mark_safe(json.dumps(out))
@@ -1,3 +1,1152 @@
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from .models import (District, ForecastEntry, MapForecast, MapForecastArea, RealizedEntry, VerificationScore,
+                     VerificationWatermark)
+from .rollups import bucket_end, bucket_start, rollup_scores
+from .verification import Scores, fetch_pairs, score_pairs, score_parallel
+
+
+def temp_dir(test):
+    """A temporary directory removed when ``test`` finishes."""
+    path = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def square(x, y, size=1.0):
+    return [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+
+
+def square_districts(test, districts=(("WEST", 88.0), ("EAST", 89.0))):
+    """Districts whose geojson_file is a 1x1 degree square from (x, 22) for each (code, x)."""
+    tmp = temp_dir(test)
+    created = []
+    for code, x in districts:
+        path = os.path.join(tmp, f"{code}.geojson")
+        with open(path, "w") as fh:
+            json.dump({"type": "Feature", "properties": {},
+                       "geometry": {"type": "Polygon", "coordinates": [square(x, 22.0)]}}, fh)
+        created.append(District.objects.create(code=code, name=code.title(), geojson_file=path))
+    return created
+
+
+class ComputeVerificationTests(TestCase):
+    def setUp(self):
+        self.d1 = District.objects.create(code="D1", name="One")
+        self.d2 = District.objects.create(code="D2", name="Two")
+        rows = [
+            # district, day, horizon, forecast, observed
+            (self.d1, 1, 1, 5.0, 3.0),
+            (self.d1, 2, 1, 0.0, 4.0),
+            (self.d1, 3, 1, 3.0, 0.0),
+            (self.d1, 4, 1, None, 1.0),
+            (self.d2, 1, 1, 1.0, 1.0),
+            (self.d2, 1, 2, 10.0, 20.0),
+        ]
+        for district, day, horizon, f, o in rows:
+            ForecastEntry.objects.create(district=district, date=date(2025, 7, day), horizon=horizon, rainfall_mm=f)
+            RealizedEntry.objects.create(district=district, date=date(2025, 7, day), horizon=horizon, rainfall_mm=o)
+        # forecast without an observation is not paired
+        ForecastEntry.objects.create(district=self.d1, date=date(2025, 7, 5), horizon=1, rainfall_mm=50.0)
+        self.age_entries()
+
+    def age_entries(self):
+        """Move every entry out of the incremental watermark's lag window."""
+        hour_ago = timezone.now() - timedelta(hours=1)
+        ForecastEntry.objects.update(entered_at=hour_ago, modified_at=hour_ago)
+        RealizedEntry.objects.update(entered_at=hour_ago, modified_at=hour_ago, observed_at=None)
+
+    def scores(self, **filters):
+        qs = VerificationScore.objects.filter(**filters)
+        return {(s.district_id, s.horizon, s.metric): s.value for s in qs}
+
+    def test_single_horizon(self):
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", stdout=StringIO())
+        s = self.scores()
+        self.assertAlmostEqual(s[(self.d1.id, 1, "MAE")], (2 + 4 + 3 + 1) / 4)
+        self.assertAlmostEqual(s[(self.d1.id, 1, "POD")], 1 / 2)
+        self.assertAlmostEqual(s[(self.d1.id, 1, "FAR")], 1 / 2)
+        self.assertAlmostEqual(s[(self.d1.id, 1, "CSI")], 1 / 3)
+        # no events at all: only MAE is defined
+        self.assertEqual(s[(self.d2.id, 1, "MAE")], 0.0)
+        self.assertNotIn((self.d2.id, 1, "POD"), s)
+        self.assertFalse(any(h == 2 for _, h, _ in s))
+
+    def test_all_horizons_rerun_replaces_rows(self):
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", all_horizons=True, stdout=StringIO())
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", all_horizons=True, stdout=StringIO())
+        s = self.scores(horizon=2)
+        self.assertEqual(s[(self.d2.id, 2, "MAE")], 10.0)
+        self.assertEqual(s[(self.d2.id, 2, "CSI")], 1.0)
+        self.assertEqual(VerificationScore.objects.filter(district=self.d2, horizon=2, metric="MAE").count(), 1)
+
+    def test_incremental_only_rescores_changed_cells(self):
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", stdout=StringIO())
+        # mark an untouched cell so we can tell whether it was rewritten
+        VerificationScore.objects.filter(district=self.d1, metric="MAE").update(value=-1.0)
+        ForecastEntry.objects.create(district=self.d2, date=date(2025, 7, 2), horizon=1, rainfall_mm=8.0)
+        RealizedEntry.objects.create(district=self.d2, date=date(2025, 7, 2), horizon=1, rainfall_mm=4.0)
+
+        out = StringIO()
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", incremental=True, stdout=out)
+        self.assertIn("1 changed cells", out.getvalue())
+        s = self.scores()
+        self.assertEqual(s[(self.d1.id, 1, "MAE")], -1.0)
+        self.assertAlmostEqual(s[(self.d2.id, 1, "MAE")], 2.0)
+        self.assertEqual(s[(self.d2.id, 1, "CSI")], 1.0)
+
+        # still inside the lag window: rescored again, then settled
+        out = StringIO()
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", incremental=True, stdout=out)
+        self.assertIn("1 changed cells", out.getvalue())
+        self.age_entries()
+        out = StringIO()
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", incremental=True, stdout=out)
+        self.assertIn("up to date", out.getvalue())
+
+    def test_incremental_sees_late_commits_and_deletes(self):
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", stdout=StringIO())
+        mark = VerificationWatermark.objects.get()
+        # entered before the watermark was taken, committed after the scan
+        entry = ForecastEntry.objects.create(district=self.d2, date=date(2025, 7, 2), horizon=1, rainfall_mm=8.0)
+        RealizedEntry.objects.create(district=self.d2, date=date(2025, 7, 2), horizon=1, rainfall_mm=4.0)
+        ForecastEntry.objects.filter(pk=entry.pk).update(modified_at=mark.watermark + timedelta(seconds=1))
+        RealizedEntry.objects.filter(district=self.d2, date=date(2025, 7, 2)).update(
+            modified_at=mark.watermark + timedelta(seconds=1))
+        out = StringIO()
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", incremental=True, stdout=out)
+        self.assertIn("1 changed cells", out.getvalue())
+
+        VerificationScore.objects.filter(district=self.d1, metric="MAE").update(value=-1.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.delete()
+        self.assertFalse(VerificationWatermark.objects.exists())
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", incremental=True, stdout=StringIO())
+        self.assertNotEqual(self.scores()[(self.d1.id, 1, "MAE")], -1.0)
+
+    def test_bulk_delete_forgets_watermarks_once(self):
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", stdout=StringIO())
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            ForecastEntry.objects.all().delete()
+            RealizedEntry.objects.all().delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(VerificationWatermark.objects.exists())
+
+    def test_incremental_sees_api_edits(self):
+        from django.contrib.auth.models import User
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", stdout=StringIO())
+        entry = ForecastEntry.objects.get(district=self.d1, date=date(2025, 7, 1), horizon=1)
+        self.client.force_login(User.objects.create_user("editor", password="pw"))
+        r = self.client.patch(f"/api/forecasts/{entry.pk}/", {"rainfall_mm": 50.0}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        out = StringIO()
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", incremental=True, stdout=out)
+        self.assertIn("1 changed cells", out.getvalue())
+        self.assertAlmostEqual(self.scores()[(self.d1.id, 1, "MAE")], (47 + 4 + 3 + 1) / 4)
+
+    def test_continuous_and_multi_threshold_scores(self):
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", all_horizons=True,
+                     stdout=StringIO())
+        s = self.scores()
+        # D1: one hit, miss, false alarm and correct negative at 2.5 mm -> no skill
+        self.assertAlmostEqual(s[(self.d1.id, 1, "RMSE")], (30 / 4) ** 0.5)
+        self.assertAlmostEqual(s[(self.d1.id, 1, "BIAS")], 0.0)
+        for metric in ("ETS", "HSS", "PSS"):
+            self.assertAlmostEqual(s[(self.d1.id, 1, metric)], 0.0)
+        # 20 mm observed vs 10 mm forecast: a hit at 2.5 mm but a miss at 15.6 mm
+        self.assertEqual(s[(self.d2.id, 2, "POD")], 1.0)
+        self.assertEqual(s[(self.d2.id, 2, "POD@15.6")], 0.0)
+        self.assertNotIn((self.d2.id, 2, "POD@64.5"), s)
+
+    def test_bootstrap_intervals(self):
+        pairs = fetch_pairs(date(2025, 7, 1), date(2025, 7, 31))
+        scores = score_pairs(pairs, n_resamples=300, seed=1)
+        mae = scores.metrics()["MAE"]
+        low, high = scores.intervals["MAE"]
+        self.assertTrue(np.all(low <= mae) and np.all(mae <= high))
+        self.assertEqual(low[1], high[1])  # D2 has a single, error-free pair
+        again = score_pairs(pairs, n_resamples=300, seed=1).intervals["RMSE"]
+        np.testing.assert_array_equal(again[0], scores.intervals["RMSE"][0])
+
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", bootstrap=100,
+                     stdout=StringIO())
+        row = VerificationScore.objects.get(district=self.d1, horizon=1, metric="MAE")
+        self.assertLessEqual(row.ci_low, row.value)
+        self.assertGreaterEqual(row.ci_high, row.value)
+
+    def test_sharded_scores_match_serial(self):
+        start, end = date(2025, 7, 1), date(2025, 7, 31)
+        serial = score_pairs(fetch_pairs(start, end))
+        parts = [score_pairs(fetch_pairs(start, end, district_ids=[d.id])) for d in (self.d2, self.d1)]
+        merged = Scores.concat(parts, serial.thresholds)
+        self.assertEqual(list(merged.iter_rows()), list(serial.iter_rows()))
+
+    def test_process_pool_scores_match_serial(self):
+        start, end = date(2025, 7, 1), date(2025, 7, 31)
+        serial = score_pairs(fetch_pairs(start, end))
+        pooled = score_parallel(start, end, [self.d1.id, self.d2.id], workers=2)
+        self.assertEqual(list(pooled.iter_rows()), list(serial.iter_rows()))
+
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", stdout=StringIO())
+        expected = self.scores()
+        out = StringIO()
+        call_command("compute_verification", start="2025-07-01", end="2025-07-31", workers=2, stdout=out)
+        self.assertIn("on 2 workers", out.getvalue())
+        self.assertEqual(self.scores(), expected)
+
+    def test_bootstrap_intervals_do_not_depend_on_workers(self):
+        start, end = date(2025, 7, 1), date(2025, 7, 31)
+        for day in range(10, 25):
+            ForecastEntry.objects.create(district=self.d2, date=date(2025, 7, day), horizon=1, rainfall_mm=day % 7)
+            RealizedEntry.objects.create(district=self.d2, date=date(2025, 7, day), horizon=1, rainfall_mm=day % 4)
+        ids = [self.d1.id, self.d2.id]
+        intervals = [score_parallel(start, end, ids, workers=workers, n_resamples=200, seed=3).intervals
+                     for workers in (1, 2)]
+        serial = score_pairs(fetch_pairs(start, end), n_resamples=200, seed=3).intervals
+        for metric, (low, high) in serial.items():
+            for other in intervals:
+                np.testing.assert_array_equal(other[metric][0], low, metric)
+                np.testing.assert_array_equal(other[metric][1], high, metric)
+
+    def test_rollups_match_direct_scores_and_update_incrementally(self):
+        start, end = date(2025, 7, 1), date(2025, 7, 31)
+        call_command("update_rollups", stdout=StringIO())
+        for period in ("week", "month", "season"):
+            rolled = rollup_scores(period, date(2025, 6, 1), end)
+            self.assertEqual(list(rolled.iter_rows()), list(score_pairs(fetch_pairs(start, end)).iter_rows()), period)
+
+        # an edited forecast only recomputes its own cells
+        from django.contrib.auth.models import User
+        entry = ForecastEntry.objects.get(district=self.d1, date=date(2025, 7, 2), horizon=1)
+        self.client.force_login(User.objects.create_user("editor", password="pw"))
+        r = self.client.patch(f"/api/forecasts/{entry.pk}/", {"rainfall_mm": 9.0}, content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        out = StringIO()
+        call_command("update_rollups", period=["week"], stdout=out)
+        self.assertIn("week: 1 cells", out.getvalue())
+        rolled = rollup_scores("week", start - timedelta(days=7), end)
+        self.assertEqual(list(rolled.iter_rows()), list(score_pairs(fetch_pairs(start, end)).iter_rows()))
+
+        # a delete leaves no row to find, so the next run rebuilds
+        with self.captureOnCommitCallbacks(execute=True):
+            ForecastEntry.objects.get(district=self.d1, date=date(2025, 7, 3)).delete()
+        out = StringIO()
+        call_command("update_rollups", period=["week"], stdout=out)
+        self.assertIn("(full)", out.getvalue())
+        rolled = rollup_scores("week", start - timedelta(days=7), end)
+        self.assertEqual(list(rolled.iter_rows()), list(score_pairs(fetch_pairs(start, end)).iter_rows()))
+
+    def test_bucket_starts(self):
+        dates = np.array(["2025-07-02", "2025-05-31", "2025-12-31", "2025-02-01"], dtype="datetime64[D]")
+        self.assertEqual(bucket_start(dates, "week").astype(str).tolist(),
+                         ["2025-06-30", "2025-05-26", "2025-12-29", "2025-01-27"])
+        self.assertEqual(bucket_start(dates, "season").astype(str).tolist(),
+                         ["2025-06-01", "2025-03-01", "2025-10-01", "2025-01-01"])
+        self.assertEqual(str(bucket_end(np.datetime64("2025-06-01"), "season")), "2025-09-30")
+
+
+class MultiCategoryTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from .map_areas import sync_map_forecast_areas
+        self.client.force_login(User.objects.create_user("mc"))
+        self.d1 = District.objects.create(code="D1", name="One")
+        self.d2 = District.objects.create(code="D2", name="Two")
+        maps = {1: {"D1": "DRY", "D2": "WS", "STATE_X": "SCT"}, 2: {"D1": "ISOL", "D2": "FWS"}}
+        for day, data in maps.items():
+            data = {area: {"category": cat} for area, cat in data.items()}
+            mf = MapForecast.objects.create(date=date(2025, 7, day), data=data)
+            sync_map_forecast_areas(mf.id, mf.date, data)
+        # D1 observed by category, D2 by rainfall only (30 mm -> FWS, 0 mm -> DRY)
+        RealizedEntry.objects.create(district=self.d1, date=date(2025, 7, 1), rainfall_category="DRY")
+        RealizedEntry.objects.create(district=self.d1, date=date(2025, 7, 2), rainfall_category="SCT")
+        RealizedEntry.objects.create(district=self.d2, date=date(2025, 7, 1), rainfall_mm=30.0)
+        RealizedEntry.objects.create(district=self.d2, date=date(2025, 7, 2), rainfall_mm=0.0)
+
+    def test_contingency_matrices_and_scores(self):
+        from .multicategory import contingency_tables, fetch_category_pairs, gerrity, heidke
+        pairs = fetch_category_pairs(date(2025, 7, 1), date(2025, 7, 2))
+        self.assertEqual(pairs.area_ids.tolist(), ["D1", "D2"])
+        tables = contingency_tables(pairs)
+        expected = np.zeros((2, 5, 5), dtype=np.int64)
+        expected[0, 0, 0] = expected[0, 1, 2] = 1   # D1: DRY/DRY, ISOL forecast / SCT observed
+        expected[1, 4, 3] = expected[1, 3, 0] = 1   # D2: WS/FWS, FWS forecast / DRY observed
+        np.testing.assert_array_equal(tables, expected)
+
+        # with two categories both scores reduce to their 2x2 forms
+        t = np.array([[30, 10], [5, 55]])
+        H, F, M, C = 55, 5, 10, 30
+        self.assertAlmostEqual(gerrity(t), H / (H + M) - F / (F + C))
+        self.assertAlmostEqual(heidke(t), 2 * (H * C - F * M) / ((H + M) * (M + C) + (H + F) * (F + C)))
+        self.assertEqual(gerrity(np.eye(5) * 3), 1.0)
+
+    def test_map_area_ids_resolve_to_bare_district_codes(self):
+        from .map_areas import sync_map_forecast_areas
+        from .multicategory import contingency_tables, fetch_category_pairs
+        # imported districts carry the raw Dist_Code, the map names areas D_<Dist_Code>
+        district = District.objects.create(code="24", name="Raw")
+        data = {"D_24": {"category": "SCT"}}
+        mf = MapForecast.objects.create(date=date(2025, 7, 3), data=data)
+        sync_map_forecast_areas(mf.id, mf.date, data)
+        RealizedEntry.objects.create(district=district, date=date(2025, 7, 3), rainfall_mm=10.0)
+        pairs = fetch_category_pairs(date(2025, 7, 3), date(2025, 7, 3))
+        self.assertEqual(pairs.area_ids.tolist(), ["D_24"])
+        self.assertEqual(contingency_tables(pairs)[0, 2, 2], 1)
+
+        call_command("compute_verification", start="2025-07-03", end="2025-07-03", categories=True,
+                     stdout=StringIO())
+        pc = dict(VerificationScore.objects.filter(metric="MC_PC").values_list("district__code", "value"))
+        self.assertEqual(pc, {"24": 1.0, None: 1.0})
+
+    def test_gerrity_without_an_observed_category(self):
+        from .multicategory import gerrity, gerrity_weights
+        # fully observed tables: same as the classic scoring-matrix form
+        t = np.random.default_rng(0).integers(1, 20, (3, 5, 5)).astype(float)
+        share = t / t.sum(axis=(-2, -1), keepdims=True)
+        np.testing.assert_allclose(gerrity(t), (share * gerrity_weights(share.sum(axis=-2))).sum(axis=(-2, -1)))
+        # nothing observed as WS, one FWS forecast that verified as SCT: defined, and just below perfect
+        t = np.diag([40.0, 20, 10, 5, 0])
+        t[3, 2] = 1
+        score = gerrity(t)
+        self.assertTrue(0.9 < score < 1.0)
+        t = np.diag([40.0, 0, 10, 5, 0])   # and with a gap in the middle
+        self.assertEqual(gerrity(t), 1.0)
+
+    def test_command_and_endpoint(self):
+        call_command("compute_verification", start="2025-07-01", end="2025-07-02", categories=True,
+                     stdout=StringIO())
+        pc = dict(VerificationScore.objects.filter(metric="MC_PC").values_list("district__code", "value"))
+        self.assertEqual(pc, {"D1": 0.5, "D2": 0.0, None: 0.25})
+
+        body = self.client.get("/api/verification/categories/",
+                               {"start": "2025-07-01", "end": "2025-07-02", "area": "D1"}).json()
+        self.assertEqual(body["categories"], ["DRY", "ISOL", "SCT", "FWS", "WS"])
+        self.assertEqual([a["area"] for a in body["areas"]], ["D1"])
+        self.assertEqual(body["total"]["count"], 2)
+        self.assertEqual(body["areas"][0]["matrix"][1][2], 1)
+        r = self.client.get("/api/verification/categories/", {"start": "2025-07-01", "end": "2025-02-30"})
+        self.assertEqual(r.status_code, 400)
+
+
+class SpatialTests(TestCase):
+    def test_locator_matches_partition_and_holes(self):
+        from .spatial import DistrictLocator
+        # 2x2 districts sharing edges; A has a hole that belongs to E
+        polygons = [("A", [np.array(square(0, 0)), np.array(square(0.4, 0.4, 0.2))[::-1]]),
+                    ("B", [np.array(square(1, 0))]), ("C", [np.array(square(0, 1))]),
+                    ("D", [np.array(square(1, 1))]), ("E", [np.array(square(0.4, 0.4, 0.2))])]
+        loc = DistrictLocator(polygons, edges_per_cell=1)
+        lon = [0.2, 1.5, 0.5, 1.9, 0.5, 3.0, 1.0, 1.0]
+        lat = [0.2, 0.5, 1.5, 1.9, 0.5, 3.0, 1.0, 0.5]
+        self.assertEqual(loc.locate(lon, lat)[:6], ["A", "B", "C", "D", "E", None])
+        # points on shared vertices/edges land in exactly one neighbour (the one to the right/above)
+        self.assertEqual(loc.locate(lon, lat)[6:], ["D", "B"])
+
+    def test_locate_endpoints(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user("geo"))
+        square_districts(self)
+
+        r = self.client.get("/api/districts/locate/", {"lat": 22.5, "lon": 88.5})
+        self.assertEqual(r.json()["district"], "WEST")
+        r = self.client.post("/api/districts/locate/", {"points": [[22.5, 89.5], [22.5, 88.2], [10, 10]]},
+                             content_type="application/json")
+        self.assertEqual(r.json(), {"count": 3, "located": 2, "districts": ["EAST", "WEST", None]})
+        self.assertEqual(self.client.get("/api/districts/locate/", {"lat": "x", "lon": 1}).status_code, 400)
+        for points in ([[1, 2, 3], [4, 5, 6]], [1, 2], [[[1, 2]]]):
+            r = self.client.post("/api/districts/locate/", {"points": points}, content_type="application/json")
+            self.assertEqual(r.status_code, 400, points)
+
+
+class ImportEntriesTests(TestCase):
+    def setUp(self):
+        self.d1 = District.objects.create(code="D1", name="One")
+
+    def write(self, suffix, text):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, "w", encoding="utf8") as fh:
+            fh.write(text)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_upsert(self):
+        ForecastEntry.objects.create(district=self.d1, date=date(2025, 7, 1), horizon=1, rainfall_mm=1.0)
+        path = self.write(".csv", "district_code,date,horizon,rainfall_mm,tmax\n"
+                                  "D1,2025-07-01,1,5.5,33\n"
+                                  "D1,2025-07-01,2,7,\n"
+                                  "XX,2025-07-01,1,3,\n"
+                                  "D1,2025-02-30,1,3,\n")
+        out = StringIO()
+        call_command("import_entries", "forecast", path, chunk_size=2, stdout=out)
+        self.assertIn("upserted=2 skipped=2", out.getvalue())
+        f = ForecastEntry.objects.get(district=self.d1, date=date(2025, 7, 1), horizon=1)
+        self.assertEqual((f.rainfall_mm, f.extras), (5.5, {"tmax": "33"}))
+        self.assertEqual(ForecastEntry.objects.count(), 2)
+
+    def test_ndjson_realized(self):
+        path = self.write(".ndjson", '{"district_code": "D1", "date": "2025-07-01", "horizon": 1, '
+                                     '"rainfall_mm": 4.0, "observed_at": "2025-07-02T03:00:00Z"}\n'
+                                     '{"district_code": "D1", "date": "2025-07-02", "horizon": 1, '
+                                     '"rainfall_mm": 4.0, "observed_at": "2025-07-02T25:00:00Z"}\n')
+        out = StringIO()
+        call_command("import_entries", "realized", path, stdout=out)
+        self.assertIn("upserted=1 skipped=1", out.getvalue())
+        r = RealizedEntry.objects.get(district=self.d1)
+        self.assertEqual(r.rainfall_mm, 4.0)
+        self.assertIsNotNone(r.observed_at)
+
+
+class StationIngestTests(TestCase):
+    def setUp(self):
+        from .stations import station_table
+        station_table.invalidate()
+        square_districts(self)
+        fd, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w") as fh:
+            fh.write("station,date,rainfall_mm,lat,lon\n"
+                     "W1,2025-07-01,0,22.5,88.2\n"
+                     "W2,2025-07-01,10,22.5,88.4\n"
+                     "W3,2025-07-01,3,22.5,88.6\n"
+                     "W3,2025-07-01,5,22.5,88.6\n"     # repeated report: the last one counts
+                     "E1,2025-07-01,0,22.5,89.5\n"
+                     "SEA,2025-07-01,9,10.0,70.0\n"    # outside every district
+                     "W1,2025-07-01,-999,,\n"
+                     "NEW,2025-07-01,1,,\n")           # unknown and no coordinates
+        self.addCleanup(os.remove, self.path)
+
+    def test_areal_aggregates(self):
+        out = StringIO()
+        call_command("ingest_stations", self.path, horizon=[1, 2], stdout=out)
+        self.assertIn("new_stations=5 district_days=2 upserted=4 "
+                      "skipped: invalid=1 unknown_station=1 unmapped=1", out.getvalue())
+        west = RealizedEntry.objects.get(district__code="WEST", horizon=1)
+        self.assertAlmostEqual(west.rainfall_mm, 5.0)
+        self.assertEqual(west.extras, {"station_count": 3, "wet_stations": 2, "max_mm": 10.0})
+        self.assertEqual(west.rainfall_category, "FWS")  # 2 of 3 stations wet
+        self.assertIsNotNone(west.observed_at)
+        self.assertEqual(RealizedEntry.objects.get(district__code="EAST", horizon=2).rainfall_category, "DRY")
+
+        # known stations are resolved from the table; coordinates aren't needed again
+        from .stations import ingest_station_rows
+        aggregator, aggregates, written = ingest_station_rows(
+            [{"station": "E1", "date": "2025-07-02", "rainfall_mm": "30"}], horizons=[1])
+        self.assertEqual((aggregator.registered, written), (0, 1))
+        self.assertEqual(RealizedEntry.objects.get(district__code="EAST", date=date(2025, 7, 2)).rainfall_category,
+                         "WS")
+
+    def test_partial_file_adds_to_the_days_readings(self):
+        from .stations import ingest_station_rows
+        call_command("ingest_stations", self.path, horizon=[1], stdout=StringIO())
+        # a late gauge file for the same day: one new station and a corrected report
+        rows = [{"station": "W4", "date": "2025-07-01", "rainfall_mm": "20", "lat": "22.5", "lon": "88.8"},
+                {"station": "W1", "date": "2025-07-01", "rainfall_mm": "1"},
+                {"station": "W" * 65, "date": "2025-07-01", "rainfall_mm": "1", "lat": "22.5", "lon": "88.8"}]
+        aggregator, aggregates, written = ingest_station_rows(rows, horizons=[1])
+        self.assertEqual((aggregator.skipped["invalid"], len(aggregates), written), (1, 1, 1))
+        west = RealizedEntry.objects.get(district__code="WEST", horizon=1)
+        self.assertAlmostEqual(west.rainfall_mm, (1 + 10 + 5 + 20) / 4)
+        self.assertEqual(west.extras, {"station_count": 4, "wet_stations": 4, "max_mm": 20.0})
+        # the east district's day was not touched
+        self.assertEqual(RealizedEntry.objects.get(district__code="EAST").extras["station_count"], 1)
+
+
+class WarningRuleTests(TestCase):
+    def setUp(self):
+        self.d1 = District.objects.create(code="D1", name="One")
+        self.d2 = District.objects.create(code="D2", name="Two")
+        self.day = date(2025, 5, 20)
+
+    def forecast(self, district, horizon, rain, **extras):
+        return ForecastEntry.objects.create(district=district, date=self.day, horizon=horizon,
+                                            rainfall_mm=rain, extras=extras)
+
+    def test_only_changes_are_applied(self):
+        from .models import WarningEntry
+        from .warning_rules import generate_warnings
+        self.forecast(self.d1, 1, 120.0, tmax=41.5)
+        self.forecast(self.d1, 2, 70.0, tmax="46", tmin=None)
+        self.forecast(self.d2, 1, 3.0, tmax=35, tmin=1.5)
+        # a forecaster's own warning for this key is kept as is
+        WarningEntry.objects.create(district=self.d2, date=self.day, horizon=1, phenomenon="Cold Wave",
+                                    severity="Yellow")
+
+        plan = generate_warnings(self.day, self.day)
+        self.assertEqual(plan.counts(), {"created": 4, "updated": 0, "cleared": 0, "unchanged": 0, "manual_kept": 1})
+        got = {(w.district.code, w.horizon, w.phenomenon): (w.severity, w.source)
+               for w in WarningEntry.objects.select_related("district")}
+        self.assertEqual(got, {
+            ("D1", 1, "Heavy Rain"): ("Orange", "rules"), ("D1", 1, "Heat Wave"): ("Yellow", "rules"),
+            ("D1", 2, "Heavy Rain"): ("Yellow", "rules"), ("D1", 2, "Heat Wave"): ("Orange", "rules"),
+            ("D2", 1, "Cold Wave"): ("Yellow", "manual"),
+        })
+
+        self.assertEqual(generate_warnings(self.day, self.day).counts()["unchanged"], 4)
+        ForecastEntry.objects.filter(district=self.d1, horizon=1).update(rainfall_mm=10.0, extras={"tmax": 47.2})
+        plan = generate_warnings(self.day, self.day)
+        self.assertEqual((len(plan.create), len(plan.update), len(plan.delete), plan.unchanged), (0, 1, 1, 2))
+        w = WarningEntry.objects.get(district=self.d1, horizon=1)
+        self.assertEqual((w.phenomenon, w.severity, w.description), ("Heat Wave", "Red", "extras.tmax 47.2 >= 47"))
+
+    def test_command_rules_file(self):
+        self.forecast(self.d1, 1, 30.0)
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w") as fh:
+            json.dump([{"phenomenon": "Rain", "field": "rainfall_mm", "levels": [["Yellow", 20], ["Red", 25]]}], fh)
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command("generate_warnings", start=str(self.day), rules=path, dry_run=True, stdout=out)
+        self.assertIn("created=1 updated=0", out.getvalue())
+        from .models import WarningEntry
+        self.assertFalse(WarningEntry.objects.exists())
+        from .warning_rules import Rule
+        with self.assertRaises(ValueError):
+            Rule("Rain", "rainfall_mm", [["Yellow", 25], ["Red", 20]])
+
+
+class ImportDistrictsTests(TestCase):
+    def test_bulk_matches_row_by_row_counts(self):
+        District.objects.create(code="D1", name="Old")
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", encoding="utf8") as fh:
+            fh.write("code,name,geojson_file\nD1,One,\nD2,Two,d2.geojson\nD2,Two again,d2.geojson\n")
+        self.addCleanup(os.remove, path)
+
+        out = StringIO()
+        call_command("import_districts", path, dry_run=True, stdout=out)
+        self.assertIn("created=1 updated=2", out.getvalue())
+        self.assertEqual(District.objects.get(code="D1").name, "Old")
+
+        out = StringIO()
+        call_command("import_districts", path, bulk=True, stdout=out)
+        self.assertIn("created=1 updated=2", out.getvalue())
+        self.assertEqual(District.objects.get(code="D1").name, "One")
+        self.assertEqual(District.objects.get(code="D2").name, "Two again")
+
+
+class MapForecastViewTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        from django.core.cache import cache
+        cache.clear()
+        self.user = User.objects.create_user("forecaster", password="pw")
+        self.client.force_login(self.user)
+
+    def save(self, data, **extra):
+        return self.client.post("/forecast/save_map/", {"date": "2025-07-01", "data": data, **extra},
+                                content_type="application/json")
+
+    def test_conditional_get_and_invalidation(self):
+        self.assertEqual(self.save({"D_1": {"category": "DRY"}}).status_code, 200)
+        r1 = self.client.get("/forecast/get_map/", {"date": "2025-07-01"})
+        self.assertEqual(r1.json()["data"], {"D_1": {"category": "DRY"}})
+        etag = r1["ETag"]
+
+        r2 = self.client.get("/forecast/get_map/", {"date": "2025-07-01"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r2.status_code, 304)
+
+        self.save({"D_1": {"category": "WS"}})
+        r3 = self.client.get("/forecast/get_map/", {"date": "2025-07-01"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(r3.status_code, 200)
+        self.assertNotEqual(r3["ETag"], etag)
+        self.assertEqual(r3.json()["data"]["D_1"]["category"], "WS")
+
+    def test_missing_date(self):
+        r = self.client.get("/forecast/get_map/", {"date": "2025-07-02"})
+        self.assertEqual(r.json(), {"ok": True, "found": False, "date": "2025-07-02"})
+
+    def test_patch_merges_areas_with_revision_check(self):
+        r = self.save({"D_1": {"category": "DRY"}, "D_2": {"category": "SCT"}})
+        self.assertEqual(r.json()["revision"], 1)
+
+        r = self.client.post("/forecast/save_map/", {
+            "date": "2025-07-01", "patch": {"D_1": {"category": "WS"}, "D_2": None}, "expected_revision": 1,
+        }, content_type="application/json")
+        self.assertEqual(r.json()["revision"], 2)
+        got = self.client.get("/forecast/get_map/", {"date": "2025-07-01"}).json()
+        self.assertEqual(got["data"], {"D_1": {"category": "WS"}})
+        self.assertEqual(got["revision"], 2)
+
+        # a stale editor is rejected
+        r = self.client.post("/forecast/save_map/", {
+            "date": "2025-07-01", "patch": {"D_3": {"category": "FWS"}}, "expected_revision": 1,
+        }, content_type="application/json")
+        self.assertEqual(r.status_code, 409)
+        self.assertEqual(r.json()["revision"], 2)
+
+    def test_admin_edit_bumps_revision(self):
+        from django.contrib import admin
+        from django.test import RequestFactory
+        self.save({"D_1": {"category": "DRY"}})
+        model_admin = admin.site._registry[MapForecast]
+        self.assertIn("revision", model_admin.get_readonly_fields(None))
+        obj = MapForecast.objects.get(date=date(2025, 7, 1))
+        obj.data = {"D_1": {"category": "WS"}}
+        request = RequestFactory().post("/admin/")
+        request.user = self.user
+        model_admin.save_model(request, obj, None, change=True)
+        self.assertEqual(obj.revision, 2)
+
+        # the editor still holding revision 1 is rejected
+        r = self.client.post("/forecast/save_map/", {
+            "date": "2025-07-01", "patch": {"D_1": {"category": "DRY"}}, "expected_revision": 1,
+        }, content_type="application/json")
+        self.assertEqual((r.status_code, r.json()["revision"]), (409, 2))
+
+    def test_losing_a_create_race_is_a_conflict(self):
+        self.save({"D_1": {"category": "DRY"}})
+        # the loser's SELECT ran before the winner's row existed
+        missing = mock.Mock(**{"filter.return_value.first.return_value": None})
+        with mock.patch.object(MapForecast.objects, "select_for_update", return_value=missing):
+            r = self.save({"D_1": {"category": "WS"}})
+        self.assertEqual((r.status_code, r.json()["revision"]), (409, 1))
+
+    def test_patch_creates_missing_date(self):
+        r = self.client.post("/forecast/save_map/", {"date": "2025-07-05", "patch": {"D_1": {"category": "ISOL"}}},
+                             content_type="application/json")
+        self.assertTrue(r.json()["created"])
+        self.assertEqual(MapForecast.objects.get(date=date(2025, 7, 5)).data, {"D_1": {"category": "ISOL"}})
+
+    def test_area_rows_follow_saves_and_patches(self):
+        self.save({"D_1": {"category": "DRY"}, "D_2": {"category": "SCT", "rainfall_mm": "12.5"}})
+        self.client.post("/forecast/save_map/", {"date": "2025-07-01", "patch": {"D_1": {"category": "WS"}, "D_2": None,
+                                                                                   "D_3": {"category": "WS"}}},
+                         content_type="application/json")
+        self.save({"D_9": {"category": "DRY"}}, date="2025-07-02")
+        rows = MapForecastArea.objects.order_by("date", "area_id").values_list("date", "area_id", "category")
+        self.assertEqual([(str(d), a, c) for d, a, c in rows],
+                         [("2025-07-01", "D_1", "WS"), ("2025-07-01", "D_3", "WS"), ("2025-07-02", "D_9", "DRY")])
+
+        body = self.client.get("/api/map-areas/", {"category": "WS"}).json()
+        self.assertEqual(sorted(r["area_id"] for r in body["results"]), ["D_1", "D_3"])
+        counts = self.client.get("/api/map-areas/counts/", {"start": "2025-07-01", "end": "2025-07-02"}).json()
+        self.assertEqual(counts, [{"date": "2025-07-01", "category": "WS", "count": 2},
+                                  {"date": "2025-07-02", "category": "DRY", "count": 1}])
+
+        MapForecastArea.objects.all().delete()
+        call_command("backfill_map_areas", stdout=StringIO())
+        self.assertEqual(MapForecastArea.objects.count(), 3)
+        self.assertEqual(self.client.get("/api/map-areas/", {"date": "2025-02-30"}).status_code, 400)
+
+    def test_over_long_area_ids_are_rejected(self):
+        long_id = "A" * 65
+        r = self.save({"D_1": {"category": "DRY"}, long_id: {"category": "WS"}})
+        self.assertEqual(r.status_code, 400)
+        self.assertIn(long_id, r.content.decode())
+        r = self.client.post("/forecast/save_map/", {"date": "2025-07-01", "patch": {long_id: None}},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertFalse(MapForecast.objects.exists())
+
+        # rows written some other way keep their valid areas
+        MapForecast.objects.create(date=date(2025, 7, 1), data={"D_1": {"category": "DRY"}, long_id: {}})
+        err = StringIO()
+        call_command("backfill_map_areas", stdout=StringIO(), stderr=err)
+        self.assertEqual(list(MapForecastArea.objects.values_list("area_id", flat=True)), ["D_1"])
+        self.assertIn("skipped 1 area ids", err.getvalue())
+
+
+class MapRenderTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user("render"))
+        tmp = temp_dir(self)
+        features = [
+            {"type": "Feature", "properties": {"DIST_ID": 1, "DIST_NAME": "West"},
+             "geometry": {"type": "Polygon", "coordinates": [square(88, 22)]}},
+            {"type": "Feature", "properties": {"DIST_ID": 2, "DIST_NAME": "East"},
+             "geometry": {"type": "Polygon", "coordinates": [square(89, 22)]}},
+            {"type": "Feature", "properties": {"STATE_CODE": "WB"},
+             "geometry": {"type": "Polygon", "coordinates": [[[88, 22], [90, 22], [90, 23], [88, 23], [88, 22]]]}},
+        ]
+        path = os.path.join(tmp, "map.geojson")
+        with open(path, "w") as fh:
+            json.dump({"type": "FeatureCollection", "features": features}, fh)
+        self.render_dir = os.path.join(tmp, "renders")
+        for name, value in (("MAP_RENDER_GEOJSON", path), ("MAP_RENDER_DIR", Path(self.render_dir))):
+            patcher = mock.patch(f"core.map_render.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.day = date(2025, 7, 1)
+        MapForecast.objects.create(date=self.day, data={"D_1": {"category": "WS"}})
+
+    def png_pixels(self, body):
+        self.assertEqual(body[:8], b"\x89PNG\r\n\x1a\n")
+        w, h = int.from_bytes(body[16:20], "big"), int.from_bytes(body[20:24], "big")
+        idat = body.index(b"IDAT")
+        raw = zlib.decompress(body[idat + 4:idat + 4 + int.from_bytes(body[idat - 4:idat], "big")])
+        return np.frombuffer(raw, dtype=np.uint8).reshape(h, w + 1)[:, 1:]
+
+    def test_svg_and_png_cached_per_revision(self):
+        r = self.client.get("/forecast/map_image/", {"date": "2025-07-01"})
+        self.assertEqual(r["Content-Type"], "image/svg+xml")
+        svg = r.content.decode()
+        self.assertIn('fill="#1c4587"', svg)   # D_1 is WS
+        self.assertIn('fill="#d3d3d3"', svg)   # D_2 has no data: DRY, as in the entry map
+        self.assertEqual(self.client.get("/forecast/map_image/", {"date": "2025-07-01"},
+                                         HTTP_IF_NONE_MATCH=r["ETag"]).status_code, 304)
+
+        r = self.client.get("/forecast/map_image/", {"date": "2025-07-01", "format": "png", "width": 200})
+        pixels = self.png_pixels(r.content)
+        self.assertEqual(pixels.shape[1], 200)
+        mid = pixels.shape[0] // 2
+        self.assertEqual((pixels[mid, 50], pixels[mid, 150]), (5, 1))  # palette: WS, DRY
+        self.assertEqual(len(os.listdir(self.render_dir)), 2)
+
+        # a save changes updated_at; the next request renders afresh and replaces the old file
+        f = MapForecast.objects.get(date=self.day)
+        f.data = {"D_1": {"category": "DRY"}, "D_2": {"category": "SCT"}}
+        f.save()
+        pixels = self.png_pixels(self.client.get("/forecast/map_image/",
+                                                 {"date": "2025-07-01", "format": "png", "width": 200}).content)
+        self.assertEqual((pixels[mid, 50], pixels[mid, 150]), (1, 3))
+        self.assertEqual(len(os.listdir(self.render_dir)), 2)
+        self.assertEqual(self.client.get("/forecast/map_image/", {"date": "2025-07-02"}).status_code, 404)
+        self.assertEqual(self.client.get("/forecast/map_image/", {"date": "2025-07-01", "format": "gif"}).status_code,
+                         400)
+        f.delete()
+        self.assertEqual(os.listdir(self.render_dir), [])
+
+
+class GeometryTests(TestCase):
+    def square(self, x0, jagged):
+        # unit square whose right edge (x0 + 1) has extra, slightly offset vertices
+        right = [[x0 + 1 + dx, y] for y, dx in jagged]
+        ring = [[x0, 0], [x0 + 1, 0]] + right + [[x0 + 1, 1], [x0, 1], [x0, 0]]
+        return {"type": "Feature", "properties": {"x0": x0}, "geometry": {"type": "Polygon", "coordinates": [ring]}}
+
+    def test_simplified_neighbours_share_boundary(self):
+        from .geometry import build_topology, simplify_arcs, to_geojson
+        jagged = [(0.2, 0.01), (0.4, -0.02), (0.6, 0.015), (0.8, -0.01)]
+        a = self.square(0, jagged)
+        b = self.square(1, [])
+        # b's left edge is a's right edge walked the other way
+        b["geometry"]["coordinates"][0] = [[1, 0], [2, 0], [2, 1], [1, 1]] + \
+            [[1 + dx, y] for y, dx in reversed(jagged)] + [[1, 0]]
+        topo = build_topology({"type": "FeatureCollection", "features": [a, b]}, quantization=10001)
+        self.assertEqual(len(topo.arcs), 3)  # shared edge stored once
+
+        for tolerance in (0, 50, 1000):
+            fc = to_geojson(topo, simplify_arcs(topo.arcs, tolerance), decimals=5)
+            ring_a, ring_b = (f["geometry"]["coordinates"][0] for f in fc["features"])
+            shared_a = {tuple(p) for p in ring_a if abs(p[0] - 1) < 0.05}
+            shared_b = {tuple(p) for p in ring_b if abs(p[0] - 1) < 0.05}
+            self.assertEqual(shared_a, shared_b)
+        self.assertEqual(len(shared_a), 2)  # coarse variant keeps only the junctions
+
+    def test_topojson_round_trip(self):
+        import json
+        from .geometry import build_topology, decode_topojson, encode_topojson, to_geojson
+        hole = [[3.2, 0.2], [3.2, 0.4], [3.4, 0.4], [3.4, 0.2], [3.2, 0.2]]
+        features = [
+            self.square(0, [(0.3, 0.013), (0.7, -0.021)]),
+            self.square(1, []),
+            {"type": "Feature", "id": "mp", "properties": {"name": "islands"}, "geometry": {
+                "type": "MultiPolygon", "coordinates": [
+                    [[[3, 0], [4, 0], [4, 1], [3, 1], [3, 0]], hole],
+                    [[[5, 5], [5.5, 5], [5.5, 5.5], [5, 5]]],
+                ]}},
+            {"type": "Feature", "properties": {}, "geometry": {"type": "LineString", "coordinates": [[0, 2], [1.5, 2.7], [3, 2]]}},
+            {"type": "Feature", "properties": {"p": 1}, "geometry": {"type": "Point", "coordinates": [88.3639, 22.5726]}},
+            {"type": "Feature", "properties": {"empty": True}, "geometry": None},
+        ]
+        source = {"type": "FeatureCollection", "features": features}
+        topo = build_topology(source, quantization=100001)
+        doc = json.loads(json.dumps(encode_topojson(topo)))
+        self.assertEqual(doc["type"], "Topology")
+        decoded = to_geojson(decode_topojson(doc))
+
+        tolerance = max(topo.transform[:2])
+        self.assertEqual(len(decoded["features"]), len(features))
+        for src, got in zip(features, decoded["features"]):
+            self.assertEqual(got["properties"], src["properties"])
+            self.assertEqual(got.get("id"), src.get("id"))
+            if src["geometry"] is None:
+                self.assertIsNone(got["geometry"])
+                continue
+            self.assertEqual(got["geometry"]["type"], src["geometry"]["type"])
+            self.assertGeometryClose(got["geometry"], src["geometry"], tolerance)
+
+    def assertGeometryClose(self, got, want, tolerance):
+        def rings(g):
+            t, c = g["type"], g["coordinates"]
+            if t == "Point":
+                return [[c]]
+            if t == "LineString":
+                return [c]
+            if t == "Polygon":
+                return c
+            return [r for poly in c for r in poly]
+
+        def canonical(ring):
+            # rings may start at a different vertex after the round trip
+            pts = ring[:-1] if len(ring) > 1 and ring[0] == ring[-1] else ring
+            k = min(range(len(pts)), key=lambda i: (round(pts[i][0], 3), round(pts[i][1], 3)))
+            return pts[k:] + pts[:k]
+
+        got_rings, want_rings = rings(got), rings(want)
+        self.assertEqual(len(got_rings), len(want_rings))
+        for g, w in zip(got_rings, want_rings):
+            g, w = canonical(g), canonical(w)
+            self.assertEqual(len(g), len(w))
+            for (gx, gy), (wx, wy) in zip(g, w):
+                self.assertLessEqual(abs(gx - wx), tolerance)
+                self.assertLessEqual(abs(gy - wy), tolerance)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user("api", password="pw"))
+        self.district = District.objects.create(code="KOL", name="Kolkata")
+        for day in range(1, 6):
+            for horizon in (1, 2):
+                ForecastEntry.objects.create(district=self.district, date=date(2025, 7, day),
+                                             horizon=horizon, rainfall_mm=day * horizon)
+
+    def test_cursor_pagination_walks_every_row_once(self):
+        seen = []
+        url = "/api/forecasts/?page_size=3"
+        while url:
+            body = self.client.get(url).json()
+            seen.extend((row["date"], row["id"]) for row in body["results"])
+            url = body["next"]
+        self.assertEqual(len(seen), 10)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_by_date_streams_json(self):
+        r = self.client.get("/api/forecasts/by_date/", {"date": "2025-07-03", "horizon": 2})
+        self.assertTrue(r.streaming)
+        rows = json.loads(b"".join(r.streaming_content))
+        self.assertEqual([row["rainfall_mm"] for row in rows], [6.0])
+
+    async def test_async_read_views_match_sync(self):
+        from asgiref.sync import sync_to_async
+        from django.contrib.auth.models import User
+        from django.test import AsyncRequestFactory
+        from . import async_views
+
+        factory = AsyncRequestFactory()
+        user = await User.objects.aget(username="api")
+
+        def get(path, params):
+            request = factory.get(path, params)
+            request.user = user
+            return request
+
+        r = await async_views.forecasts_by_date(get("/api/forecasts/by_date/", {"date": "2025-07-03"}))
+        rows = json.loads(b"".join([chunk async for chunk in r.streaming_content]))
+        sync_rows = await sync_to_async(lambda: json.loads(b"".join(self.client.get(
+            "/api/forecasts/by_date/", {"date": "2025-07-03"}).streaming_content)))()
+        self.assertEqual(rows, sync_rows)
+        for params in ({"date": "2025-02-30"}, {"horizon": "abc"}):
+            r = await async_views.forecasts_by_date(get("/api/forecasts/by_date/", params))
+            sync_r = await sync_to_async(self.client.get)("/api/forecasts/by_date/", params)
+            self.assertEqual((r.status_code, json.loads(r.content)), (400, sync_r.json()))
+
+        r = await async_views.district_list(get("/api/districts/", {"code": "KOL"}))
+        self.assertEqual(json.loads(r.content)[0]["id"], self.district.id)
+
+        await MapForecast.objects.acreate(date=date(2025, 7, 3), data={"KOL": {"category": "WS"}})
+        r = await async_views.get_map_forecast(get("/forecast/get_map/", {"date": "2025-07-03"}))
+        self.assertEqual(json.loads(r.content)["data"], {"KOL": {"category": "WS"}})
+        request = get("/forecast/get_map/", {"date": "2025-07-03"})
+        request.META["HTTP_IF_NONE_MATCH"] = r["ETag"]
+        self.assertEqual((await async_views.get_map_forecast(request)).status_code, 304)
+
+    async def test_async_api_views_accept_basic_auth(self):
+        import base64
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import AsyncRequestFactory
+        from . import async_views
+
+        def get(password=None):
+            headers = {}
+            if password:
+                headers["Authorization"] = "Basic " + base64.b64encode(f"api:{password}".encode()).decode()
+            request = AsyncRequestFactory().get("/api/districts/", {"code": "KOL"}, headers=headers)
+            request.user = AnonymousUser()
+            return request
+
+        r = await async_views.district_list(get("pw"))
+        self.assertEqual(json.loads(r.content)[0]["code"], "KOL")
+        r = await async_views.forecasts_by_date(get("pw"))
+        self.assertEqual(r.status_code, 200)
+        # same answers as the DRF views for missing and wrong credentials
+        self.assertEqual((await async_views.district_list(get())).status_code, 403)
+        r = await async_views.district_list(get("wrong"))
+        self.assertEqual((r.status_code, json.loads(r.content)["detail"]), (403, "Invalid username/password."))
+
+    def test_numeric_district_code_is_not_an_id(self):
+        other = District.objects.create(code="X22", name="Other")
+        numeric = District.objects.create(code=str(other.id), name="Numeric code")
+        r = self.client.post("/api/forecasts/", {"district": str(other.id), "date": "2025-07-09", "horizon": 1},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()["district"], numeric.id)
+        r = self.client.post("/api/forecasts/", {"district": other.id, "date": "2025-07-09", "horizon": 1},
+                             content_type="application/json")
+        self.assertEqual(r.json()["district"], other.id)
+
+    def test_export_and_district_lookup(self):
+        r = self.client.get("/api/forecasts/export/", {"start": "2025-07-02", "end": "2025-07-03"})
+        self.assertEqual(len(json.loads(b"".join(r.streaming_content))), 4)
+        self.assertEqual(self.client.get("/api/districts/", {"search": "KOL"}).json()[0]["id"], self.district.id)
+
+    def test_bad_filters_are_rejected(self):
+        for url in ("/api/forecasts/export/", "/api/realized/export/", "/api/forecasts/by_date/"):
+            for params in ({"date": "2025-02-30"}, {"horizon": "abc"}, {"horizon": "9"}):
+                self.assertEqual(self.client.get(url, params).status_code, 400, (url, params))
+        r = self.client.get("/api/forecasts/export/", {"end": "2025-07-32"})
+        self.assertIn("end", r.json())
+
+    def test_columnar_export_matches_csv(self):
+        from core.export import read_columnar
+        params = {"kind": "forecast", "start": "2025-07-02", "end": "2025-07-04", "horizon": "2"}
+        r = self.client.get("/api/export/", dict(params, format="csv"))
+        lines = b"".join(r.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], "district,date,horizon,rainfall_mm,rainfall_category,source")
+        self.assertEqual(len(lines), 4)
+
+        r = self.client.get("/api/export/", dict(params, format="columnar"))
+        blocks = list(read_columnar(BytesIO(b"".join(r.streaming_content))))
+        self.assertEqual(len(blocks), 1)
+        self.assertEqual(blocks[0]["rainfall_mm"].tolist(), [4.0, 6.0, 8.0])
+        self.assertEqual(str(blocks[0]["date"][0]), "2025-07-02")
+        self.assertEqual(self.client.get("/api/export/", {"format": "xml"}).status_code, 400)
+
+    def test_export_reads_in_date_batches(self):
+        from core.export import date_batches, export_rows
+        d = lambda day: date(2025, 7, day)
+        self.assertEqual(date_batches(ForecastEntry.objects.all(), 4), [(d(1), d(2)), (d(3), d(4)), (d(5), d(5))])
+        # a date larger than the batch size is read whole
+        self.assertEqual(len(date_batches(ForecastEntry.objects.all(), 1)), 5)
+        _, rows = export_rows("forecast", chunk_size=4)
+        with self.assertNumQueries(4):  # one count per date, then one query per batch
+            rows = list(rows)
+        self.assertEqual([(r[1], r[2]) for r in rows], [(d(day), h) for day in range(1, 6) for h in (1, 2)])
+
+    def test_timeseries_aligns_forecast_and_observed(self):
+        RealizedEntry.objects.create(district=self.district, date=date(2025, 7, 4), horizon=1, rainfall_mm=3.5)
+        RealizedEntry.objects.create(district=self.district, date=date(2025, 7, 6), horizon=1, rainfall_mm=1.0)
+        body = self.client.get("/api/forecasts/timeseries/",
+                               {"district": "KOL", "horizon": 1, "days": 4, "end": "2025-07-06"}).json()
+        self.assertEqual(body["dates"], ["2025-07-03", "2025-07-04", "2025-07-05", "2025-07-06"])
+        self.assertEqual(body["forecast"], [3.0, 4.0, 5.0, None])
+        self.assertEqual(body["observed"], [None, 3.5, None, 1.0])
+        self.assertEqual(self.client.get("/api/forecasts/timeseries/", {"district": "NOPE"}).status_code, 404)
+        r = self.client.get("/api/forecasts/timeseries/", {"district": "KOL", "end": "2025-02-30"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_rollup_endpoint(self):
+        RealizedEntry.objects.create(district=self.district, date=date(2025, 7, 1), horizon=1, rainfall_mm=0.0)
+        call_command("update_rollups", period=["month"], stdout=StringIO())
+        body = self.client.get("/api/verification/rollup/",
+                               {"period": "month", "start": "2025-07-01", "end": "2025-07-31"}).json()
+        self.assertEqual(body["results"], [{"district": "KOL", "horizon": 1, "count": 1,
+                                            "MAE": 1.0, "RMSE": 1.0, "BIAS": 1.0, "POD": None, "FAR": None,
+                                            "CSI": None, "ETS": None, "HSS": None, "PSS": None}])
+        r = self.client.get("/api/verification/rollup/", {"start": "2025-07-01", "end": "2025-02-30"})
+        self.assertEqual(r.status_code, 400)
+
+    def test_batch_upsert_reports_per_row_results(self):
+        ForecastEntry.objects.create(district=self.district, date=date(2025, 7, 9), horizon=1, rainfall_mm=1.0)
+        entries = [{"district": "KOL", "date": "2025-07-09", "horizon": h, "rainfall_mm": 10.0 + h} for h in (1, 2, 3)]
+
+        r = self.client.post("/api/forecasts/batch/", {"entries": entries + [{"district": "NOPE", "date": "x"}]},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual([row["status"] for row in r.json()["results"]], ["skipped"] * 3 + ["error"])
+        self.assertEqual(set(r.json()["results"][3]["errors"]), {"district", "date"})
+        self.assertEqual(ForecastEntry.objects.filter(date=date(2025, 7, 9)).count(), 1)
+
+        r = self.client.post("/api/forecasts/batch/", entries, content_type="application/json")
+        body = r.json()
+        self.assertEqual((body["created"], body["updated"], body["failed"]), (2, 1, 0))
+        self.assertEqual([row["status"] for row in body["results"]], ["updated", "created", "created"])
+        saved = dict(ForecastEntry.objects.filter(date=date(2025, 7, 9)).values_list("horizon", "rainfall_mm"))
+        self.assertEqual(saved, {1: 11.0, 2: 12.0, 3: 13.0})
+        self.assertEqual(ForecastEntry.objects.get(id=body["results"][2]["id"]).horizon, 3)
+
+        r = self.client.post("/api/forecasts/batch/", [{"district": "KOL", "date": "2025-07-10", "horizon": 0}],
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("horizon", r.json()["results"][0]["errors"])
+
+    def test_batch_rejects_invalid_values_per_row(self):
+        row = {"district": "KOL", "date": "2025-07-10", "horizon": 1, "rainfall_mm": 1.0}
+        bad = [{"date": "2025-02-30"}, {"horizon": 1.7}, {"horizon": True}, {"rainfall_mm": "nan"},
+               {"rainfall_mm": False}, {"source": "x" * 33}, {"version": "v" * 33}, {"rainfall_category": "c" * 33}]
+        r = self.client.post("/api/forecasts/batch/", {"entries": [{**row, **b} for b in bad], "atomic": False},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+        errors = [set(result["errors"]) for result in r.json()["results"]]
+        self.assertEqual(errors, [set(b) for b in bad])
+        self.assertFalse(ForecastEntry.objects.filter(date=date(2025, 7, 10)).exists())
+
+        r = self.client.post("/api/forecasts/batch/", {"entries": [row], "atomic": "false"},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertIn("atomic", r.json())
+        self.assertFalse(ForecastEntry.objects.filter(date=date(2025, 7, 10)).exists())
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_is_reproducible(self):
+        def snapshot():
+            call_command("generate_synthetic", districts=3, days=4, horizons=2, seed=7, stdout=StringIO())
+            return list(ForecastEntry.objects.order_by("district__code", "date", "horizon")
+                        .values_list("district__code", "date", "horizon", "rainfall_mm"))
+
+        first = snapshot()
+        self.assertEqual(len(first), 3 * 4 * 2)
+        self.assertEqual(snapshot(), first)
+        self.assertEqual(RealizedEntry.objects.count(), 24)
+        self.assertEqual(MapForecastArea.objects.filter(date=date(2024, 6, 1)).count(), 3)
+        # regenerating replaced the maps, so open editors must see a new revision
+        self.assertEqual(set(MapForecast.objects.values_list("revision", flat=True)), {2})
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        from core.metrics import REGISTRY
+        REGISTRY.reset()
+
+    def test_metrics_endpoint_reports_per_view_counters(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user("m", is_staff=True))
+        District.objects.create(code="KOL", name="Kolkata")
+        self.client.get("/api/districts/")
+        self.client.get("/api/districts/")
+        body = self.client.get("/metrics/").content.decode()
+        self.assertIn('weather_request_duration_seconds_count{view="district-list"} 2', body)
+        self.assertIn('weather_requests_total{view="district-list",status="2xx"} 2', body)
+        self.assertRegex(body, r'weather_db_queries_total\{view="district-list"\} [1-9]')
+        self.assertRegex(body, r'weather_serialization_duration_seconds_total\{view="district-list"\} 0\.\d+')
+
+    def test_metrics_endpoint_needs_staff_or_token(self):
+        from django.contrib.auth.models import User
+        # loopback is not trusted by default: behind a local proxy every client looks like 127.0.0.1
+        self.assertEqual(self.client.get("/metrics/", REMOTE_ADDR="127.0.0.1").status_code, 403)
+        with self.settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer s3cret").status_code, 200)
+            self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer nope").status_code, 403)
+        self.client.force_login(User.objects.create_user("m"))
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+
+    def test_slow_requests_are_logged_with_sql(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user("m"))
+        with self.settings(METRICS_SLOW_REQUEST_MS=0), self.assertLogs("core.metrics.slow", "WARNING") as logs:
+            self.client.get("/forecast/get_map/", {"date": "2025-07-01"})
+        self.assertIn("SELECT", logs.output[0])
+
+    def test_streaming_responses_are_recorded_when_the_body_is_done(self):
+        from django.contrib.auth.models import User
+        from core.metrics import REGISTRY
+        self.client.force_login(User.objects.create_user("m"))
+        district = District.objects.create(code="KOL", name="Kolkata")
+        ForecastEntry.objects.create(district=district, date=date(2025, 7, 1), rainfall_mm=1.0)
+        with self.settings(METRICS_SLOW_REQUEST_MS=0), self.assertLogs("core.metrics.slow", "WARNING") as logs:
+            r = self.client.get("/api/forecasts/export/")
+            self.assertNotIn('view="forecast-export"', REGISTRY.render())
+            self.assertEqual(len(json.loads(b"".join(r.streaming_content))), 1)
+        self.assertIn('weather_request_duration_seconds_count{view="forecast-export"} 1', REGISTRY.render())
+        # the export query only runs while the body is produced
+        self.assertIn('FROM "core_forecastentry"', logs.output[0])
+
+    async def test_async_streams_are_recorded_once_when_closed(self):
+        from core.middleware import MeteredAsyncStream
+        from core.metrics import RequestMetrics
+
+        async def chunks():
+            yield b"["
+            yield b"]"
+
+        done = mock.Mock()
+        stream = MeteredAsyncStream(chunks(), RequestMetrics(), done)
+        self.assertEqual(await stream.__anext__(), b"[")
+        stream.close()
+        stream.close()
+        done.assert_called_once_with()
+
+    def test_slowest_statements_are_kept_past_the_cap(self):
+        import time
+        from core.metrics import MAX_LOGGED_SQL, RequestMetrics
+        record = RequestMetrics(keep_sql=True)
+        for i in range(MAX_LOGGED_SQL + 10):
+            slow = i == MAX_LOGGED_SQL + 5
+            record(lambda *args: time.sleep(0.01 if slow else 0), f"SELECT {i}", (), False, {})
+        self.assertEqual((record.queries, len(record.sql)), (MAX_LOGGED_SQL + 10, MAX_LOGGED_SQL))
+        self.assertEqual(max(record.sql)[1], f"SELECT {MAX_LOGGED_SQL + 5}")
+
+
+class DistrictRegistryTests(TestCase):
+    def test_lookups_are_cached_until_a_district_changes(self):
+        from core.districts import district_registry
+        kol = District.objects.create(code="KOL", name="Kolkata")
+        self.assertEqual(district_registry.id_for("KOL"), kol.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(district_registry.get_by_id(kol.id).name, "Kolkata")
+            self.assertIsNone(district_registry.get("NOPE"))
+
+        kol.name = "Calcutta"
+        kol.save()
+        self.assertEqual(district_registry.get("KOL").name, "Calcutta")
+
+    def test_readers_survive_concurrent_invalidation(self):
+        import threading
+        from core.districts import district_registry
+        District.objects.create(code="KOL", name="Kolkata")
+        loaded = district_registry.data()
+        # reloads in the reader threads return the same rows without touching the test database
+        patcher = mock.patch.object(district_registry, "_load", lambda: loaded)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        errors, stop = [], threading.Event()
+
+        def read():
+            try:
+                while not stop.is_set():
+                    district_registry.all()
+                    district_registry.get("KOL")
+            except Exception as exc:  # e.g. AttributeError from a copy cleared halfway through a read
+                errors.append(exc)
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        for reader in readers:
+            reader.start()
+        for _ in range(2000):
+            district_registry._state = None
+            district_registry.data()
+        stop.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(errors, [])
+
+    def test_forecast_post_accepts_district_code(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_user("f"))
+        kol = District.objects.create(code="KOL", name="Kolkata")
+        r = self.client.post("/api/forecasts/", {"district": "KOL", "date": "2025-07-01", "horizon": 1,
+                                                 "rainfall_mm": 4.0}, content_type="application/json")
+        self.assertEqual(r.status_code, 201, r.content)
+        self.assertEqual(r.json()["district"], kol.id)
+        r = self.client.post("/api/forecasts/", {"district": "NOPE", "date": "2025-07-01", "horizon": 1},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(self.client.get("/api/districts/", {"code": "KOL"}).json()[0]["name"], "Kolkata")
 
-# Create your tests here.
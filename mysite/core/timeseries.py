@@ -0,0 +1,40 @@
+# core/timeseries.py
+"""
+Forecast vs realized series for one district and horizon.
+
+Both reads are "district = ? AND horizon = ? AND date BETWEEN ? AND ?" ordered by
+date, which is a single range scan of the (district, horizon, date, rainfall_mm)
+index and never touches the table rows.
+"""
+from datetime import timedelta
+
+from .models import ForecastEntry, RealizedEntry
+
+DEFAULT_DAYS = 30
+MAX_DAYS = 3660
+
+
+def series_queryset(model, district_id, horizon, start, end):
+    return (model.objects
+            .filter(district_id=district_id, horizon=horizon, date__gte=start, date__lte=end)
+            .order_by("date")
+            .values_list("date", "rainfall_mm"))
+
+
+def district_timeseries(district_id, horizon, end, days=DEFAULT_DAYS):
+    """
+    Return aligned arrays for the ``days`` days ending at ``end`` (inclusive).
+    Only dates with a forecast or an observation are listed; a missing side is None.
+    """
+    start = end - timedelta(days=days - 1)
+    forecast = dict(series_queryset(ForecastEntry, district_id, horizon, start, end))
+    observed = dict(series_queryset(RealizedEntry, district_id, horizon, start, end))
+    dates = sorted(forecast.keys() | observed.keys())
+    return {
+        "horizon": horizon,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "dates": [d.isoformat() for d in dates],
+        "forecast": [forecast.get(d) for d in dates],
+        "observed": [observed.get(d) for d in dates],
+    }
@@ -16,8 +16,20 @@ Including another URLconf
 """
 
 
-from django.urls import path
+from django.conf import settings
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
 from . import views
+from . import api_views
+from . import async_views
+
+router = DefaultRouter()
+router.register("districts", api_views.DistrictViewSet, basename="district")
+router.register("forecasts", api_views.ForecastViewSet, basename="forecast")
+router.register("realized", api_views.RealizedViewSet, basename="realized")
+router.register("warnings", api_views.WarningViewSet, basename="warning")
+router.register("verification", api_views.VerificationViewSet, basename="verification")
+router.register("map-areas", api_views.MapForecastAreaViewSet, basename="map-area")
 
 urlpatterns = [
     path('', views.index_view, name='index'),
@@ -39,9 +51,21 @@ urlpatterns = [
     path('settings/', views.settings_view, name='settings'),
     path('forecast/save_map/', views.save_map_forecast, name='save_map_forecast'),
     path('forecast/get_map/', views.get_map_forecast, name='get_map_forecast'),
+    path('forecast/map_image/', views.map_forecast_image, name='map_forecast_image'),
+    path('metrics/', views.metrics_view, name='metrics'),
+    path('api/export/', views.export_entries, name='export_entries'),
+    path('api/', include(router.urls)),
+
 
 
 
 
+]
 
-]
\ No newline at end of file
+if getattr(settings, "ASYNC_READ_VIEWS", False):
+    # ASGI deployments: serve the hot read paths from async views on the same URLs
+    urlpatterns = [
+        path('forecast/get_map/', async_views.get_map_forecast, name='get_map_forecast'),
+        path('api/districts/', async_views.district_list, name='district-list'),
+        path('api/forecasts/by_date/', async_views.forecasts_by_date, name='forecast-by-date'),
+    ] + urlpatterns
@@ -0,0 +1,417 @@
+# core/verification.py
+"""
+Vectorized verification engine used by the compute_verification command.
+
+All forecast/realized pairs of a date range are fetched with one joined query
+into NumPy columns, and every (district, horizon) group is scored at once with
+array reductions instead of per-district queries and Python loops.
+"""
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from .models import ForecastEntry, RealizedEntry, VerificationScore, VerificationWatermark
+
+DEFAULT_THRESHOLD = 2.5  # mm threshold for event
+# lower bounds (mm/24 h) of IMD's light, moderate, heavy and very heavy rainfall categories
+IMD_THRESHOLDS = (2.5, 15.6, 64.5, 115.6)
+CATEGORICAL_METRICS = ("POD", "FAR", "CSI", "ETS", "HSS", "PSS")
+# incremental watermarks are stored this far behind the run's start, so rows entered just before
+# the run whose transaction committed after its scan are picked up by the next run
+WATERMARK_LAG = timedelta(seconds=getattr(settings, "VERIFICATION_WATERMARK_LAG_SECONDS", 300))
+
+
+def metric_name(metric, threshold):
+    """Name stored in VerificationScore.metric; the default threshold keeps the bare name."""
+    if threshold == DEFAULT_THRESHOLD:
+        return metric
+    return f"{metric}@{threshold:g}"
+
+
+class Pairs:
+    """Columnar forecast/observation pairs (one array element per pair)."""
+
+    def __init__(self, district_id, horizon, date, fcst, obs):
+        self.district_id = district_id
+        self.horizon = horizon
+        self.date = date
+        self.fcst = fcst
+        self.obs = obs
+
+    def __len__(self):
+        return len(self.district_id)
+
+    def sorted(self):
+        """Return the pairs ordered by (district, horizon, date) so reductions are order independent."""
+        order = np.lexsort((self.date, self.horizon, self.district_id))
+        return Pairs(self.district_id[order], self.horizon[order], self.date[order],
+                     self.fcst[order], self.obs[order])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (district_id, horizon, date, fcst_mm, obs_mm) tuples; missing rain counts as 0 mm."""
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                       np.empty(0, dtype="datetime64[D]"), np.empty(0), np.empty(0))
+        district_id, horizon, dates, fcst, obs = zip(*rows)
+        return cls(
+            np.asarray(district_id, dtype=np.int64),
+            np.asarray(horizon, dtype=np.int64),
+            np.asarray(dates, dtype="datetime64[D]"),
+            np.nan_to_num(np.asarray(fcst, dtype=float), nan=0.0),
+            np.nan_to_num(np.asarray(obs, dtype=float), nan=0.0),
+        )
+
+
+def fetch_pairs(start, end, horizons=None, district_ids=None):
+    """
+    Fetch every ForecastEntry that has a RealizedEntry for the same
+    (district, date, horizon) in [start, end] with a single query; a None
+    bound leaves that side of the range open.
+    """
+    realized = RealizedEntry.objects.filter(
+        district=OuterRef("district"), date=OuterRef("date"), horizon=OuterRef("horizon"),
+    )
+    qs = ForecastEntry.objects.all()
+    if start is not None:
+        qs = qs.filter(date__gte=start)
+    if end is not None:
+        qs = qs.filter(date__lte=end)
+    if horizons is not None:
+        qs = qs.filter(horizon__in=list(horizons))
+    if district_ids is not None:
+        qs = qs.filter(district_id__in=list(district_ids))
+    qs = (
+        qs.annotate(has_obs=Exists(realized), obs_mm=Subquery(realized.values("rainfall_mm")[:1]))
+        .filter(has_obs=True)
+        .order_by()
+        .values_list("district_id", "horizon", "date", "rainfall_mm", "obs_mm")
+    )
+    return Pairs.from_rows(list(qs.iterator(chunk_size=10000)))
+
+
+class Scores:
+    """
+    Per (district, horizon) group sufficient statistics and derived metrics.
+
+    The arrays may carry extra leading axes (bootstrap resamples); metrics()
+    broadcasts over them.
+    """
+
+    def __init__(self, district_id, horizon, count, abs_err_sum, sq_err_sum, err_sum, thresholds,
+                 hits, false_alarms, misses, intervals=None):
+        self.district_id = district_id
+        self.horizon = horizon
+        self.count = count
+        self.abs_err_sum = abs_err_sum
+        self.sq_err_sum = sq_err_sum
+        self.err_sum = err_sum  # sum of forecast - observed
+        self.thresholds = thresholds
+        # contingency counts have shape (groups, thresholds)
+        self.hits = hits
+        self.false_alarms = false_alarms
+        self.misses = misses
+        # {metric: (low, high) arrays over groups} from bootstrap_intervals, or None
+        self.intervals = intervals
+
+    def __len__(self):
+        return len(self.district_id)
+
+    @classmethod
+    def empty(cls, thresholds):
+        ids = np.empty(0, dtype=np.int64)
+        zeros = np.zeros((0, len(thresholds)), dtype=np.int64)
+        return cls(ids, ids, ids, np.empty(0), np.empty(0), np.empty(0), np.asarray(thresholds, dtype=float),
+                   zeros, zeros, zeros)
+
+    def metrics(self):
+        """Return {metric_name: array over groups}; undefined ratios are NaN."""
+        H, F, M = self.hits, self.false_alarms, self.misses
+        N = self.count[..., None]
+        C = N - H - F - M  # correct negatives
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out = {
+                "MAE": self.abs_err_sum / self.count,
+                "RMSE": np.sqrt(self.sq_err_sum / self.count),
+                "BIAS": self.err_sum / self.count,
+            }
+            hits_random = (H + F) * (H + M) / N
+            derived = {
+                "POD": H / (H + M),
+                "FAR": F / (H + F),
+                "CSI": H / (H + F + M),
+                "ETS": (H - hits_random) / (H + F + M - hits_random),
+                "HSS": 2.0 * (H * C - F * M) / ((H + M) * (M + C) + (H + F) * (F + C)),
+                "PSS": H / (H + M) - F / (F + C),
+            }
+        for j, thr in enumerate(self.thresholds):
+            for metric in CATEGORICAL_METRICS:
+                out[metric_name(metric, thr)] = derived[metric][..., j]
+        return out
+
+    @classmethod
+    def concat(cls, parts, thresholds):
+        """Merge scores of disjoint group sets, ordered by (district, horizon)."""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty(thresholds)
+        intervals = None
+        if all(p.intervals is not None for p in parts):
+            intervals = {
+                metric: tuple(np.concatenate([p.intervals[metric][k] for p in parts]) for k in (0, 1))
+                for metric in parts[0].intervals
+            }
+        merged = cls(
+            np.concatenate([p.district_id for p in parts]),
+            np.concatenate([p.horizon for p in parts]),
+            np.concatenate([p.count for p in parts]),
+            np.concatenate([p.abs_err_sum for p in parts]),
+            np.concatenate([p.sq_err_sum for p in parts]),
+            np.concatenate([p.err_sum for p in parts]),
+            parts[0].thresholds,
+            np.concatenate([p.hits for p in parts]),
+            np.concatenate([p.false_alarms for p in parts]),
+            np.concatenate([p.misses for p in parts]),
+            intervals,
+        )
+        return merged.select(np.lexsort((merged.horizon, merged.district_id)))
+
+    def select(self, mask):
+        """Return the subset of groups where ``mask`` is true."""
+        intervals = None
+        if self.intervals is not None:
+            intervals = {metric: (low[mask], high[mask]) for metric, (low, high) in self.intervals.items()}
+        return Scores(
+            self.district_id[mask], self.horizon[mask], self.count[mask], self.abs_err_sum[mask],
+            self.sq_err_sum[mask], self.err_sum[mask], self.thresholds,
+            self.hits[mask], self.false_alarms[mask], self.misses[mask], intervals,
+        )
+
+    def iter_rows(self):
+        """Yield (district_id, horizon, metric, value) for every defined metric."""
+        for metric, values in self.metrics().items():
+            for i in np.flatnonzero(~np.isnan(values)):
+                yield int(self.district_id[i]), int(self.horizon[i]), metric, float(values[i])
+
+
+def group_index(keys):
+    """Return (unique key rows, inverse) for an (n, k) integer key array."""
+    groups, inverse = np.unique(keys, axis=0, return_inverse=True)
+    return groups, inverse.ravel()
+
+
+def group_sum(inverse, n_groups, weights=None):
+    return np.bincount(inverse, weights=weights, minlength=n_groups)
+
+
+def _stats(inverse, n_groups, fcst, obs, thresholds):
+    """Every additive statistic for every threshold, from one pass over the pairs."""
+    T = len(thresholds)
+    err = fcst - obs
+    count = group_sum(inverse, n_groups)
+    abs_err_sum = group_sum(inverse, n_groups, np.abs(err))
+    sq_err_sum = group_sum(inverse, n_groups, err * err)
+    err_sum = group_sum(inverse, n_groups, err)
+
+    f_evt = fcst[:, None] >= thresholds[None, :]
+    o_evt = obs[:, None] >= thresholds[None, :]
+    cell = inverse[:, None] * T + np.arange(T)[None, :]
+
+    def table(mask):
+        return np.bincount(cell[mask], minlength=n_groups * T).reshape(n_groups, T)
+
+    return (count, abs_err_sum, sq_err_sum, err_sum,
+            table(f_evt & o_evt), table(f_evt & ~o_evt), table(~f_evt & o_evt))
+
+
+def group_stats(keys, fcst, obs, thresholds):
+    """
+    Sufficient statistics per unique row of ``keys``: returns
+    (groups, count, abs_err_sum, sq_err_sum, err_sum, hits, false_alarms, misses),
+    the contingency counts with shape (groups, thresholds).
+    """
+    groups, inverse = group_index(keys)
+    return (groups,) + _stats(inverse, len(groups), fcst, obs, thresholds)
+
+
+def score_pairs(pairs, thresholds=(DEFAULT_THRESHOLD,), n_resamples=0, confidence=0.95, seed=0):
+    """
+    Score all (district, horizon) groups of ``pairs`` for every threshold in one
+    pass. With ``n_resamples`` the result also carries bootstrap intervals.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    if not len(pairs):
+        return Scores.empty(thresholds)
+
+    pairs = pairs.sorted()
+    keys = np.stack([pairs.district_id, pairs.horizon], axis=1)
+    groups, *stats = group_stats(keys, pairs.fcst, pairs.obs, thresholds)
+    scores = Scores(groups[:, 0], groups[:, 1], *stats[:4], thresholds, *stats[4:])
+    if n_resamples:
+        scores.intervals = bootstrap_intervals(pairs, thresholds, n_resamples, confidence, seed)
+    return scores
+
+
+def bootstrap_intervals(pairs, thresholds=(DEFAULT_THRESHOLD,), n_resamples=1000, confidence=0.95, seed=0,
+                        max_elements=2_000_000):
+    """
+    Percentile bootstrap intervals for every metric of every (district, horizon)
+    group, aligned with score_pairs(pairs, thresholds).
+
+    Each resample redraws every group's pairs with replacement (same group
+    sizes). Every group draws from its own stream, seeded by (seed, district,
+    horizon), so its interval doesn't depend on which other groups are scored
+    with it (see score_parallel). Resamples are built as one (resamples, pairs)
+    index array per block of about ``max_elements`` and scored with the same
+    bincount reductions as score_pairs; only the draws loop over groups.
+    Returns {metric: (low, high)}.
+    """
+    thresholds = np.asarray(thresholds, dtype=float)
+    pairs = pairs.sorted()
+    groups, inverse = group_index(np.stack([pairs.district_id, pairs.horizon], axis=1))
+    G, n = len(groups), len(pairs)
+    # sorted pairs: group g occupies [offset[g], offset[g] + size[g])
+    size = group_sum(inverse, G).astype(np.int64)
+    offset = np.concatenate([[0], np.cumsum(size)[:-1]])
+    rngs = [np.random.default_rng(np.random.SeedSequence([seed, int(d), int(h)])) for d, h in groups]
+    block = max(1, min(n_resamples, max_elements // max(n, 1)))
+
+    samples = {}
+    for b0 in range(0, n_resamples, block):
+        nb = min(block, n_resamples - b0)
+        idx = np.empty((nb, n), dtype=np.int64)
+        for g, rng in enumerate(rngs):
+            lo, hi = offset[g], offset[g] + size[g]
+            idx[:, lo:hi] = lo + rng.integers(0, size[g], size=(nb, size[g]))
+        cell = (np.arange(nb)[:, None] * G + inverse[None, :]).ravel()
+        stats = _stats(cell, nb * G, pairs.fcst[idx].ravel(), pairs.obs[idx].ravel(), thresholds)
+        stats = [a.reshape((nb, G) + a.shape[1:]) for a in stats]
+        resampled = Scores(groups[:, 0], groups[:, 1], *stats[:4], thresholds, *stats[4:])
+        for metric, values in resampled.metrics().items():
+            samples.setdefault(metric, []).append(values)
+
+    alpha = (1.0 - confidence) / 2.0
+    out = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # groups where a metric is never defined
+        for metric, blocks in samples.items():
+            low, high = np.nanquantile(np.concatenate(blocks), [alpha, 1.0 - alpha], axis=0)
+            out[metric] = (low, high)
+    return out
+
+
+def _init_worker():
+    # each worker opens its own DB connection instead of sharing the parent's socket
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def score_shard(start, end, horizons, district_ids, thresholds=(DEFAULT_THRESHOLD,), **bootstrap):
+    """Fetch and score one shard of districts; runs inside a worker process."""
+    try:
+        return score_pairs(fetch_pairs(start, end, horizons=horizons, district_ids=district_ids), thresholds,
+                           **bootstrap)
+    finally:
+        connections.close_all()
+
+
+def shard(ids, n_shards):
+    """Split ``ids`` into at most ``n_shards`` contiguous, non-empty chunks."""
+    ids = sorted(ids)
+    size = -(-len(ids) // max(n_shards, 1)) or 1
+    return [ids[i:i + size] for i in range(0, len(ids), size)]
+
+
+def score_parallel(start, end, district_ids, horizons=None, workers=2, thresholds=(DEFAULT_THRESHOLD,),
+                   **bootstrap):
+    """
+    Score ``district_ids`` across a pool of ``workers`` processes. Each
+    district lands in exactly one shard, so the merged result is identical to
+    a serial score_pairs(fetch_pairs(...)) run, bootstrap intervals included
+    (each group draws from its own seeded stream).
+    """
+    shards = shard(district_ids, workers * 4)
+    horizons = None if horizons is None else sorted(horizons)
+    # don't hand the parent's open connection to forked children
+    connections.close_all()
+    parts = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(score_shard, start, end, horizons, ids, thresholds, **bootstrap) for ids in shards]
+        for fut in as_completed(futures):
+            parts.append(fut.result())
+    return Scores.concat(parts, thresholds)
+
+
+def save_scores(scores, end_date, batch_size=1000):
+    """
+    Replace the VerificationScore rows for ``end_date`` of exactly the scored
+    district/horizon groups with a single bulk insert. Bootstrap intervals, if
+    the scores carry them, go into ci_low/ci_high.
+    """
+    if not len(scores):
+        return 0
+    objs = []
+    metrics = scores.metrics()
+    intervals = scores.intervals or {}
+    for metric, values in metrics.items():
+        low, high = intervals.get(metric, (None, None))
+        for i in np.flatnonzero(~np.isnan(values)):
+            objs.append(VerificationScore(
+                date=end_date, horizon=int(scores.horizon[i]), metric=metric,
+                district_id=int(scores.district_id[i]), value=float(values[i]),
+                ci_low=_defined(low, i), ci_high=_defined(high, i),
+            ))
+    with transaction.atomic():
+        # one delete per horizon so groups that were not scored keep their rows
+        for h in np.unique(scores.horizon).tolist():
+            VerificationScore.objects.filter(
+                date=end_date,
+                horizon=h,
+                district_id__in=scores.district_id[scores.horizon == h].tolist(),
+                metric__in=list(metrics),
+            ).delete()
+        VerificationScore.objects.bulk_create(objs, batch_size=batch_size)
+    return len(objs)
+
+
+def _defined(values, i):
+    if values is None or np.isnan(values[i]):
+        return None
+    return float(values[i])
+
+
+def changed_cells(start, end, since, horizons=None):
+    """
+    Return the set of (district_id, horizon) cells in [start, end] with a
+    ForecastEntry or RealizedEntry created or edited after ``since``.
+    """
+    cells = set()
+    for model in (ForecastEntry, RealizedEntry):
+        qs = model.objects.filter(modified_at__gt=since, date__range=(start, end))
+        if horizons is not None:
+            qs = qs.filter(horizon__in=list(horizons))
+        cells.update(qs.order_by().values_list("district_id", "horizon").distinct())
+    return cells
+
+
+def forget_watermarks(first, last):
+    """
+    Drop the watermarks of every period overlapping [first, last] (after
+    entries dated in it were deleted): a deleted row leaves nothing for
+    changed_cells to find, so the next incremental run rescores everything.
+    """
+    VerificationWatermark.objects.filter(start__lte=last, end__gte=first).delete()
+
+
+def cell_mask(scores, cells):
+    """Boolean mask over ``scores`` groups that belong to ``cells``."""
+    return np.fromiter(
+        ((int(d), int(h)) in cells for d, h in zip(scores.district_id, scores.horizon)),
+        dtype=bool, count=len(scores),
+    )
@@ -1,15 +1,27 @@
 
 # Create your views here.
+import hmac
+import json
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login , logout
 from django.contrib import messages
-from django.http import HttpResponse, JsonResponse, HttpResponseBadRequest
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError, transaction
+from django.db.models import F
 from .models import MapForecast
+from .caching import get_map_forecast_body, invalidate_map_forecast
+from .export import CONTENT_TYPES, parse_filters, stream_export
+from .map_areas import MAX_AREA_ID, invalid_area_ids, sync_map_forecast_areas
+from .map_render import DEFAULT_WIDTH, FORMATS, MAX_WIDTH, GeometryUnavailable, geometry_version, rendered_map
+from .metrics import REGISTRY
 
 def login_view(request):
     if request.method == "POST":
@@ -138,6 +150,9 @@ def save_map_forecast(request):
     Save or update the MapForecast for a given date.
     Expects JSON body:
       { "date": "YYYY-MM-DD", "scope": "mixed", "data": { area_id: {category, rainfall_mm}, ... } }
+    or, to change only some areas (null removes an area):
+      { "date": "YYYY-MM-DD", "patch": { area_id: {category, rainfall_mm} | null, ... }, "expected_revision": 3 }
+    'expected_revision' is optional in both forms; a mismatch returns 409 with the current revision.
     """
     try:
         payload = json.loads(request.body.decode("utf-8"))
@@ -151,29 +166,116 @@ def save_map_forecast(request):
     if not d:
         return HttpResponseBadRequest("Invalid 'date' format. Use YYYY-MM-DD.")
 
+    expected = payload.get("expected_revision")
+    if expected is not None and (not isinstance(expected, int) or isinstance(expected, bool)):
+        return HttpResponseBadRequest("'expected_revision' must be an integer.")
+
+    if "patch" in payload:
+        patch = payload["patch"]
+        if not isinstance(patch, dict) or not all(v is None or isinstance(v, dict) for v in patch.values()):
+            return HttpResponseBadRequest("'patch' must be an object mapping area_id -> forecast object or null.")
+        if invalid_area_ids(patch):
+            return _area_id_too_long(patch)
+        return _patch_map_forecast(request, d, patch, payload.get("scope"), expected)
+
     data = payload.get("data")
     if not isinstance(data, dict):
         return HttpResponseBadRequest("'data' must be an object mapping area_id -> forecast object.")
+    if invalid_area_ids(data):
+        return _area_id_too_long(data)
 
     scope = payload.get("scope", "mixed")
 
-    obj, created = MapForecast.objects.update_or_create(
-        date=d,
-        defaults={
-            "data": data,
-            "scope": scope,
-            "entered_by": request.user,
-        },
-    )
+    try:
+        with transaction.atomic():
+            obj = MapForecast.objects.select_for_update().filter(date=d).first()
+            created = obj is None
+            if created:
+                obj = MapForecast(date=d)
+            if expected is not None and obj.revision != expected:
+                return _revision_conflict(obj.revision)
+            obj.data = data
+            obj.scope = scope
+            obj.entered_by = request.user
+            obj.revision += 1
+            obj.save()
+            sync_map_forecast_areas(obj.id, d, data)
+    except IntegrityError:
+        # another first save for this date created the row after our SELECT found none
+        return _revision_conflict(MapForecast.objects.filter(date=d).values_list("revision", flat=True).first())
 
     return JsonResponse({
         "ok": True,
         "created": created,
         "id": obj.id,
         "date": str(obj.date),
+        "revision": obj.revision,
     })
 
 
+def _area_id_too_long(areas):
+    ids = invalid_area_ids(areas)
+    return HttpResponseBadRequest(f"area_id longer than {MAX_AREA_ID} characters: {', '.join(ids[:5])}"
+                                  + (f" (and {len(ids) - 5} more)" if len(ids) > 5 else ""))
+
+
+def _revision_conflict(current):
+    return JsonResponse({"ok": False, "error": "revision conflict", "revision": current}, status=409)
+
+
+def _patch_map_forecast(request, d, patch, scope, expected, attempts=3):
+    """
+    Merge ``patch`` into the stored map without locking the row: the merged
+    blob is written with an UPDATE guarded by the revision that was read.
+    Without an expected revision, lost races are retried a few times.
+    """
+    for _ in range(attempts):
+        row = MapForecast.objects.filter(date=d).values("id", "data", "revision").first()
+        if row is None:
+            if expected:
+                return _revision_conflict(0)
+            try:
+                with transaction.atomic():
+                    obj = MapForecast.objects.create(
+                        date=d, scope=scope or "mixed", entered_by=request.user, revision=1,
+                        data={k: v for k, v in patch.items() if v is not None},
+                    )
+                    sync_map_forecast_areas(obj.id, d, obj.data)
+            except IntegrityError:
+                # created concurrently; merge into that row instead
+                continue
+            return JsonResponse({"ok": True, "created": True, "id": obj.id, "date": str(d),
+                                 "revision": obj.revision, "patched": len(patch)})
+
+        if expected is not None and row["revision"] != expected:
+            return _revision_conflict(row["revision"])
+
+        data = row["data"]
+        for area_id, value in patch.items():
+            if value is None:
+                data.pop(area_id, None)
+            else:
+                data[area_id] = value
+
+        fields = {"data": data, "revision": F("revision") + 1,
+                  "entered_by": request.user, "updated_at": timezone.now()}
+        if scope:
+            fields["scope"] = scope
+        with transaction.atomic():
+            updated = MapForecast.objects.filter(pk=row["id"], revision=row["revision"]).update(**fields)
+            if updated:
+                sync_map_forecast_areas(row["id"], d, data, area_ids=patch.keys())
+        if updated:
+            # .update() skips post_save, so drop the cached response here
+            invalidate_map_forecast(d)
+            return JsonResponse({"ok": True, "created": False, "id": row["id"], "date": str(d),
+                                 "revision": row["revision"] + 1, "patched": len(patch)})
+        if expected is not None:
+            return _revision_conflict(MapForecast.objects.filter(pk=row["id"]).values_list("revision", flat=True).first())
+
+    return _revision_conflict(MapForecast.objects.filter(date=d).values_list("revision", flat=True).first())
+
+
 @login_required
 @require_GET
 def get_map_forecast(request):
@@ -188,15 +290,103 @@ def get_map_forecast(request):
     if not d:
         return HttpResponseBadRequest("Invalid date format.")
 
-    try:
-        obj = MapForecast.objects.get(date=d)
-    except MapForecast.DoesNotExist:
+    # cheap indexed lookup of the version; the JSON blob is only read on a cache miss
+    updated_at = MapForecast.objects.filter(date=d).values_list("updated_at", flat=True).first()
+    if updated_at is None:
         return JsonResponse({"ok": True, "found": False, "date": date_str})
 
-    return JsonResponse({
-        "ok": True,
-        "found": True,
-        "date": str(obj.date),
-        "scope": obj.scope,
-        "data": obj.data
-    })
\ No newline at end of file
+    etag, last_modified = map_forecast_validators(d, updated_at)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(get_map_forecast_body(d, updated_at), content_type="application/json")
+    return set_map_forecast_headers(response, etag, last_modified)
+
+
+def map_forecast_validators(d, updated_at):
+    """(ETag, Last-Modified timestamp) of the MapForecast for ``d``."""
+    return quote_etag(f"{d.isoformat()}-{updated_at.timestamp():.6f}"), int(updated_at.timestamp())
+
+
+def set_map_forecast_headers(response, etag, last_modified):
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    # per-user (login required) and must be revalidated, which is cheap with the ETag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
+@login_required
+@require_GET
+def map_forecast_image(request):
+    """
+    The MapForecast for a date as a static choropleth.
+    Query params: ?date=YYYY-MM-DD&format=svg|png&width=800
+    """
+    d = parse_date(request.GET.get("date") or "")
+    if not d:
+        return HttpResponseBadRequest("Please provide ?date=YYYY-MM-DD")
+    fmt = request.GET.get("format", "svg").lower()
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(FORMATS)}")
+    try:
+        width = int(request.GET.get("width") or DEFAULT_WIDTH)
+    except ValueError:
+        width = 0
+    if not 16 <= width <= MAX_WIDTH:
+        return HttpResponseBadRequest(f"width must be an integer between 16 and {MAX_WIDTH}")
+
+    updated_at = MapForecast.objects.filter(date=d).values_list("updated_at", flat=True).first()
+    if updated_at is None:
+        return JsonResponse({"ok": False, "found": False, "date": str(d)}, status=404)
+    try:
+        version = geometry_version()
+    except GeometryUnavailable as exc:
+        return JsonResponse({"ok": False, "error": str(exc)}, status=503)
+
+    _, last_modified = map_forecast_validators(d, updated_at)
+    etag = quote_etag(f"{d.isoformat()}-{updated_at.timestamp():.6f}-{version}-{width}.{fmt}")
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        try:
+            body = rendered_map(d, updated_at, fmt, width)
+        except GeometryUnavailable as exc:
+            return JsonResponse({"ok": False, "error": str(exc)}, status=503)
+        response = HttpResponse(body, content_type=FORMATS[fmt])
+    return set_map_forecast_headers(response, etag, last_modified)
+
+
+@login_required
+@require_GET
+def export_entries(request):
+    """
+    Stream a filtered slice of forecasts or observations.
+    Query params: ?kind=forecast|realized&format=csv|ndjson|columnar
+                  &date= | &start=&end=, &horizon=1[,2], &district=CODE[,CODE]
+    """
+    try:
+        kind, fmt, filters = parse_filters(request.GET)
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+    response = StreamingHttpResponse(stream_export(kind, fmt, filters), content_type=CONTENT_TYPES[fmt])
+    ext = {"csv": "csv", "ndjson": "ndjson", "columnar": "wxcols"}[fmt]
+    response["Content-Disposition"] = f'attachment; filename="{kind}.{ext}"'
+    return response
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus text exposition of the request metrics, for staff users and
+    scrapers sending "Authorization: Bearer <METRICS_TOKEN>" (or, opt-in,
+    clients from METRICS_ALLOWED_IPS).
+    """
+    token = getattr(settings, "METRICS_TOKEN", None)
+    bearer = request.META.get("HTTP_AUTHORIZATION", "")
+    allowed = (
+        request.user.is_staff
+        or (token and hmac.compare_digest(bearer.encode(), f"Bearer {token}".encode()))
+        or request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", [])
+    )
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,195 @@
+# core/warning_rules.py
+"""
+Threshold warnings generated from forecasts (settings.WARNING_RULES).
+
+Each rule maps one forecast value (rainfall_mm, or an extras key such as
+tmax) to a severity through its thresholds. Every ForecastEntry in the date
+range is loaded as columns and each rule is evaluated with one searchsorted
+over its whole column. The result is diffed against the rule-generated
+WarningEntry rows already stored, so only created, changed and cleared
+warnings are written. Manual warnings (source != "rules") are never touched;
+where one exists the rules don't issue their own for that key.
+"""
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.fields.json import KT
+
+from .ingest import chunked
+from .models import ForecastEntry, WarningEntry
+
+SOURCE = "rules"
+KEY_FIELDS = ["district", "date", "horizon", "phenomenon"]
+EXTRAS_PREFIX = "extras."
+
+
+class Rule:
+    """One phenomenon; ``levels`` is [(severity, threshold), ...] from mildest to most severe."""
+
+    def __init__(self, phenomenon, field, levels, below=False):
+        self.phenomenon = phenomenon
+        self.field = field
+        self.below = bool(below)
+        if not field.startswith(EXTRAS_PREFIX) and field not in {f.name for f in ForecastEntry._meta.concrete_fields}:
+            raise ValueError(f"{phenomenon}: unknown field '{field}' (use a ForecastEntry column or extras.<key>).")
+        self.severities = [severity for severity, _ in levels]
+        self.thresholds = np.array([float(threshold) for _, threshold in levels])
+        steps = np.diff(self.thresholds)
+        if not len(levels) or ((steps >= 0) if self.below else (steps <= 0)).any():
+            raise ValueError(f"{phenomenon}: thresholds must be strictly "
+                             f"{'decreasing' if self.below else 'increasing'}.")
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(spec["phenomenon"], spec["field"], spec["levels"], spec.get("below", False))
+
+    def levels(self, values):
+        """0 where no threshold is reached, otherwise 1 + the index of the severity reached."""
+        values = np.asarray(values, dtype=float)
+        if self.below:
+            level = np.searchsorted(-self.thresholds, -values, side="right")
+        else:
+            level = np.searchsorted(self.thresholds, values, side="right")
+        return np.where(np.isnan(values), 0, level)
+
+    def describe(self, value, level):
+        return f"{self.field} {value:g} {'<=' if self.below else '>='} {self.thresholds[level - 1]:g}"
+
+
+def load_rules(specs=None):
+    return [Rule.from_dict(spec) for spec in (specs if specs is not None else settings.WARNING_RULES)]
+
+
+def _floats(values):
+    try:
+        return np.array(values, dtype=float)
+    except (TypeError, ValueError):  # text from the JSON field, or junk
+        out = np.full(len(values), np.nan)
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError):
+                pass
+        return out
+
+
+class ForecastColumns:
+    """ForecastEntry keys and the rule fields' values as parallel arrays."""
+
+    def __init__(self, district, date, horizon, values):
+        self.district = district
+        self.date = date
+        self.horizon = horizon
+        self.values = values
+
+    def __len__(self):
+        return len(self.district)
+
+
+def fetch_forecast_columns(start, end, fields, district_ids=None):
+    """Load ``fields`` for every ForecastEntry dated in [start, end]; extras keys are extracted in SQL."""
+    fields = list(dict.fromkeys(fields))
+    annotations = {f"_v{i}": KT(f"extras__{field[len(EXTRAS_PREFIX):]}")
+                   for i, field in enumerate(fields) if field.startswith(EXTRAS_PREFIX)}
+    names = [f"_v{i}" if field.startswith(EXTRAS_PREFIX) else field for i, field in enumerate(fields)]
+    qs = ForecastEntry.objects.filter(date__range=(start, end))
+    if district_ids is not None:
+        qs = qs.filter(district_id__in=list(district_ids))
+    rows = list(qs.annotate(**annotations).order_by().values_list("district_id", "date", "horizon", *names))
+    if not rows:
+        return ForecastColumns([], [], [], {field: np.empty(0) for field in fields})
+    columns = list(zip(*rows))
+    values = {field: _floats(column) for field, column in zip(fields, columns[3:])}
+    return ForecastColumns(columns[0], columns[1], columns[2], values)
+
+
+def evaluate(columns, rules):
+    """{(district_id, date, horizon, phenomenon): (severity, description)} for every warning the rules raise."""
+    desired = {}
+    for rule in rules:
+        values = columns.values[rule.field]
+        levels = rule.levels(values)
+        for i in np.flatnonzero(levels):
+            level = int(levels[i])
+            desired[(columns.district[i], columns.date[i], columns.horizon[i], rule.phenomenon)] = (
+                rule.severities[level - 1], rule.describe(values[i], level))
+    return desired
+
+
+class WarningPlan:
+    def __init__(self):
+        self.create = []
+        self.update = []
+        self.delete = []
+        self.unchanged = 0
+        self.manual = 0
+        self.timings = {}
+
+    def counts(self):
+        return {"created": len(self.create), "updated": len(self.update), "cleared": len(self.delete),
+                "unchanged": self.unchanged, "manual_kept": self.manual}
+
+
+def plan_changes(desired, start, end, phenomena, district_ids=None):
+    """Diff ``desired`` against the stored warnings for ``phenomena`` in [start, end]."""
+    plan = WarningPlan()
+    qs = WarningEntry.objects.filter(date__range=(start, end), phenomenon__in=list(phenomena))
+    if district_ids is not None:
+        qs = qs.filter(district_id__in=list(district_ids))
+    existing = qs.order_by().values_list("id", "district_id", "date", "horizon", "phenomenon",
+                                         "severity", "description", "source")
+    seen = set()
+    for pk, district_id, day, horizon, phenomenon, severity, description, source in existing:
+        key = (district_id, day, horizon, phenomenon)
+        seen.add(key)
+        if source != SOURCE:
+            plan.manual += 1
+        elif key not in desired:
+            plan.delete.append(pk)
+        elif desired[key] != (severity, description):
+            plan.update.append(_warning(key, *desired[key]))
+        else:
+            plan.unchanged += 1
+    for key, (severity, description) in desired.items():
+        if key not in seen:
+            plan.create.append(_warning(key, severity, description))
+    return plan
+
+
+def _warning(key, severity, description):
+    district_id, day, horizon, phenomenon = key
+    return WarningEntry(district_id=district_id, date=day, horizon=horizon, phenomenon=phenomenon,
+                        severity=severity, description=description, source=SOURCE)
+
+
+def apply_plan(plan, batch_size=1000):
+    """Write the plan in one transaction."""
+    with transaction.atomic():
+        for ids in chunked(plan.delete, batch_size):
+            WarningEntry.objects.filter(id__in=ids).delete()
+        # a manual warning saved since planning keeps its key
+        WarningEntry.objects.bulk_create(plan.create, batch_size=batch_size, ignore_conflicts=True)
+        # changed severities as one upsert on the unique key rather than bulk_update's per-row CASE
+        kwargs = {"update_conflicts": True, "update_fields": ["severity", "description"]}
+        if connection.features.supports_update_conflicts_with_target:
+            kwargs["unique_fields"] = KEY_FIELDS
+        WarningEntry.objects.bulk_create(plan.update, batch_size=batch_size, **kwargs)
+
+
+def generate_warnings(start, end, rules=None, district_ids=None, dry_run=False):
+    """Evaluate ``rules`` for [start, end] and apply the changes; returns the WarningPlan."""
+    rules = load_rules() if rules is None else rules
+    t0 = time.perf_counter()
+    columns = fetch_forecast_columns(start, end, [rule.field for rule in rules], district_ids)
+    t1 = time.perf_counter()
+    desired = evaluate(columns, rules)
+    plan = plan_changes(desired, start, end, {rule.phenomenon for rule in rules}, district_ids)
+    t2 = time.perf_counter()
+    if not dry_run:
+        apply_plan(plan)
+    t3 = time.perf_counter()
+    plan.timings = {"forecasts": len(columns), "load_s": round(t1 - t0, 4), "evaluate_s": round(t2 - t1, 4),
+                    "apply_s": round(t3 - t2, 4)}
+    return plan
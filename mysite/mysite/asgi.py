@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+# serve map/district/by_date reads from core.async_views
+os.environ.setdefault("WEATHER_ASYNC_VIEWS", "1")
 
 application = get_asgi_application()
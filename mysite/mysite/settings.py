@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,10 +38,12 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "rest_framework",
     "core",
 ]
 
 MIDDLEWARE = [
+    "core.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -133,4 +136,57 @@ STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'login'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'login'
+
+# Cache used for serialized map forecasts (core/caching.py).
+# Use a shared backend (memcached/redis) when running several worker processes.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "weather-default",
+    }
+}
+MAP_FORECAST_CACHE_TIMEOUT = 60 * 60  # seconds
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "core.metrics.TimedJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# request metrics (core.middleware.MetricsMiddleware, served at /metrics/)
+METRICS_ENABLED = True
+METRICS_SLOW_REQUEST_MS = 1000  # log slower requests with their SQL to 'core.metrics.slow'; None disables
+METRICS_TOKEN = os.environ.get("WEATHER_METRICS_TOKEN")  # scrapers send "Authorization: Bearer <token>"
+# REMOTE_ADDRs allowed without a login or token; behind a reverse proxy every client has the proxy's address,
+# so leave this empty there
+METRICS_ALLOWED_IPS = []
+
+# incremental verification watermarks trail the run's start by this much, covering late-committing writes
+VERIFICATION_WATERMARK_LAG_SECONDS = 300
+
+# how often each process checks the district registry's generation counter in CACHES (core.districts)
+DISTRICT_REGISTRY_CHECK_SECONDS = 5
+
+# district polygons for lat/lon -> district lookups (core.spatial), plus each District.geojson_file
+DISTRICT_GEOJSON = BASE_DIR / "core" / "static" / "geojson" / "combined_regions_normalized.geojson"
+DISTRICT_LOCATE_CACHE_TIMEOUT = 24 * 60 * 60  # seconds, single-point /api/districts/locate/
+
+# static map images (core.map_render, /forecast/map_image/): geometry drawn and where renders are cached
+MAP_RENDER_GEOJSON = BASE_DIR / "core" / "static" / "geojson" / "combined_regions.geojson"
+MAP_RENDER_DIR = BASE_DIR / "var" / "map_renders"
+
+# async versions of the hot read endpoints (core.async_views); mysite/asgi.py enables them
+ASYNC_READ_VIEWS = os.environ.get("WEATHER_ASYNC_VIEWS") == "1"
+
+# threshold rules for generate_warnings (core.warning_rules). "field" is a ForecastEntry column or
+# "extras.<key>"; severities are listed mildest first. "below": true warns at or below the thresholds.
+WARNING_RULES = [
+    {"phenomenon": "Heavy Rain", "field": "rainfall_mm",
+     "levels": [["Yellow", 64.5], ["Orange", 115.6], ["Red", 204.5]]},
+    {"phenomenon": "Heat Wave", "field": "extras.tmax",
+     "levels": [["Yellow", 40.0], ["Orange", 45.0], ["Red", 47.0]]},
+    {"phenomenon": "Cold Wave", "field": "extras.tmin", "below": True,
+     "levels": [["Yellow", 10.0], ["Orange", 4.0], ["Red", 2.0]]},
+]